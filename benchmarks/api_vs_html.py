@@ -0,0 +1,100 @@
+# Benchmark: taking a quiz through the HTML pages versus the JSON API.
+# Compares payload sizes (plain and gzip) and median latency for fetching a quiz, submitting one
+# answer set (form POST + results page versus one JSON POST) and syncing 20 submissions
+# (20 form POSTs versus one batch request).
+# Run from the project folder: python benchmarks/api_vs_html.py [requests per case]
+import gzip
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH = 20
+
+
+def timed(requests, call):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        sizes = call()
+        times.append(time.perf_counter() - start)
+    return sizes, statistics.median(times)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as folder:
+        from app import create_app
+        from models.bootstrap import initialize_database
+        from benchmarks.dataset import generate
+        from models.models import Quiz, Question
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            initialize_database()
+            generate(users=100, subjects=5, scores=1000, questions=5000, log=lambda message: None)
+            quiz_ids = [quiz.id for quiz in Quiz.query.filter(Quiz.date_of_quiz <= datetime.now(),  # Open quizzes only
+                                                              Quiz.id.in_(Question.query.with_entities(Question.quiz_id))).limit(BATCH)]
+            question_ids = {quiz_id: [question.id for question in Question.query.filter_by(quiz_id=quiz_id)] for quiz_id in quiz_ids}
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 2
+            session["role"] = "user"
+
+        rng = random.Random(1)
+        quiz_id = quiz_ids[0]
+        answers = {question_id: rng.randint(1, 4) for question_id in question_ids[quiz_id]}
+
+        def sizes(*responses):
+            assert all(response.status_code < 300 for response in responses), [response.status for response in responses]
+            body = b"".join(response.data for response in responses)
+            return len(body), len(gzip.compress(body))
+
+        def html_fetch():
+            return sizes(client.get(f"/attempt_quiz/{quiz_id}"))
+
+        def api_fetch():
+            return sizes(client.get(f"/api/v1/quizzes/{quiz_id}"))
+
+        def html_submit(quiz=quiz_id, chosen=answers):
+            form = {f"question_{question_id}": str(option) for question_id, option in chosen.items()}
+            return sizes(client.post(f"/attempt_quiz/{quiz}", data=form, follow_redirects=True))
+
+        def api_submit():
+            return sizes(client.post(f"/api/v1/quizzes/{quiz_id}/attempts", json={"answers": answers}))
+
+        batch = [{"quiz_id": quiz, "answers": {question_id: rng.randint(1, 4) for question_id in question_ids[quiz]}}
+                 for quiz in quiz_ids]
+
+        def html_sync():
+            total = [0, 0]
+            for item in batch:
+                plain, packed = html_submit(item["quiz_id"], item["answers"])
+                total[0] += plain
+                total[1] += packed
+            return tuple(total)
+
+        def api_sync():
+            return sizes(client.post("/api/v1/attempts", json={"attempts": batch}))
+
+        print(f"Quiz with {len(answers)} questions, {requests} requests per case")
+        print(f"{'case':<34} {'bytes':>8} {'gzip':>8} {'median ms':>10}")
+        for name, call, count in (
+            ("fetch quiz: HTML page", html_fetch, requests),
+            ("fetch quiz: JSON", api_fetch, requests),
+            ("submit: form POST + results page", html_submit, requests),
+            ("submit: JSON POST", api_submit, requests),
+            (f"sync {len(batch)}: form POSTs", html_sync, max(1, requests // 10)),
+            (f"sync {len(batch)}: one batch request", api_sync, max(1, requests // 10)),
+        ):
+            (plain, packed), median = timed(count, call)
+            print(f"{name:<34} {plain:>8} {packed:>8} {median * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Benchmark: 2,000 learners (default) in timed sessions each autosaving 20 answers, one answer per request,
+# from 16 request threads. Every autosave is committed before it is acknowledged; compares one transaction per
+# autosave with group commit (autosaves arriving during a write share the next transaction).
+# Run from the project folder: python benchmarks/autosave.py [learners] [answers per learner] [threads]
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from models.models import db, User, Subject, Chapter, Quiz, AttemptSession, AttemptSessionAnswer
+from models.attempt_sessions import autosave_writer, _write_answers
+
+
+def seed(learners):
+    subject = Subject(name="Bench")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Bench")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1), time_limit=60)
+    db.session.add(quiz)
+    db.session.flush()
+    db.session.execute(insert(User.__table__), [
+        {"id": user_id, "email": f"user{user_id}@bench", "password": "x", "full_name": "Bench"}
+        for user_id in range(1, learners + 1)
+    ])
+    now = datetime.utcnow()
+    db.session.execute(insert(AttemptSession.__table__), [
+        {"id": user_id, "user_id": user_id, "quiz_id": quiz.id, "started_at": now, "deadline": now + timedelta(hours=1)}
+        for user_id in range(1, learners + 1)
+    ])
+    db.session.commit()
+
+
+def run(app, learners, answers, threads, autosave):
+    """ Each thread autosaves for its share of the learners: every learner answers question 1, then question 2, ... """
+    times = []
+
+    def worker(first):
+        own = []
+        with app.app_context():
+            for question_id in range(1, answers + 1):
+                for session_id in range(first, learners + 1, threads):
+                    begin = time.perf_counter()
+                    autosave(session_id, {question_id: 1 + question_id % 4})
+                    own.append(time.perf_counter() - begin)
+        times.extend(own)
+
+    workers = [threading.Thread(target=worker, args=(first,)) for first in range(1, threads + 1)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return times, time.perf_counter() - start
+
+
+def report(name, times, elapsed, transactions):
+    times.sort()
+    print(f"{name:<24} median {statistics.median(times) * 1000:>7.3f} ms  p99 {times[int(len(times) * 0.99)] * 1000:>7.3f} ms  "
+          f"{len(times) / elapsed:>7,.0f} autosaves/s  {transactions:>6} commits")
+
+
+def main():
+    learners = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    answers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    with tempfile.TemporaryDirectory() as folder:
+        from app import create_app
+        # Lock waits of the per-autosave commits would fill the slow query log
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}", "SQL_SLOW_QUERY_MS": 0})
+        print(f"{learners} learners x {answers} answers = {learners * answers} autosaves from {threads} threads")
+
+        with app.app_context():
+            db.create_all()
+            seed(learners)
+
+        def committed(session_id, values):
+            assert autosave_writer.session_info(session_id) is not None
+            _write_answers({session_id: values})
+
+        def grouped(session_id, values):
+            assert autosave_writer.session_info(session_id) is not None
+            autosave_writer.save(session_id, values)
+
+        times, elapsed = run(app, learners, answers, threads, committed)
+        report("commit per autosave", times, elapsed, len(times))
+        with app.app_context():
+            db.session.execute(AttemptSessionAnswer.__table__.delete())
+            db.session.commit()
+
+        times, elapsed = run(app, learners, answers, threads, grouped)
+        with app.app_context():
+            assert AttemptSessionAnswer.query.count() == learners * answers  # All written when acknowledged
+        report("group commit", times, elapsed, autosave_writer.commits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# Synthetic dataset for load testing: subjects, chapters, quizzes, questions, users and scores at any scale.
+# Rows go in with Core executemany inserts in large batches; the derived tables (attempt history,
+# question layouts, chapter progress, search index) are filled so every page works on the result.
+# Run from the project folder:
+#   python benchmarks/dataset.py DB_FILE [--users 100000] [--scores 1000000] [--questions 500000] ...
+# or import generate() from another script with the app already pointed at the database.
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ("algebra", "matrix", "vector", "energy", "momentum", "enzyme", "protein", "atom", "orbital",
+         "market", "demand", "poetry", "sonnet", "empire", "river", "climate", "circuit", "signal",
+         "function", "integral", "graph", "theorem", "cell", "genome", "acid", "ratio", "prism", "lens")
+BATCH = 50000
+ANSWER_BYTES = bytes(value % 5 for value in range(256))  # Random byte -> answer 0 (not answered) to 4
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _insert(table, rows):
+    from sqlalchemy import insert
+    from models.models import db
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+
+
+def generate(users=1000, subjects=10, chapters_per_subject=10, quizzes_per_chapter=5,
+             questions=5000, scores=20000, seed=1, log=print):
+    """
+    Fill an empty database (inside an app context). Questions are spread evenly over the quizzes,
+    each score is the only attempt of a distinct (user, quiz) pair. Returns the row counts.
+    """
+    from sqlalchemy import select, func
+    from models.models import db, User, Subject, Chapter, Quiz, Question, Score, Attempt, QuestionLayout
+    from models.answers import pack_layout, count_correct
+    from models.progress import rebuild_progress
+    from models.leaderboard import rebuild_leaderboards
+    from models.item_stats import rebuild_question_stats
+    from models.search import search_index_available, create_search_index, rebuild_search_index
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    first_user = (db.session.execute(select(func.max(User.id))).scalar() or 0) + 1
+    first_subject = (db.session.execute(select(func.max(Subject.id))).scalar() or 0) + 1
+
+    log("Subjects, chapters and quizzes")
+    _insert(Subject.__table__, (
+        {"id": first_subject + i, "name": f"Subject {first_subject + i} {_words(rng, 2)}", "description": _words(rng, 8)}
+        for i in range(subjects)
+    ))
+    chapter_rows = [
+        {"subject_id": first_subject + i, "name": f"Chapter {j + 1} {_words(rng, 2)}", "description": _words(rng, 8)}
+        for i in range(subjects) for j in range(chapters_per_subject)
+    ]
+    _insert(Chapter.__table__, chapter_rows)
+    chapters = db.session.execute(
+        select(Chapter.id).where(Chapter.subject_id >= first_subject).order_by(Chapter.id)
+    ).scalars().all()
+
+    # About two thirds of the quizzes are in the past (attemptable), the rest spread over the next month
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    _insert(Quiz.__table__, (
+        {"chapter_id": chapter_id, "date_of_quiz": today + timedelta(days=rng.randint(-60, 30)),
+         "remarks": _words(rng, 4), "questions_version": 1}
+        for chapter_id in chapters for _ in range(quizzes_per_chapter)
+    ))
+    quizzes = db.session.execute(
+        select(Quiz.id, Quiz.chapter_id).where(Quiz.chapter_id.in_(select(Chapter.id).where(Chapter.subject_id >= first_subject)))
+        .order_by(Quiz.id)
+    ).all()
+    quiz_ids = [quiz.id for quiz in quizzes]
+
+    log(f"{questions} questions")
+    _insert(Question.__table__, (
+        {"quiz_id": quiz_ids[i % len(quiz_ids)], "question_statement": f"What is {_words(rng, 6)}?",
+         "option1": _words(rng, 2), "option2": _words(rng, 2), "option3": _words(rng, 2), "option4": _words(rng, 2),
+         "correct_option": rng.randint(1, 4)}
+        for i in range(questions)
+    ))
+
+    # Layout (question ids in id order) and answer key of every quiz at version 1
+    layouts = {quiz_id: [] for quiz_id in quiz_ids}
+    keys = {quiz_id: bytearray() for quiz_id in quiz_ids}
+    for question_id, quiz_id, correct in db.session.execute(
+        select(Question.id, Question.quiz_id, Question.correct_option)
+        .where(Question.quiz_id.in_(quiz_ids)).order_by(Question.id)
+    ):
+        layouts[quiz_id].append(question_id)
+        keys[quiz_id].append(correct)
+    _insert(QuestionLayout.__table__, (
+        {"quiz_id": quiz_id, "version": 1, "question_ids": pack_layout(question_ids)}
+        for quiz_id, question_ids in layouts.items()
+    ))
+
+    log(f"{users} users")
+    _insert(User.__table__, (
+        {"id": first_user + i, "email": f"user{first_user + i}@example.com", "password": "password",
+         "full_name": f"{rng.choice(('Asha', 'Ravi', 'Meera', 'John', 'Li', 'Sara', 'Omar'))} {_words(rng, 1).title()}",
+         "qualification": rng.choice(("B.Sc", "B.Tech", "M.Sc", "School")), "dob": "2000-01-01", "role": "user"}
+        for i in range(users)
+    ))
+
+    # Distinct (user, quiz) pairs, about scores / users quizzes per user
+    scores = min(scores, users * len(quiz_ids))
+    log(f"{scores} scores")
+
+    def score_rows():
+        for i in range(users):
+            count = scores // users + (1 if i < scores % users else 0)
+            for quiz_id in rng.sample(quiz_ids, min(count, len(quiz_ids))):
+                key = keys[quiz_id]
+                answers = rng.randbytes(len(key)).translate(ANSWER_BYTES)
+                yield {"quiz_id": quiz_id, "user_id": first_user + i,
+                       "time_stamp_of_attempt": today - timedelta(minutes=rng.randint(0, 60 * 24 * 60)),
+                       "total_scored": count_correct(answers, key), "total_questions": len(key),
+                       "answers": answers, "layout_version": 1}
+
+    batch = []
+    for row in score_rows():
+        batch.append(row)
+        if len(batch) == BATCH:
+            _insert(Score.__table__, batch)
+            _insert(Attempt.__table__, batch)
+            batch = []
+    _insert(Score.__table__, batch)
+    _insert(Attempt.__table__, batch)
+    db.session.commit()
+
+    log("Chapter progress, leaderboards, question statistics and search index")
+    rebuild_progress()
+    rebuild_leaderboards()
+    rebuild_question_stats()
+    if search_index_available() or create_search_index():
+        rebuild_search_index()
+    db.session.commit()
+
+    counts = {"users": users, "subjects": subjects, "chapters": len(chapters), "quizzes": len(quiz_ids),
+              "questions": questions, "scores": scores}
+    log(f"Generated {counts} in {time.perf_counter() - started:.1f} s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a quiz master database with synthetic data")
+    parser.add_argument("database", help="SQLite file to create or extend")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--subjects", type=int, default=10)
+    parser.add_argument("--chapters-per-subject", type=int, default=10)
+    parser.add_argument("--quizzes-per-chapter", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--scores", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models.bootstrap import initialize_database
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(args.database)}"})
+    with app.app_context():
+        initialize_database()
+        generate(users=args.users, subjects=args.subjects, chapters_per_subject=args.chapters_per_subject,
+                 quizzes_per_chapter=args.quizzes_per_chapter, questions=args.questions,
+                 scores=args.scores, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
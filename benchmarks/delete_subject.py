@@ -0,0 +1,123 @@
+# Benchmark: how long deleting a subject takes, and how long the SQLite write lock is held, as the subject grows.
+# Compares the set-based delete used by the app with the old walk over the ORM graph. After each delete the
+# benchmark checks that nothing of the subject is left, so neither method is timed doing less than the other.
+# Run from the project folder: python benchmarks/delete_subject.py
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert, func, select
+from sqlalchemy.exc import SAWarning
+from app import create_app
+from models.bootstrap import initialize_database
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score
+from models.cascade import delete_subject_tree
+
+SIZES = [  # (chapters, quizzes per chapter, questions per quiz, users with a score on every quiz)
+    (5, 5, 10, 20),
+    (10, 10, 20, 50),
+    (20, 20, 20, 100),
+]
+
+
+def seed(chapters, quizzes, questions, users):
+    subject = Subject(name=f"Subject {time.time_ns()}")
+    db.session.add(subject)
+    db.session.flush()
+    user_ids = [row[0] for row in db.session.execute(
+        insert(User.__table__).returning(User.id, sort_by_parameter_order=True),
+        [{"email": f"{time.time_ns()}-{i}@bench", "password": "x", "full_name": "Bench", "role": "user"} for i in range(users)],
+    )]
+    for c in range(chapters):
+        chapter = Chapter(subject_id=subject.id, name=f"Chapter {c}")
+        db.session.add(chapter)
+        db.session.flush()
+        quiz_ids = [row[0] for row in db.session.execute(
+            insert(Quiz.__table__).returning(Quiz.id, sort_by_parameter_order=True),
+            [{"chapter_id": chapter.id, "date_of_quiz": datetime(2025, 1, 1)} for _ in range(quizzes)],
+        )]
+        db.session.execute(insert(Question.__table__), [
+            {"quiz_id": quiz_id, "question_statement": "Q", "option1": "a", "option2": "b",
+             "option3": "c", "option4": "d", "correct_option": 1}
+            for quiz_id in quiz_ids for _ in range(questions)
+        ])
+        db.session.execute(insert(Score.__table__), [
+            {"quiz_id": quiz_id, "user_id": user_id, "total_scored": 1, "total_questions": questions, "selected_answers": "{}"}
+            for quiz_id in quiz_ids for user_id in user_ids
+        ])
+    db.session.commit()
+    return subject.id
+
+
+def legacy_delete(subject_id):
+    """
+    The delete_subject route before set-based deletes. Without no_autoflush each bulk delete flushed the chapters
+    deleted so far, and the commit deleted them again through the subject's cascade (SAWarning: 1 row matched).
+    """
+    with db.session.no_autoflush:
+        subject = db.session.get(Subject, subject_id)
+        for chapter in subject.chapters:
+            for quiz in chapter.quizzes:
+                Score.query.filter_by(quiz_id=quiz.id).delete()
+                Question.query.filter_by(quiz_id=quiz.id).delete()
+                db.session.delete(quiz)
+            db.session.delete(chapter)
+        db.session.delete(subject)
+
+
+def subject_rows(subject_id):
+    """ Rows of the subject's tree still in the database """
+    chapter_ids = select(Chapter.id).where(Chapter.subject_id == subject_id)
+    quiz_ids = select(Quiz.id).where(Quiz.chapter_id.in_(chapter_ids))
+    counts = [
+        select(func.count()).select_from(Subject).where(Subject.id == subject_id),
+        select(func.count()).select_from(Chapter).where(Chapter.subject_id == subject_id),
+        select(func.count()).select_from(Quiz).where(Quiz.id.in_(quiz_ids)),
+        select(func.count()).select_from(Question).where(Question.quiz_id.in_(quiz_ids)),
+        select(func.count()).select_from(Score).where(Score.quiz_id.in_(quiz_ids)),
+    ]
+    return sum(db.session.execute(count).scalar() for count in counts)
+
+
+def timed(delete_function, subject_id):
+    """ Total time, and time from the first write to the commit (the write-lock hold time in SQLite) """
+    first_write = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not first_write and statement.lstrip().upper().startswith("DELETE"):
+            first_write.append(time.perf_counter())
+
+    event.listen(db.engine, "before_cursor_execute", on_execute)
+    start = time.perf_counter()
+    delete_function(subject_id)
+    db.session.commit()
+    end = time.perf_counter()
+    event.remove(db.engine, "before_cursor_execute", on_execute)
+    return end - start, end - first_write[0]
+
+
+def main():
+    warnings.simplefilter("error", SAWarning)  # A delete that doesn't match what the ORM expects fails the run
+    with tempfile.TemporaryDirectory() as folder:
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}", "SQL_SLOW_QUERY_MS": 0})
+        with app.app_context():
+            initialize_database(log=lambda message: None)
+            print(f"{'chapters':>8} {'quizzes':>8} {'questions':>10} {'scores':>8} | {'method':<10} {'total ms':>9} {'lock ms':>9}")
+            for chapters, quizzes, questions, users in SIZES:
+                for name, function in (("legacy", legacy_delete), ("set-based", delete_subject_tree)):
+                    subject_id = seed(chapters, quizzes, questions, users)
+                    expected = 1 + chapters + chapters * quizzes * (1 + questions + users)
+                    assert subject_rows(subject_id) == expected, f"{name}: seeded {subject_rows(subject_id)} rows"
+                    total, lock = timed(function, subject_id)
+                    assert subject_rows(subject_id) == 0, f"{name}: {subject_rows(subject_id)} rows left"
+                    print(f"{chapters:>8} {chapters * quizzes:>8} {chapters * quizzes * questions:>10} "
+                          f"{chapters * quizzes * users:>8} | {name:<10} {total * 1000:>9.1f} {lock * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
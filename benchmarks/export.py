@@ -0,0 +1,69 @@
+# Benchmark: peak Python memory and throughput of the streaming score export versus building
+# the same CSV from Score.query.all(), on a generated database (200k scores by default).
+# Run from the project folder: python benchmarks/export.py [scores]
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(name, rows, call):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = call()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<30} {size / 1e6:>8.1f} MB {elapsed:>8.2f} s {rows / elapsed:>10,.0f} rows/s {peak / 1e6:>9.1f} MB peak")
+
+
+def main():
+    scores = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as folder:
+        from app import create_app
+        from models.bootstrap import initialize_database
+        from benchmarks.dataset import generate
+        from models.models import Score
+        from models.exporter import parse_filters, export_scores
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            initialize_database()
+            generate(users=max(1, scores // 20), scores=scores, questions=5000, log=lambda message: None)
+
+        with app.app_context():
+            def streamed():
+                return sum(len(chunk) for chunk in export_scores(parse_filters(), "csv"))
+            measure("streamed export", scores, streamed)
+
+        with app.app_context():
+            def all_at_once():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for score in Score.query.all():
+                    writer.writerow((score.id, score.user.id, score.user.email, score.user.full_name,
+                                     score.quiz.chapter.subject.name, score.quiz.chapter.name, score.quiz_id,
+                                     score.time_stamp_of_attempt.isoformat(), score.total_scored, score.total_questions))
+                return len(buffer.getvalue())
+            measure("Score.query.all()", scores, all_at_once)
+
+        # Through the HTTP endpoint, reading the chunked response as it arrives
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 1
+            session["role"] = "admin"
+
+        def over_http():
+            response = client.get("/admin/export/scores?format=ndjson", buffered=False)
+            size = sum(len(chunk) for chunk in response.response)
+            response.close()
+            return size
+        measure("HTTP NDJSON export", scores, over_http)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Benchmark: dashboard latency and SQL statements with the identity cache on and off, then a burst of
+# logins (scrypt password checks) from many threads while another thread keeps loading the user dashboard:
+# hashes capped at one per CPU (the default PASSWORD_HASH_CONCURRENCY) versus one per request thread (no cap).
+# Run from the project folder: python benchmarks/identity.py [dashboard requests] [logins] [request threads]
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def dashboards(app, requests):
+    from models.identity import identity_cache
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 2
+    for ttl, name in ((0, "identity read per request"), (60, "identity cache")):
+        identity_cache.ttl = ttl
+        identity_cache.clear()
+        times = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get("/user_dashboard")
+            times.append(time.perf_counter() - start)
+        print(f"{name:<28} median {statistics.median(times) * 1e6:>7.0f} µs  {response.headers['X-SQL-Queries']} SQL statements")
+
+
+def login_burst(app, name, logins, threads, concurrency):
+    from models.identity import password_hasher
+    password_hasher.concurrency = concurrency
+    emails = [f"user{2 + i % 100}@example.com" for i in range(logins)]
+    done = threading.Event()
+    probe = []
+
+    def log_in(worker):
+        client = app.test_client()
+        for email in emails[worker::threads]:
+            assert client.post("/login", data={"email": email, "password": "password"}).status_code == 302
+
+    def visit():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 2
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/user_dashboard")
+            probe.append(time.perf_counter() - start)
+
+    visitor = threading.Thread(target=visit)
+    visitor.start()
+    workers = [threading.Thread(target=log_in, args=(worker,)) for worker in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    visitor.join()
+    probe.sort()
+    print(f"{name:<28} {logins / elapsed:>6.1f} logins/s  dashboard during the burst: median "
+          f"{statistics.median(probe) * 1000:>6.1f} ms, p95 {probe[int(len(probe) * 0.95)] * 1000:>6.1f} ms")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    with tempfile.TemporaryDirectory() as folder:
+        from app import create_app
+        from models.bootstrap import initialize_database
+        from benchmarks.dataset import generate
+        from models.identity import hash_plaintext_passwords
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            initialize_database()
+            generate(users=100, subjects=5, scores=2000, questions=1000, log=lambda message: None)
+            hash_plaintext_passwords()
+        app.debug = True  # X-SQL-Queries header
+
+        dashboards(app, requests)
+        print(f"{logins} logins from {threads} threads")
+        cpus = os.cpu_count() or 1
+        login_burst(app, "no cap (a hash per thread)", logins, threads, threads)
+        login_burst(app, f"capped at {cpus} (one per CPU)", logins, threads, cpus)
+
+
+if __name__ == "__main__":
+    main()
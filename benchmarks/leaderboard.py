@@ -0,0 +1,104 @@
+# Benchmark: rank, percentile and top-10 of one quiz with many learners (200k by default),
+# read from the score histogram versus computed from the Score rows on every request.
+# Also times one incremental update (write_attempts) and a full rebuild of the quiz's histogram.
+# Run from the project folder: python benchmarks/leaderboard.py [learners]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, select, func
+from models.models import db, User, Subject, Chapter, Quiz, Score
+from models.attempts import PendingAttempt, write_attempts
+from models.leaderboard import refresh_leaderboards, load_histogram, rank_in_histogram, top_scores
+
+QUESTIONS = 20
+
+
+def seed(learners):
+    subject = Subject(name="Bench")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Bench")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1))
+    db.session.add(quiz)
+    db.session.flush()
+
+    random.seed(1)
+    start = datetime(2025, 1, 1)
+    users, scores = [], []
+    for user_id in range(1, learners + 1):
+        users.append({"id": user_id, "email": f"user{user_id}@bench", "password": "x", "full_name": f"User {user_id}"})
+        scores.append({"quiz_id": quiz.id, "user_id": user_id, "total_scored": max(0, min(QUESTIONS, round(random.gauss(12, 4)))),
+                       "total_questions": QUESTIONS, "time_stamp_of_attempt": start + timedelta(seconds=user_id)})
+    for offset in range(0, learners, 50000):
+        db.session.execute(insert(User.__table__), users[offset:offset + 50000])
+        db.session.execute(insert(Score.__table__), scores[offset:offset + 50000])
+    refresh_leaderboards([quiz.id])
+    db.session.commit()
+    return quiz
+
+
+def from_scores(quiz_id, score):
+    """ The same answers computed from Score on every request """
+    users = db.session.execute(select(func.count()).where(Score.quiz_id == quiz_id)).scalar()
+    better = db.session.execute(select(func.count()).where(Score.quiz_id == quiz_id, Score.total_scored > score)).scalar()
+    worse = db.session.execute(select(func.count()).where(Score.quiz_id == quiz_id, Score.total_scored < score)).scalar()
+    return better + 1, users, round(100 * worse / users)
+
+
+def timed(call, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+def main():
+    learners = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as folder:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            print(f"Seeding {learners} learners on a {QUESTIONS}-question quiz...")
+            quiz = seed(learners)
+            score = 12
+
+            histogram_rank, histogram_ms = timed(lambda: rank_in_histogram(load_histogram(quiz.id), score), 200)
+            counted_rank, counted_ms = timed(lambda: from_scores(quiz.id, score), 5)
+            assert histogram_rank == counted_rank, (histogram_rank, counted_rank)
+            _, top_ms = timed(lambda: top_scores(quiz.id, 10), 200)
+
+            print(f"rank {histogram_rank[0]} of {histogram_rank[1]}, better than {histogram_rank[2]}%")
+            print(f"{'rank + percentile from histogram':<36} {histogram_ms:>9.3f} ms")
+            print(f"{'rank + percentile counting Score':<36} {counted_ms:>9.3f} ms")
+            print(f"{'top 10 through the ranking index':<36} {top_ms:>9.3f} ms")
+
+            def one_attempt():
+                user_id = random.randint(1, learners)
+                write_attempts([PendingAttempt(user_id, quiz.id, quiz.chapter_id, random.randint(0, QUESTIONS), QUESTIONS,
+                                               b"", 0, ())])
+            _, write_ms = timed(one_attempt, 200)
+            print(f"{'write one attempt (incl. histogram)':<36} {write_ms:>9.3f} ms")
+
+            def rebuild():
+                refresh_leaderboards([quiz.id])
+                db.session.commit()
+            _, rebuild_ms = timed(rebuild, 5)
+            print(f"{'rebuild the quiz histogram':<36} {rebuild_ms:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
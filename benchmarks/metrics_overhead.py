@@ -0,0 +1,85 @@
+# Benchmark: cost of the per-request SQL instrumentation (models/metrics.py).
+# The same pages are requested with FLASK_METRICS_ENABLED=false and =true, each in a fresh process,
+# alternating between the two for several rounds and keeping the best CPU time of each.
+# A bare "SELECT 1" loop shows the cost per statement on its own.
+# Run from the project folder: python benchmarks/metrics_overhead.py [requests per page]
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PAGES = ("/quiz_summary", "/view_quizzes/1", "/user_dashboard")
+ROUNDS = 5  # Best of, to keep scheduling noise out
+
+
+def load_app(environment):
+    # create_app reads FLASK_* settings from the environment
+    os.environ.update(environment)
+    from app import create_app
+    from models.bootstrap import initialize_database
+    app = create_app()
+    with app.app_context():
+        initialize_database()
+    return app
+
+
+def seed(environment):
+    app = load_app(environment)
+    from benchmarks.dataset import generate
+    with app.app_context():
+        generate(users=200, subjects=5, scores=4000, questions=2000, log=lambda message: None)
+
+
+def measure(environment, requests):
+    app = load_app(environment)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 2
+        session["role"] = "user"
+
+    results = {}
+    for page in PAGES:
+        for _ in range(20):
+            client.get(page)
+        start = time.process_time()
+        for _ in range(requests):
+            client.get(page)
+        results[page] = (time.process_time() - start) / requests
+
+    from sqlalchemy import text
+    from models.models import db
+    with app.app_context():
+        statement = text("SELECT 1")
+        start = time.process_time()
+        for _ in range(requests * 20):
+            db.session.execute(statement)
+        results["SELECT 1"] = (time.process_time() - start) / (requests * 20)
+    return results
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as folder:
+        database = {"FLASK_SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"}
+        with context.Pool(1) as pool:
+            pool.apply(seed, (database,))
+        runs = {"off": {}, "on": {}}
+        for _ in range(ROUNDS):
+            for name, enabled in (("off", "false"), ("on", "true")):
+                with context.Pool(1) as pool:
+                    result = pool.apply(measure, (dict(database, FLASK_METRICS_ENABLED=enabled), requests))
+                for page, seconds in result.items():
+                    runs[name][page] = min(seconds, runs[name].get(page, seconds))
+
+    print(f"{'page':<18} {'off µs':>9} {'on µs':>9} {'overhead':>9}")
+    for page in PAGES + ("SELECT 1",):
+        off, on = runs["off"][page], runs["on"][page]
+        print(f"{page:<18} {off * 1e6:>9.0f} {on * 1e6:>9.0f} {(on / off - 1) * 100:>+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Benchmark: several worker processes (like gunicorn -w N) hitting one SQLite file with mixed
+# page reads and quiz submissions, with the old default engine settings and with the tuned ones.
+# Reports requests/s, p95 latency per kind and the number of failed requests ("database is locked").
+# Run from the project folder: python benchmarks/mixed_workers.py [processes] [seconds per run]
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUIZZES = 20
+QUESTIONS = 10
+SUBMIT_SHARE = 0.2
+
+# Settings before the engine was configurable: rollback journal, full fsync, small page cache, no mmap
+LEGACY = {"FLASK_SQLITE_JOURNAL_MODE": "DELETE", "FLASK_SQLITE_SYNCHRONOUS": "FULL",
+          "FLASK_SQLITE_MMAP_SIZE": "0", "FLASK_SQLITE_CACHE_SIZE": "-2000"}
+TUNED = {}
+
+
+def load_app(environment):
+    # create_app reads FLASK_* settings from the environment
+    os.environ.update(environment)
+    from app import create_app
+    app = create_app()
+    app.logger.disabled = True
+    return app
+
+
+def seed(environment, users):
+    app = load_app(environment)
+    from sqlalchemy import insert
+    from models.bootstrap import initialize_database
+    from models.models import db, User, Subject, Chapter, Quiz, Question
+
+    with app.app_context():
+        initialize_database()
+        subject = Subject(name="Bench")
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(subject_id=subject.id, name="Bench")
+        db.session.add(chapter)
+        db.session.flush()
+        quizzes = [Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1)) for _ in range(QUIZZES)]
+        db.session.add_all(quizzes)
+        db.session.flush()
+        db.session.execute(insert(Question.__table__), [
+            {"quiz_id": quiz.id, "question_statement": "Q", "option1": "a", "option2": "b",
+             "option3": "c", "option4": "d", "correct_option": 1}
+            for quiz in quizzes for _ in range(QUESTIONS)
+        ])
+        user_ids = [row[0] for row in db.session.execute(
+            insert(User.__table__).returning(User.id, sort_by_parameter_order=True),
+            [{"email": f"{i}@bench", "password": "x", "full_name": "Bench", "role": "user"} for i in range(users)],
+        )]
+        quiz_ids = [quiz.id for quiz in quizzes]
+        subject_id = subject.id
+        db.session.commit()
+    return subject_id, quiz_ids, user_ids
+
+
+def worker(environment, user_id, subject_id, quiz_ids, seconds, results):
+    app = load_app(environment)
+    from models.attempts import attempt_writer
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+        session["role"] = "user"
+
+    random.seed(user_id)
+    latencies = {"read": [], "submit": []}
+    failures = 0
+    attempted = []  # Results pages only exist for attempted quizzes
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        quiz_id = random.choice(quiz_ids)
+        if not attempted or random.random() < SUBMIT_SHARE:
+            kind = "submit"
+            start = time.perf_counter()
+            response = client.post(f"/attempt_quiz/{quiz_id}", data={})
+            attempted.append(quiz_id)
+        else:
+            kind = "read"
+            url = random.choice(["/user_dashboard", f"/view_quizzes/{subject_id}",
+                                 f"/quiz_results/{random.choice(attempted)}", "/quiz_summary"])
+            start = time.perf_counter()
+            response = client.get(url)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 500:
+            failures += 1
+        else:
+            latencies[kind].append(elapsed)
+    attempt_writer.close()
+    results.put((latencies, failures))
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(name, settings, processes, seconds):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as folder:
+        environment = dict(settings, FLASK_SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(folder, 'bench.db')}")
+        with context.Pool(1) as pool:
+            subject_id, quiz_ids, user_ids = pool.apply(seed, (environment, processes))
+
+        results = context.Queue()
+        workers = [context.Process(target=worker, args=(environment, user_id, subject_id, quiz_ids, seconds, results))
+                   for user_id in user_ids]
+        for process in workers:
+            process.start()
+        collected = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+
+    reads = [value for latencies, _ in collected for value in latencies["read"]]
+    submits = [value for latencies, _ in collected for value in latencies["submit"]]
+    failures = sum(failed for _, failed in collected)
+    print(f"  {name:<7} {(len(reads) + len(submits)) / seconds:>7,.0f} req/s"
+          f"   read p95 {percentile(reads, 0.95) * 1000:>6.1f} ms"
+          f"   submit p95 {percentile(submits, 0.95) * 1000:>6.1f} ms"
+          f"   failed {failures}")
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{processes} processes, {seconds:g} s, {SUBMIT_SHARE:.0%} submissions")
+    for name, settings in (("legacy", LEGACY), ("tuned", TUNED)):
+        run(name, settings, processes, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark: exact regrade of one quiz with a large number of attempts (1M by default).
+# Run from the project folder: python benchmarks/regrade.py [attempts]
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, update
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score
+from models.regrade import regrade_quiz
+from models.answers import ensure_layout
+
+QUESTIONS = 20
+
+
+def seed(attempts):
+    subject = Subject(name="Bench")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Bench")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1))
+    user = User(email="bench@bench", password="x", full_name="Bench")
+    db.session.add_all([quiz, user])
+    db.session.flush()
+    question_ids = [row[0] for row in db.session.execute(
+        insert(Question.__table__).returning(Question.id, sort_by_parameter_order=True),
+        [{"quiz_id": quiz.id, "question_statement": "Q", "option1": "a", "option2": "b",
+          "option3": "c", "option4": "d", "correct_option": 1} for _ in range(QUESTIONS)],
+    )]
+
+    ensure_layout(quiz.id, quiz.questions_version, question_ids)
+
+    random.seed(1)
+    batch = []
+    for _ in range(attempts):
+        answers = bytes(random.randint(1, 4) for _ in question_ids)
+        batch.append({"quiz_id": quiz.id, "user_id": user.id, "total_scored": 0, "total_questions": QUESTIONS,
+                      "answers": answers, "layout_version": quiz.questions_version})
+        if len(batch) == 50000:
+            db.session.execute(insert(Score.__table__), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Score.__table__), batch)
+    db.session.commit()
+    return quiz.id, question_ids
+
+
+def main():
+    attempts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as folder:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            print(f"Seeding {attempts} attempts of a {QUESTIONS}-question quiz...")
+            quiz_id, question_ids = seed(attempts)
+
+            # Change one answer so that every attempt has to be checked and about a quarter of them rewritten
+            db.session.execute(update(Question).where(Question.id == question_ids[0]).values(correct_option=2))
+            db.session.commit()
+
+            last_report = [time.perf_counter()]
+
+            def on_progress(done):
+                if time.perf_counter() - last_report[0] > 2:
+                    print(f"  {done} / {attempts}")
+                    last_report[0] = time.perf_counter()
+
+            start = time.perf_counter()
+            checked = regrade_quiz(quiz_id, on_progress=on_progress)
+            elapsed = time.perf_counter() - start
+            print(f"Regraded {checked} attempts in {elapsed:.1f} s ({checked / elapsed:,.0f} attempts/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Benchmark: bytes on the wire and server time for the catalog pages, first visit versus
+# repeat visits that send back the ETag (304 Not Modified), with and without gzip.
+# Run from the project folder: python benchmarks/repeat_visits.py [requests per case]
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as folder:
+        from app import create_app
+        from models.bootstrap import initialize_database
+        from benchmarks.dataset import generate
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            initialize_database()
+            generate(users=200, subjects=5, scores=4000, questions=2000, log=lambda message: None)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 2
+            session["role"] = "user"
+        client.get("/view_quizzes/1")  # Warm the caches
+
+        pages = ["/user_dashboard", "/view_quizzes/1", "/quiz_results/" + _attempted_quiz(app)]
+        cases = (
+            ("full", {}),
+            ("full, gzip", {"Accept-Encoding": "gzip"}),
+            ("repeat (304)", None),
+        )
+        print(f"{'page':<18} {'case':<14} {'bytes':>8} {'median µs':>10}")
+        for page in pages:
+            etag = client.get(page).headers["ETag"]
+            for name, headers in cases:
+                headers = headers if headers is not None else {"If-None-Match": etag}
+                times = []
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = client.get(page, headers=headers)
+                    times.append(time.perf_counter() - start)
+                print(f"{page:<18} {name:<14} {len(response.data):>8} {statistics.median(times) * 1e6:>10.0f}")
+
+
+def _attempted_quiz(app):
+    from models.models import Score
+    with app.app_context():
+        return str(Score.query.filter_by(user_id=2).first().quiz_id)
+
+
+if __name__ == "__main__":
+    main()
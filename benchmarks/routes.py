@@ -0,0 +1,222 @@
+# Per-route load benchmark: drives the Flask routes through the test client against a database
+# filled by benchmarks/dataset.py and reports p50/p95/p99 latency, throughput and SQL queries per request.
+# Results can be written as JSON and compared with the results of another commit:
+#   python benchmarks/dataset.py /tmp/bench.db --users 100000 --scores 1000000 --questions 500000
+#   python benchmarks/routes.py /tmp/bench.db --requests 200 --json before.json
+#   ... change something ...
+#   python benchmarks/routes.py /tmp/bench.db --requests 200 --json after.json --compare before.json
+# Submissions add attempts, so run the comparison on a copy of the same database for both commits.
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class QueryCounter:
+    """ Counts the SQL statements sent by every connection of an engine """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def sample_ids(app):
+    """ Ids the routes are called with, taken from the database """
+    from sqlalchemy import select, func
+    from models.models import db, User, Subject, Quiz, Question, Score
+    rng = random.Random(1)
+    with app.app_context():
+        admin_id = db.session.execute(select(User.id).where(User.role == "admin")).scalar()
+        user_ids = db.session.execute(
+            select(Score.user_id).group_by(Score.user_id).order_by(func.random()).limit(200)
+        ).scalars().all()
+        now = datetime.now()
+        quiz_ids = db.session.execute(
+            select(Quiz.id).where(Quiz.date_of_quiz <= now, Quiz.id.in_(select(Question.quiz_id)))
+            .order_by(func.random()).limit(200)
+        ).scalars().all()
+        subject_ids = db.session.execute(select(Subject.id)).scalars().all()
+        attempted = {
+            user_id: db.session.execute(select(Score.quiz_id).where(Score.user_id == user_id)).scalars().all()
+            for user_id in user_ids
+        }
+        answers = {}
+        for quiz_id in quiz_ids:
+            answers[quiz_id] = {f"question_{question_id}": str(rng.randint(1, 4)) for question_id in
+                                db.session.execute(select(Question.id).where(Question.quiz_id == quiz_id)).scalars()}
+    if not user_ids or not quiz_ids:
+        sys.exit("The database has no scores or no open quizzes: fill it with benchmarks/dataset.py first")
+    return admin_id, user_ids, quiz_ids, subject_ids, attempted, answers
+
+
+def route_plans(ids):
+    """ name -> (role, function(rng) returning (method, url, form data)) """
+    admin_id, user_ids, quiz_ids, subject_ids, attempted, answers = ids
+    search_words = ("algebra", "energy", "sonnet", "circuit", "genome", "user1")
+
+    def results_url(rng, user_id):
+        return "GET", f"/quiz_results/{rng.choice(attempted[user_id])}", None
+
+    def submission(rng, user_id):
+        quiz_id = rng.choice(quiz_ids)
+        return "POST", f"/attempt_quiz/{quiz_id}", answers[quiz_id]
+
+    return {
+        "user_dashboard": ("user", lambda rng, user_id: ("GET", "/user_dashboard", None)),
+        "view_quizzes": ("user", lambda rng, user_id: ("GET", f"/view_quizzes/{rng.choice(subject_ids)}", None)),
+        "attempt_quiz_get": ("user", lambda rng, user_id: ("GET", f"/attempt_quiz/{rng.choice(quiz_ids)}", None)),
+        "attempt_quiz_post": ("user", submission),
+        "quiz_results": ("user", results_url),
+        "quiz_summary": ("user", lambda rng, user_id: ("GET", "/quiz_summary", None)),
+        "user_search": ("user", lambda rng, user_id: ("GET", f"/user_search?query={rng.choice(search_words)}", None)),
+        "admin_dashboard": ("admin", lambda rng, user_id: ("GET", "/admin_dashboard", None)),
+        "view_users": ("admin", lambda rng, user_id: ("GET", "/admin/users", None)),
+        "view_users_by_score": ("admin", lambda rng, user_id: ("GET", "/admin/users?sort=score", None)),
+        "manage_questions": ("admin", lambda rng, user_id: ("GET", f"/admin/questions/{rng.choice(quiz_ids)}", None)),
+        "admin_search": ("admin", lambda rng, user_id: ("GET", f"/admin_search?query={rng.choice(search_words)}", None)),
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(app, counter, role, plan, ids, requests, threads, warmup):
+    admin_id, user_ids = ids[0], ids[1]
+    latencies = []
+    failures = []
+
+    def worker(index, count):
+        rng = random.Random(index)
+        client = app.test_client()
+        user_id = admin_id if role == "admin" else user_ids[index % len(user_ids)]
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+            session["role"] = role
+        for _ in range(count):
+            if role == "user":
+                user_id = rng.choice(user_ids)
+                with client.session_transaction() as session:
+                    session["user_id"] = user_id
+            method, url, data = plan(rng, user_id)
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                failures.append(f"{method} {url} -> {response.status_code}")
+
+    worker(-1, warmup)
+    latencies.clear()
+    failures.clear()
+
+    queries_before = counter.count
+    per_thread = [requests // threads + (1 if i < requests % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(i, count)) for i, count in enumerate(per_thread)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        # Queries include the group-committed writes of submissions, made by the writer thread
+        "queries_per_request": round((counter.count - queries_before) / len(latencies), 2),
+        "failures": len(failures),
+    }, failures[:3]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_file):
+    with open(baseline_file) as file:
+        baseline = json.load(file)
+    print(f"\nCompared with {baseline_file} (commit {baseline['meta'].get('commit')})")
+    print(f"{'route':<22} {'p50':>9} {'p95':>9} {'rps':>9} {'queries':>9}")
+    for name, result in results["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "throughput_rps"):
+            changes.append(f"{(result[key] / before[key] - 1) * 100 if before[key] else 0:>+8.0f}%")
+        changes.append(f"{result['queries_per_request'] - before['queries_per_request']:>+9.1f}")
+        print(f"{name:<22} " + " ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-route latency, throughput and query counts")
+    parser.add_argument("database", help="SQLite file filled by benchmarks/dataset.py")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per route first")
+    parser.add_argument("--threads", type=int, default=1, help="concurrent test clients")
+    parser.add_argument("--routes", help="comma-separated subset of the routes")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models.models import db
+    from models.bootstrap import initialize_database
+    from models.attempts import attempt_writer
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.abspath(args.database)}"})
+
+    with app.app_context():
+        initialize_database()
+        counter = QueryCounter(db.engine)
+    ids = sample_ids(app)
+    plans = route_plans(ids)
+    names = args.routes.split(",") if args.routes else list(plans)
+
+    results = {
+        "meta": {"commit": git_commit(), "date": datetime.now().isoformat(timespec="seconds"),
+                 "database": os.path.abspath(args.database), "requests": args.requests,
+                 "threads": args.threads, "python": platform.python_version()},
+        "routes": {},
+    }
+    print(f"{'route':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}")
+    for name in names:
+        role, plan = plans[name]
+        result, failures = measure(app, counter, role, plan, ids, args.requests, args.threads, args.warmup)
+        results["routes"][name] = result
+        print(f"{name:<22} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['throughput_rps']:>8.1f} {result['queries_per_request']:>8.1f}")
+        for failure in failures:
+            print(f"  failed: {failure}")
+    attempt_writer.close()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
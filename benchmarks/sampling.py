@@ -0,0 +1,81 @@
+# Benchmark: serving 20 random questions out of a 2,000-question bank (defaults), per learner:
+# a first visit (draw from the cached id array, store the sample), a repeat visit (read the stored sample)
+# and ORDER BY RANDOM() LIMIT 20 for comparison.
+# Run from the project folder: python benchmarks/sampling.py [bank size] [sample size]
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert, func
+from models.models import db, User, Subject, Chapter, Quiz, Question
+from models.answer_cache import answer_key_cache
+from models.sampling import served_answer_key
+
+LEARNERS = 300
+
+
+def seed(bank, sample):
+    subject = Subject(name="Bench")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Bench")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1), sample_size=sample)
+    db.session.add(quiz)
+    db.session.flush()
+    db.session.execute(insert(Question.__table__), [
+        {"quiz_id": quiz.id, "question_statement": f"Question {i} " + "text " * 30, "option1": "a", "option2": "b",
+         "option3": "c", "option4": "d", "correct_option": 1 + i % 4} for i in range(bank)
+    ])
+    db.session.execute(insert(User.__table__), [
+        {"id": user_id, "email": f"user{user_id}@bench", "password": "x", "full_name": "Bench"}
+        for user_id in range(1, LEARNERS + 1)
+    ])
+    db.session.commit()
+    return quiz.id
+
+
+def timed(call):
+    times = []
+    for user_id in range(1, LEARNERS + 1):
+        start = time.perf_counter()
+        call(user_id)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    bank = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as folder:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            quiz_id = seed(bank, sample)
+            quiz = db.session.get(Quiz, quiz_id)
+            answer_key_cache.get(quiz)  # Loaded once per process and quiz version
+
+            def served(user_id):
+                key = served_answer_key(db.session.get(Quiz, quiz_id), user_id, answer_key_cache.get(quiz))
+                assert len(key.questions) == sample
+
+            def order_by_random(user_id):
+                Question.query.filter_by(quiz_id=quiz_id).order_by(func.random()).limit(sample).all()
+
+            print(f"{sample} of {bank} questions, median over {LEARNERS} learners")
+            print(f"{'first visit (draw + store)':<28} {timed(served):>8.3f} ms")
+            print(f"{'repeat visit (stored sample)':<28} {timed(served):>8.3f} ms")
+            print(f"{'ORDER BY RANDOM() LIMIT':<28} {timed(order_by_random):>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Benchmark: the dashboard's open / upcoming quizzes feed over a large catalog (10,000 quizzes by default).
+# Compares loading every quiz and filtering in Python, the feed's range scan with and without ix_quiz_date_of_quiz,
+# and the user dashboard with its fragments rendered on every request versus the feed cached per time bucket.
+# Run from the project folder: python benchmarks/schedule.py [quizzes per chapter] [requests]
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(call, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def python_filter():
+    """ Every quiz with its chapter and subject, split by date in Python """
+    from models.models import Quiz
+    from models.schedule import FEED_DAYS, FEED_ITEMS
+    now = datetime.now()
+    window = timedelta(days=FEED_DAYS)
+    quizzes = sorted(Quiz.query.all(), key=lambda quiz: quiz.date_of_quiz)
+    open_now = [(quiz.chapter.subject.name, quiz) for quiz in quizzes if now - window <= quiz.date_of_quiz <= now]
+    upcoming = [(quiz.chapter.subject.name, quiz) for quiz in quizzes if now < quiz.date_of_quiz < now + window]
+    return open_now[::-1][:FEED_ITEMS], upcoming[:FEED_ITEMS]
+
+
+def quizzes_opening_statement(now, end):
+    from sqlalchemy import select
+    from models.models import db, Quiz
+    query = select(Quiz.id).where(Quiz.date_of_quiz > now, Quiz.date_of_quiz < end).order_by(Quiz.date_of_quiz, Quiz.id).limit(10)
+    return query.compile(db.engine, compile_kwargs={"literal_binds": True})
+
+
+def main():
+    quizzes_per_chapter = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as folder:
+        from sqlalchemy import text
+        from app import create_app
+        from models.bootstrap import initialize_database
+        from models.models import db
+        from models.fragments import fragment_cache
+        from models.schedule import schedule_feed
+        from benchmarks.dataset import generate
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(folder, 'bench.db')}"})
+        with app.app_context():
+            initialize_database(log=lambda message: None)
+            counts = generate(users=100, subjects=20, chapters_per_subject=10, quizzes_per_chapter=quizzes_per_chapter,
+                              questions=quizzes_per_chapter * 200, scores=1000, log=lambda message: None)
+            open_now, upcoming, _ = schedule_feed()
+            print(f"{counts['quizzes']} quizzes, feed: {len(open_now)} open now, {len(upcoming)} opening soon")
+            now = datetime.now()
+            statement = quizzes_opening_statement(now, now + timedelta(days=7))
+            print("Opening soon:", "; ".join(row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))))
+
+            runs = max(requests // 10, 5)
+            print(f"Feed query, median over {runs} runs:")
+            print(f"  {'all quizzes, Python filter':<34} {timed(lambda: (python_filter(), db.session.expunge_all()), runs):>8.2f} ms")
+            db.session.execute(text("DROP INDEX ix_quiz_date_of_quiz"))
+            print(f"  {'feed queries, no date index':<34} {timed(schedule_feed, runs):>8.2f} ms")
+            db.session.execute(text("CREATE INDEX ix_quiz_date_of_quiz ON quiz (date_of_quiz)"))
+            db.session.commit()
+            print(f"  {'feed queries, ix_quiz_date_of_quiz':<34} {timed(schedule_feed, runs):>8.2f} ms")
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = 2
+        print(f"User dashboard, median over {requests} requests:")
+        backend = fragment_cache.backend
+        for name, cache in (("fragments rendered every request", None), ("feed cached per time bucket", backend)):
+            fragment_cache.backend = cache
+            client.get("/user_dashboard")
+            print(f"  {name:<34} {timed(lambda: client.get('/user_dashboard'), requests):>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark: start-up cost of a worker. Reports the slowest imports of `create_app()` (python -X importtime),
+# then the median time over fresh interpreters to import and create the app, with and without the database setup
+# (`init-db`) that used to run on every start, and to serve a first request from a cold interpreter versus from
+# a worker forked out of a preloaded app (gunicorn --preload).
+# Run from the project folder: python benchmarks/startup.py [runs] [database file]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CREATE = "from app import create_app; app = create_app()"
+INITIALIZE = "from models.bootstrap import initialize_database\nwith app.app_context(): initialize_database(log=lambda message: None)"
+FIRST_REQUEST = "app.test_client().get('/login')"
+
+
+def timed_python(code, environment):
+    """ Seconds from interpreter start-up to the end of code, measured inside the child """
+    script = f"import time\nstart = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=environment, check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+
+def import_profile(environment, top=12):
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", CREATE], cwd=ROOT, env=environment,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    print(f"Slowest imports (self time), {sum(row[0] for row in rows) / 1000:.0f} ms in total:")
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms cumulative  {name.strip()}")
+    own = [row for row in rows if row[2].strip().split(".")[0] in ("app", "models", "views")]
+    print(f"  of which the project's own modules: {sum(row[0] for row in own) / 1000:.0f} ms")
+
+
+def forked_first_request(runs):
+    """ First request latency in workers forked from a process that created the app once """
+    from app import create_app
+    app = create_app()
+    times = []
+    for _ in range(runs):
+        read, write = os.pipe()
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            app.test_client().get("/login")
+            os.write(write, str(time.perf_counter() - start).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as pipe:
+            times.append(float(pipe.read()))
+        os.waitpid(pid, 0)
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as folder:
+        database = sys.argv[2] if len(sys.argv) > 2 else os.path.join(folder, "bench.db")
+        os.environ["FLASK_SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath(database)}"
+        environment = dict(os.environ)
+        timed_python(f"{CREATE}\n{INITIALIZE}", environment)  # Create the schema once
+
+        import_profile(environment)
+        print(f"\nMedian over {runs} fresh interpreters:")
+        for name, code in (
+            ("import app", "import app"),
+            ("create_app()", CREATE),
+            ("create_app() + init-db", f"{CREATE}\n{INITIALIZE}"),
+            ("cold worker, first request", f"{CREATE}\n{FIRST_REQUEST}"),
+        ):
+            times = [timed_python(code, environment) for _ in range(runs)]
+            print(f"  {name:<28} {statistics.median(times) * 1000:>8.1f} ms")
+        if hasattr(os, "fork"):
+            times = forked_first_request(runs)
+            print(f"  {'forked worker, first request':<28} {statistics.median(times) * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
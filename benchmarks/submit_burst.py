@@ -0,0 +1,90 @@
+# Benchmark: sustained quiz submissions per second during a burst, one commit per submission
+# versus the group-committing AttemptWriter used by attempt_quiz.
+# Run from the project folder: python benchmarks/submit_burst.py [threads] [submissions per thread]
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+from models.models import db, User, Subject, Chapter, Quiz, Question
+from models.attempts import PendingAttempt, AttemptWriter, write_attempts
+
+QUESTIONS = 20
+
+
+def seed(users):
+    subject = Subject(name="Bench")
+    db.session.add(subject)
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Bench")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime(2025, 1, 1))
+    db.session.add(quiz)
+    db.session.flush()
+    question_ids = tuple(row[0] for row in db.session.execute(
+        insert(Question.__table__).returning(Question.id, sort_by_parameter_order=True),
+        [{"quiz_id": quiz.id, "question_statement": "Q", "option1": "a", "option2": "b",
+          "option3": "c", "option4": "d", "correct_option": 1} for _ in range(QUESTIONS)],
+    ))
+    user_ids = [row[0] for row in db.session.execute(
+        insert(User.__table__).returning(User.id, sort_by_parameter_order=True),
+        [{"email": f"{i}@bench", "password": "x", "full_name": "Bench", "role": "user"} for i in range(users)],
+    )]
+    db.session.commit()
+    return (quiz.id, quiz.chapter_id, quiz.questions_version), question_ids, user_ids
+
+
+def burst(app, submit, quiz, question_ids, user_ids, per_thread):
+    quiz_id, chapter_id, version = quiz
+    def worker(user_id):
+        with app.app_context():
+            for i in range(per_thread):
+                submit(PendingAttempt(user_id, quiz_id, chapter_id, i % QUESTIONS, QUESTIONS,
+                                      bytes([1]) * QUESTIONS, version, question_ids))
+            db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(user_ids) * per_thread / (time.perf_counter() - start)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as folder:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(folder, 'bench.db')}"
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": threads + 2, "connect_args": {"timeout": 60}}
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            quiz, question_ids, user_ids = seed(threads)
+
+        def commit_each(attempt):
+            write_attempts([attempt])
+
+        writer = AttemptWriter()
+        with app.app_context():
+            writer._ensure_running()
+
+        print(f"{threads} threads x {per_thread} submissions")
+        for name, submit in (("commit per submission", commit_each), ("group commit", writer.submit)):
+            rate = burst(app, submit, quiz, question_ids, user_ids, per_thread)
+            print(f"  {name:<22} {rate:>8,.0f} submissions/s")
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import select, update
+from models.models import db, Quiz, Question
+
+
+# Read-only copy of a question, safe to share between requests
+QuestionRecord = namedtuple(
+    "QuestionRecord",
+    ["id", "quiz_id", "question_statement", "option1", "option2", "option3", "option4", "correct_option"],
+)
+
+
+class QuizAnswerKey:
+    """ Ordered questions of a quiz plus a compact answer key aligned with them """
+
+    def __init__(self, questions, version):
+        self.questions = tuple(questions)
+        self.version = version  # questions_version the questions were read at; also the layout of packed answers
+        self.question_ids = tuple(question.id for question in self.questions)
+        self.answer_key = bytes(question.correct_option for question in self.questions)
+        self._positions = None
+
+    def subset(self, question_ids, version):
+        """ Key of the given questions in the given order (those still in the quiz), with its own layout version """
+        if self._positions is None:
+            self._positions = {question_id: index for index, question_id in enumerate(self.question_ids)}
+        positions = (self._positions.get(question_id) for question_id in question_ids)
+        return QuizAnswerKey((self.questions[index] for index in positions if index is not None), version)
+
+    def grade(self, answers):
+        """
+        Grade a mapping like request.form ("question_<id>" -> "1".."4").
+        Returns (correct answers, packed answers: one byte per question, 0 = not answered).
+        """
+        return self._grade(lambda question_id: answers.get(f"question_{question_id}"))
+
+    def grade_by_id(self, answers):
+        """ Grade a mapping {question id (int or str): option 1-4}, as sent to the JSON API """
+        return self._grade(lambda question_id: answers.get(question_id, answers.get(str(question_id))))
+
+    def _grade(self, answer_for):
+        packed = bytearray(len(self.question_ids))
+        correct = 0
+        for index, question_id in enumerate(self.question_ids):
+            answer = answer_for(question_id)
+            if not answer:
+                continue
+            try:
+                answer = int(answer)
+            except (TypeError, ValueError):
+                continue
+            if answer not in (1, 2, 3, 4):
+                continue
+            packed[index] = answer
+            if answer == self.answer_key[index]:
+                correct += 1
+        return correct, bytes(packed)
+
+
+class AnswerKeyCache:
+    """
+    Bounded LRU of QuizAnswerKey objects keyed by (quiz id, questions_version).
+    Every change to a quiz's questions writes a new questions_version, so other
+    workers miss on their next lookup even though only this process evicts its entry.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quiz):
+        """
+        Answer key of the quiz's questions. The questions and the version are separate reads, so the version is
+        read again after the questions: if the questions changed in between, they are loaded again for the new
+        version instead of being cached under the old one. The key's version can be newer than quiz.questions_version.
+        """
+        version = quiz.questions_version
+        while True:
+            key = (quiz.id, version)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+
+            rows = db.session.execute(
+                select(Question.id, Question.quiz_id, Question.question_statement, Question.option1,
+                       Question.option2, Question.option3, Question.option4, Question.correct_option)
+                .where(Question.quiz_id == quiz.id)
+                .order_by(Question.id)
+            ).all()
+            current = db.session.execute(select(Quiz.questions_version).where(Quiz.id == quiz.id)).scalar()
+            if current is None or current == version:
+                break
+            version = current
+        entry = QuizAnswerKey((QuestionRecord(*row) for row in rows), version)
+        if current is None:
+            return entry  # The quiz was deleted meanwhile: nothing to cache
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def evict(self, quiz_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == quiz_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+answer_key_cache = AnswerKeyCache()
+
+
+def questions_changed(quiz_id):
+    """ Record that a quiz's questions changed (call before the commit that changes them) """
+    db.session.execute(update(Quiz).where(Quiz.id == quiz_id).values(questions_version=time.time_ns()))
+    answer_key_cache.evict(quiz_id)
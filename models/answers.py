@@ -0,0 +1,104 @@
+import hashlib
+import operator
+import threading
+from array import array
+from collections import OrderedDict
+from models.models import db, QuestionLayout
+from models.engine import upsert_insert
+
+
+# Answers of an attempt are stored as one byte per question (0 = not answered, else the option 1-4).
+# The byte order follows a "layout": the quiz's question ids, ordered by id, at a given questions_version.
+# Layouts are stored once per quiz version in QuestionLayout, so attempts carry no question ids at all.
+# Sampled quizzes serve each learner a subset of the questions in their own order (models/sampling.py).
+# Those served sets are layouts too, stored under a negative version derived from their question ids,
+# so decoding, regrading and statistics treat them like any other layout.
+NOT_IN_KEY = 255  # Marks layout positions whose question no longer exists; never equals a stored answer
+
+_layouts = OrderedDict()  # (quiz_id, version) -> tuple of question ids
+_layouts_lock = threading.Lock()
+_MAX_LAYOUTS = 1024
+
+
+def pack_layout(question_ids):
+    return array("q", question_ids).tobytes()
+
+
+def unpack_layout(blob):
+    ids = array("q")
+    ids.frombytes(blob)
+    return tuple(ids)
+
+
+def _remember(quiz_id, version, question_ids):
+    with _layouts_lock:
+        _layouts[(quiz_id, version)] = question_ids
+        _layouts.move_to_end((quiz_id, version))
+        while len(_layouts) > _MAX_LAYOUTS:
+            _layouts.popitem(last=False)
+
+
+def sampled_layout_version(question_ids):
+    """ Negative version of a served question set; the same ids in the same order always get the same version """
+    digest = hashlib.sha1(pack_layout(question_ids)).digest()
+    return -(int.from_bytes(digest[:8], "big") >> 1) - 1
+
+
+def is_sampled_layout(version):
+    return version is not None and version < 0
+
+
+def get_layout(quiz_id, version):
+    """ Question ids of a stored layout, or None """
+    with _layouts_lock:
+        question_ids = _layouts.get((quiz_id, version))
+    if question_ids is not None:
+        return question_ids
+    layout = db.session.get(QuestionLayout, (quiz_id, version))
+    if not layout:
+        return None
+    question_ids = unpack_layout(layout.question_ids)
+    _remember(quiz_id, version, question_ids)
+    return question_ids
+
+
+def ensure_layout(quiz_id, version, question_ids):
+    """
+    Store the layout of a quiz version if it isn't stored yet, inside the caller's transaction.
+    On SQLite and PostgreSQL this is a single INSERT ... ON CONFLICT DO NOTHING (a primary key probe).
+    """
+    values = {"quiz_id": quiz_id, "version": version, "question_ids": pack_layout(question_ids)}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # Another worker may store the same layout at the same time
+        insert = upsert_insert(dialect)
+        db.session.execute(insert(QuestionLayout).values(**values).on_conflict_do_nothing())
+    else:
+        db.session.merge(QuestionLayout(**values))
+
+
+def pack_answers(answers_by_question, question_ids):
+    """ {question id: option} -> bytes aligned with question_ids """
+    return bytes(answers_by_question.get(question_id, 0) for question_id in question_ids)
+
+
+def aligned_key(layout_ids, correct_by_question):
+    """ Current correct options in the order of an older layout, NOT_IN_KEY for removed questions """
+    return bytes(correct_by_question.get(question_id, NOT_IN_KEY) for question_id in layout_ids)
+
+
+def count_correct(packed_answers, key):
+    """ Number of answers that match a key with the same layout. Unanswered (0) never matches. """
+    return sum(map(operator.eq, packed_answers, key))
+
+
+def answers_for_questions(packed_answers, layout_ids, question_ids):
+    """ Selected option (or None) for each of question_ids, read from answers stored with layout_ids """
+    if layout_ids == question_ids:
+        return [answer or None for answer in packed_answers]
+    position = {question_id: index for index, question_id in enumerate(layout_ids)}
+    answers = []
+    for question_id in question_ids:
+        index = position.get(question_id)
+        answers.append(packed_answers[index] or None if index is not None and index < len(packed_answers) else None)
+    return answers
@@ -0,0 +1,440 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, insert
+from flask import current_app
+from models.models import db, Quiz, AttemptSession, AttemptSessionAnswer
+from models.engine import upsert_insert
+from models.answers import get_layout, is_sampled_layout
+from models.answer_cache import answer_key_cache
+from models.sampling import served_answer_key
+from models.attempts import PendingAttempt, write_attempts
+
+
+# Attempt sessions: an attempt that is started, autosaved answer by answer and graded from its saved answers,
+# either when the learner submits or, once the time limit has passed, by the sweeper.
+# An autosave is committed before it is acknowledged, so whichever worker grades the session sees it. Autosaves
+# arriving in a worker while another one is being written wait and are then written together in one transaction
+# (group commit), so a class autosaving at once costs a few transactions per second instead of one commit per
+# click, without answers that only one process knows about.
+# Whether a session is still open is decided by the write itself: it first locks the session rows that are not
+# finished, and finishing claims the session and reads its answers in one transaction. An autosave either commits
+# before the claim, and is graded, or sees the session finished and is rejected; it is never acknowledged and lost.
+
+
+SessionInfo = namedtuple("SessionInfo", ["user_id", "quiz_id", "deadline", "layout_version"])
+
+
+def _now():
+    return datetime.utcnow()
+
+
+class _AutosaveBatch:
+    """ Autosaves written together in one transaction """
+
+    def __init__(self):
+        self.answers = {}  # session id -> {question id: answer}
+        self.closed = set()  # Sessions that were finished by the time the batch was written; their answers were dropped
+        self.done = False
+        self.error = None
+
+
+class AutosaveWriter:
+    """ Writes autosaved answers with group commit, plus the background thread that sweeps expired sessions """
+
+    def __init__(self, sweep_interval=30.0, grace=timedelta(seconds=30)):
+        self.sweep_interval = sweep_interval
+        self.grace = grace  # Time after the deadline in which answers and submissions are still accepted
+        self._batch = None  # Autosaves waiting for the transaction being written to finish
+        self._writing = False
+        self._sessions = OrderedDict()  # session id -> SessionInfo of sessions seen open, to check autosaves without a query
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self.saved = 0
+        self.commits = 0
+        self.swept = 0
+
+    # ---- autosave ----
+
+    def session_info(self, session_id):
+        """
+        SessionInfo of a session, from memory or one primary key read; None if it is unknown or known to be finished.
+        Another worker may have finished a remembered session: save() finds out when it writes.
+        """
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is not None:
+                self._sessions.move_to_end(session_id)
+                return info
+        row = db.session.get(AttemptSession, session_id)
+        if row is None or row.finished_at is not None:
+            return None
+        return self.remember(row)
+
+    def remember(self, row):
+        info = SessionInfo(row.user_id, row.quiz_id, row.deadline, row.layout_version)
+        with self._lock:
+            self._sessions[row.id] = info
+            while len(self._sessions) > 10000:
+                self._sessions.popitem(last=False)
+        return info
+
+    def forget(self, session_ids):
+        with self._lock:
+            for session_id in session_ids:
+                self._sessions.pop(session_id, None)
+
+    def save(self, session_id, answers):
+        """
+        Write {question id: option (0 clears)} for a session; returns once it is committed. While a write is
+        running, new autosaves join the next batch, and the first of them writes that batch for all of them.
+        Returns False, with nothing written, if the session has been finished.
+        """
+        if not answers:
+            return True
+        with self._lock:
+            if self._batch is None:
+                self._batch = _AutosaveBatch()
+            batch = self._batch
+            batch.answers.setdefault(session_id, {}).update(answers)  # The latest value of each question wins
+            self.saved += len(answers)
+            while self._writing and not batch.done:
+                self._written.wait()
+            if not batch.done:
+                self._writing = True
+                self._batch = None
+
+        if not batch.done:
+            try:
+                batch.closed = _write_answers(batch.answers)
+            except Exception as error:
+                batch.error = error
+            with self._lock:
+                batch.done = True
+                self._writing = False
+                if batch.error is None:
+                    self.commits += 1
+                self._written.notify_all()
+        if batch.error is not None:
+            raise batch.error
+        if session_id in batch.closed:
+            self.forget([session_id])
+            return False
+        return True
+
+    # ---- background thread ----
+
+    def _ensure_running(self):
+        with self._lock:
+            # Threads don't survive a fork, so a forked worker starts its own
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._app = current_app._get_current_object()
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attempt-sessions", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            with self._app.app_context():
+                try:
+                    self.swept += sweep_expired_sessions()
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception("Finishing expired attempt sessions failed")
+                finally:
+                    db.session.remove()
+
+    def start(self):
+        """ Run the sweep thread in this process """
+        self._ensure_running()
+
+    def stats(self):
+        with self._lock:
+            pending = sum(len(answers) for answers in self._batch.answers.values()) if self._batch else 0
+            return {"pending": pending, "saved": self.saved, "commits": self.commits, "swept": self.swept}
+
+    def close(self):
+        """ Stop the sweep thread """
+        with self._lock:
+            running = self._thread and self._thread.is_alive() and self._pid == os.getpid()
+        if running:
+            self._stop.set()
+            self._thread.join()
+        self._thread = None
+
+
+autosave_writer = AutosaveWriter()
+atexit.register(autosave_writer.close)
+
+
+def install_attempt_sessions(app):
+    """ Time limit settings """
+    app.config.setdefault("SESSION_SWEEP_SECONDS", 30)    # How often expired sessions are graded
+    app.config.setdefault("ATTEMPT_GRACE_SECONDS", 30)    # Accepted lateness for answers sent just before the deadline
+    autosave_writer.sweep_interval = float(app.config["SESSION_SWEEP_SECONDS"])
+    autosave_writer.grace = timedelta(seconds=float(app.config["ATTEMPT_GRACE_SECONDS"]))
+
+
+def _lock_open_sessions(connection, session_ids):
+    """
+    Ids of the sessions that are still open, locked until the transaction ends: the no-op UPDATE takes SQLite's
+    write lock (row locks elsewhere), so a session can't be claimed between this check and the commit.
+    """
+    lock = (
+        update(AttemptSession)
+        .where(AttemptSession.id.in_(session_ids), AttemptSession.finished_at.is_(None))
+        .values(finished_at=None)
+    )
+    if connection.dialect.name in ("sqlite", "postgresql"):
+        return set(connection.execute(lock.returning(AttemptSession.id)).scalars())
+    return {session_id for session_id in session_ids
+            if connection.execute(lock.where(AttemptSession.id == session_id)).rowcount}
+
+
+def _write_answers(answers):
+    """
+    Upsert {session id: {question id: answer}} of the sessions that are still open, in a transaction of its own.
+    Returns the ids of the sessions that were already finished, whose answers were not written.
+    """
+    with db.engine.begin() as connection:
+        open_ids = _lock_open_sessions(connection, list(answers))
+        rows = [{"session_id": session_id, "question_id": question_id, "answer": answer}
+                for session_id, session_answers in answers.items() if session_id in open_ids
+                for question_id, answer in session_answers.items()]
+        if not rows:
+            return set(answers)
+        dialect = connection.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            statement = upsert_insert(dialect)(AttemptSessionAnswer)
+            connection.execute(
+                statement.on_conflict_do_update(index_elements=["session_id", "question_id"],
+                                                set_={"answer": statement.excluded.answer}),
+                rows,
+            )
+        else:
+            for row in rows:
+                connection.execute(delete(AttemptSessionAnswer).where(
+                    AttemptSessionAnswer.session_id == row["session_id"],
+                    AttemptSessionAnswer.question_id == row["question_id"]))
+            connection.execute(insert(AttemptSessionAnswer), rows)
+    return set(answers) - open_ids
+
+
+# ---- sessions ----
+
+def is_open(row, now=None):
+    """ Answers and submissions are accepted until the deadline plus the grace period """
+    if row.finished_at is not None:
+        return False
+    return row.deadline is None or (now or _now()) <= row.deadline + autosave_writer.grace
+
+
+def open_session(user_id, quiz_id):
+    """ The user's unfinished session on a quiz, or None """
+    return (
+        AttemptSession.query
+        .filter_by(user_id=user_id, quiz_id=quiz_id, finished_at=None)
+        .order_by(AttemptSession.id.desc())
+        .first()
+    )
+
+
+def start_session(quiz, user_id):
+    """ Resume the user's running session on the quiz, or start one (grading an expired one first). Commits. """
+    autosave_writer.start()  # This worker now also sweeps expired sessions
+    row = open_session(user_id, quiz.id)
+    if row is not None:
+        if is_open(row):
+            autosave_writer.remember(row)
+            return row
+        finish_expired([row])
+
+    # A sampled quiz serves the user's sample; the session keeps its layout so grading sees the same questions
+    answer_key = served_answer_key(quiz, user_id, answer_key_cache.get(quiz))
+    now = _now()
+    row = AttemptSession(
+        user_id=user_id,
+        quiz_id=quiz.id,
+        layout_version=answer_key.version if is_sampled_layout(answer_key.version) else None,
+        started_at=now,
+        # At least a minute, even for a limit stored out of range before quiz forms were validated
+        deadline=now + timedelta(minutes=max(quiz.time_limit, 1)) if quiz.time_limit else None,
+    )
+    db.session.add(row)
+    db.session.commit()
+    autosave_writer.remember(row)
+    return row
+
+
+def session_answer_key(row, quiz):
+    """ Key of the questions the session (row or SessionInfo) was served: the user's sample, or the quiz's current questions """
+    answer_key = answer_key_cache.get(quiz)
+    if is_sampled_layout(row.layout_version):
+        return answer_key.subset(get_layout(quiz.id, row.layout_version) or (), row.layout_version)
+    return answer_key
+
+
+def saved_answers(session_id):
+    """ {question id: option} saved so far; cleared answers are left out """
+    return dict(db.session.execute(
+        select(AttemptSessionAnswer.question_id, AttemptSessionAnswer.answer)
+        .where(AttemptSessionAnswer.session_id == session_id, AttemptSessionAnswer.answer != 0)
+    ).all())
+
+
+def clean_answers(answers, answer_key):
+    """
+    {question id: option 0-4} from a JSON object of autosaved answers to the questions of answer_key (the session's).
+    Raises ValueError with a message for the client if an id or answer is malformed or the question isn't in the key.
+    """
+    known = set(answer_key.question_ids)
+    cleaned = {}
+    for question_id, answer in answers.items():
+        try:
+            question_id, answer = int(question_id), int(answer)
+        except (TypeError, ValueError):
+            raise ValueError("Question ids and answers must be numbers") from None
+        if question_id not in known:
+            raise ValueError(f"Question {question_id} is not part of this session")
+        if answer not in (0, 1, 2, 3, 4):
+            raise ValueError(f"Answer to {question_id} must be 0 to 4")
+        cleaned[question_id] = answer
+    return cleaned
+
+
+def form_answers(answer_key, form):
+    """ {question id: option} of the key's questions answered in a submitted form ("question_<id>" -> "1".."4") """
+    answers = {}
+    for question_id in answer_key.question_ids:
+        value = form.get(f"question_{question_id}")
+        if value in ("1", "2", "3", "4"):
+            answers[question_id] = int(value)
+    return answers
+
+
+def seconds_left(row, now=None):
+    if row.deadline is None:
+        return None
+    return max(0, int((row.deadline - (now or _now())).total_seconds()))
+
+
+def _graded(row, quiz, answers):
+    """ PendingAttempt of a session graded from its saved answers """
+    answer_key = session_answer_key(row, quiz)
+    correct, packed = answer_key.grade_by_id(answers)
+    return PendingAttempt(
+        user_id=row.user_id,
+        quiz_id=quiz.id,
+        chapter_id=quiz.chapter_id,
+        total_scored=correct,
+        total_questions=len(answer_key.question_ids),
+        answers=packed,
+        layout_version=answer_key.version,
+        question_ids=answer_key.question_ids,
+    )
+
+
+def _claim(session_ids):
+    """ Mark sessions finished; returns the ids this call finished (another worker may have got there first) """
+    now = _now()
+    claim = (
+        update(AttemptSession)
+        .where(AttemptSession.id.in_(session_ids), AttemptSession.finished_at.is_(None))
+        .values(finished_at=now)
+    )
+    if db.session.get_bind().dialect.name in ("sqlite", "postgresql"):
+        return set(db.session.execute(claim.returning(AttemptSession.id)).scalars())
+    claimed = set()
+    for session_id in session_ids:
+        if db.session.execute(claim.where(AttemptSession.id == session_id)).rowcount:
+            claimed.add(session_id)
+    return claimed
+
+
+def finish_session(row, quiz, submit):
+    """
+    Grade a session from its saved answers. submit(attempt) writes the attempt (the request's attempt_writer).
+    Returns the PendingAttempt, or None if the session was already finished. The claim and the read of the answers
+    are one transaction, and autosaves check the claim when they write, so every acknowledged answer is graded.
+    """
+    try:
+        claimed = row.id in _claim([row.id])
+        attempt = _graded(row, quiz, saved_answers(row.id)) if claimed else None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    autosave_writer.forget([row.id])
+    if attempt is None:
+        return None
+    try:
+        submit(attempt)
+    except Exception:
+        # Not saved: reopen the session so the learner can submit again or the sweeper picks it up
+        db.session.execute(update(AttemptSession).where(AttemptSession.id == row.id).values(finished_at=None))
+        db.session.commit()
+        raise
+    return attempt
+
+
+def finish_expired(rows):
+    """ Grade expired sessions from their saved answers and write their attempts in one transaction """
+    if not rows:
+        return 0
+    session_ids = [row.id for row in rows]
+    try:
+        claimed = _claim(session_ids)
+        quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_({row.quiz_id for row in rows}))}
+        attempts = [_graded(row, quizzes[row.quiz_id], saved_answers(row.id))
+                    for row in rows if row.id in claimed and row.quiz_id in quizzes]
+        if attempts:
+            write_attempts(attempts)  # Commits the claim together with the attempts
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    autosave_writer.forget(session_ids)
+    return len(attempts)
+
+
+def sweep_expired_sessions(batch_size=500):
+    """ Finish every open session whose deadline and grace period have passed. Returns the number graded. """
+    finished = 0
+    while True:
+        cutoff = _now() - autosave_writer.grace
+        rows = (
+            AttemptSession.query
+            .filter(AttemptSession.finished_at.is_(None), AttemptSession.deadline < cutoff)
+            .order_by(AttemptSession.deadline)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return finished
+        finished += finish_expired(rows)
+
+
+def _delete_sessions(sessions):
+    db.session.execute(delete(AttemptSessionAnswer).where(AttemptSessionAnswer.session_id.in_(sessions)),
+                       execution_options={"synchronize_session": False})
+    db.session.execute(delete(AttemptSession).where(AttemptSession.id.in_(sessions)),
+                       execution_options={"synchronize_session": False})
+
+
+def forget_quiz_sessions(quiz_ids):
+    """ Delete the sessions and saved answers of quizzes that are being deleted (a list or a SELECT of ids) """
+    _delete_sessions(select(AttemptSession.id).where(AttemptSession.quiz_id.in_(quiz_ids)))
+
+
+def forget_user_sessions(user_id):
+    """ Delete the sessions and saved answers of a user that is being deleted """
+    _delete_sessions(select(AttemptSession.id).where(AttemptSession.user_id == user_id))
@@ -0,0 +1,190 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert, tuple_
+from flask import current_app
+from models.models import db, Attempt, Score, UserChapterProgress, UserScoreTotal
+from models.progress import record_score_change
+from models.leaderboard import record_leaderboard_changes
+from models.item_stats import record_answer_counts
+from models.answers import ensure_layout
+
+
+class PendingAttempt:
+    """ A graded submission waiting to be written """
+
+    def __init__(self, user_id, quiz_id, chapter_id, total_scored, total_questions, answers, layout_version, question_ids):
+        self.user_id = user_id
+        self.quiz_id = quiz_id
+        self.chapter_id = chapter_id
+        self.total_scored = total_scored
+        self.total_questions = total_questions
+        self.answers = answers
+        self.layout_version = layout_version
+        self.question_ids = question_ids
+        self.time_stamp_of_attempt = datetime.utcnow()  # Time of submission, not of the write
+        self.done = threading.Event()
+        self.error = None
+
+
+def write_attempts(attempts):
+    """
+    Write a batch of attempts in one transaction: append them to the Attempt log,
+    replace each (user, quiz) latest Score and apply the chapter progress, user totals, leaderboard and
+    question statistics deltas.
+    """
+    layouts = {(a.quiz_id, a.layout_version): a.question_ids for a in attempts}
+    for (quiz_id, version), question_ids in layouts.items():
+        ensure_layout(quiz_id, version, question_ids)
+
+    db.session.execute(insert(Attempt.__table__), [
+        {"quiz_id": a.quiz_id, "user_id": a.user_id, "time_stamp_of_attempt": a.time_stamp_of_attempt,
+         "total_scored": a.total_scored, "total_questions": a.total_questions,
+         "answers": a.answers, "layout_version": a.layout_version}
+        for a in attempts
+    ])
+
+    # Load every latest score, progress row and user totals row the batch touches with three queries
+    pairs = {(a.user_id, a.quiz_id) for a in attempts}
+    latest = {
+        (score.user_id, score.quiz_id): score
+        for score in Score.query.filter(tuple_(Score.user_id, Score.quiz_id).in_(pairs))
+        .order_by(Score.time_stamp_of_attempt)
+    }
+    UserChapterProgress.query.filter(
+        tuple_(UserChapterProgress.user_id, UserChapterProgress.chapter_id).in_({(a.user_id, a.chapter_id) for a in attempts})
+    ).all()  # Keeps them in the session for record_score_change
+    UserScoreTotal.query.filter(UserScoreTotal.user_id.in_({a.user_id for a in attempts})).all()
+
+    leaderboard = {}  # (quiz_id, score) -> change in users
+    for a in attempts:
+        score = latest.get((a.user_id, a.quiz_id))
+        if score:
+            # Chapter totals change by the difference to the previous attempt
+            record_score_change(a.user_id, a.chapter_id,
+                                a.total_scored - score.total_scored, a.total_questions - score.total_questions)
+            previous = (a.quiz_id, score.total_scored)
+            leaderboard[previous] = leaderboard.get(previous, 0) - 1
+        else:
+            record_score_change(a.user_id, a.chapter_id, a.total_scored, a.total_questions, new_score=True)
+            score = Score(user_id=a.user_id, quiz_id=a.quiz_id)
+            latest[(a.user_id, a.quiz_id)] = score
+        score.total_scored = a.total_scored
+        score.total_questions = a.total_questions
+        score.answers = a.answers
+        score.layout_version = a.layout_version
+        score.time_stamp_of_attempt = a.time_stamp_of_attempt
+        db.session.add(score)
+        leaderboard[(a.quiz_id, a.total_scored)] = leaderboard.get((a.quiz_id, a.total_scored), 0) + 1
+
+    record_leaderboard_changes(leaderboard)
+    record_answer_counts(attempts)
+    db.session.commit()
+
+
+class AttemptWriter:
+    """
+    Group commit for quiz submissions. Requests put their attempt on a queue and wait;
+    a background thread writes whatever has queued up (up to max_batch, or after max_delay seconds)
+    in one transaction and then releases all of them. A submission returns only once it is committed,
+    so nothing acknowledged is lost on shutdown, while a burst of submissions shares a few transactions
+    instead of serializing one commit each on SQLite's write lock.
+    """
+
+    def __init__(self, max_batch=200, max_delay=0.02):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._app = None
+
+    def submit(self, attempt, timeout=30):
+        """
+        Queue an attempt and wait until it is committed. The caller's session is closed first:
+        a waiting request must not hold a pooled connection the writer thread may need.
+        """
+        db.session.close()
+        self._ensure_running()
+        self._queue.put(attempt)
+        if not attempt.done.wait(timeout):
+            raise TimeoutError("Attempt was not written in time")
+        if attempt.error:
+            raise attempt.error
+
+    def submit_many(self, attempts, timeout=30):
+        """ Queue several attempts at once, so they share a transaction, and wait until all are written """
+        db.session.close()
+        self._ensure_running()
+        for attempt in attempts:
+            self._queue.put(attempt)
+        deadline = time.monotonic() + timeout
+        for attempt in attempts:
+            if not attempt.done.wait(max(0, deadline - time.monotonic())):
+                raise TimeoutError("Attempt was not written in time")
+        return [attempt.error for attempt in attempts]
+
+    def _ensure_running(self):
+        with self._lock:
+            # Threads don't survive a fork, so a forked worker starts its own
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._app = current_app._get_current_object()
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="attempt-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    attempt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if attempt is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                batch.append(attempt)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self._app.app_context():
+            try:
+                write_attempts(batch)
+            except Exception:
+                # Don't let one bad attempt fail the whole batch: retry them one by one
+                db.session.rollback()
+                for attempt in batch:
+                    try:
+                        write_attempts([attempt])
+                    except Exception as error:
+                        db.session.rollback()
+                        attempt.error = error
+            finally:
+                db.session.remove()
+        for attempt in batch:
+            attempt.done.set()
+
+    def close(self):
+        """ Write everything still queued and stop the thread """
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                self._queue.put(None)
+                self._thread.join()
+            self._thread = None
+
+
+attempt_writer = AttemptWriter()
+atexit.register(attempt_writer.close)
@@ -0,0 +1,51 @@
+from models.models import db, User, Score, Attempt, UserChapterProgress, QuestionStat
+from models.migrations import upgrade_database
+from models.progress import rebuild_progress
+from models.item_stats import rebuild_question_stats
+from models.identity import password_hasher
+from models.search import search_index_available, create_search_index, rebuild_search_index, index_object
+
+
+# Database setup, run once per deployment or upgrade by `flask init-db` (and by `python app.py`) instead of
+# on every start-up, so web workers come up without touching the database.
+DEFAULT_ADMIN = {"email": "admin@example.com", "password": "admin123", "full_name": "Admin"}  # Change this password in production
+
+
+def create_admin(email, password, full_name="Admin"):
+    """ Add an admin account and commit. Returns None if the email is already registered. """
+    if User.query.filter_by(email=email).first():
+        return None
+    admin_user = User(email=email, password=password_hasher.hash(password), full_name=full_name, role="admin")
+    db.session.add(admin_user)
+    db.session.flush()
+    index_object("user", admin_user)
+    db.session.commit()
+    return admin_user
+
+
+def initialize_database(log=print):
+    """
+    Create missing tables and apply migrations, add the default admin if there is no admin yet,
+    and backfill the derived tables of databases created before they existed.
+    """
+    applied = upgrade_database()
+    log("Database Tables Created")
+    if applied:
+        log(f"Applied schema migrations: {applied}")
+
+    if not User.query.filter_by(role="admin").first():
+        create_admin(**DEFAULT_ADMIN)
+        log("Admin user created successfully!")
+
+    # Fill the progress table for databases created before it existed
+    if not UserChapterProgress.query.first() and Score.query.first():
+        rebuild_progress()
+        log("User chapter progress rebuilt from scores")
+
+    # Backfill the question statistics for databases created before they existed
+    if not QuestionStat.query.first() and Attempt.query.first():
+        log(f"Question statistics rebuilt from {rebuild_question_stats()} attempts")
+
+    # Build the full-text search index the first time (falls back to LIKE search without FTS5)
+    if not search_index_available() and create_search_index():
+        log(f"Search index built with {rebuild_search_index()} entries")
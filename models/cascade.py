@@ -0,0 +1,51 @@
+from sqlalchemy import select, delete
+from models.models import db, Subject, Chapter, Quiz, Question, Score, Attempt, QuestionLayout
+from models.progress import refresh_chapter_progress, refresh_user_totals, forget_chapters
+from models.leaderboard import forget_leaderboards
+from models.item_stats import forget_question_stats
+from models.sampling import forget_served_quizzes
+from models.attempt_sessions import forget_quiz_sessions
+from models.search import unindex_object, unindex_quizzes, unindex_chapters
+
+
+# Set-based deletes of a subject, chapter or quiz together with everything below it.
+# Each level is one DELETE ... WHERE ... IN (subquery), so nothing is loaded into the session
+# and the write lock is held for a handful of statements whatever the size of the tree.
+# The caller commits.
+
+def _delete_quizzes(quiz_ids):
+    """ Delete the leaderboards, question statistics, served samples, attempt sessions, scores (and their part of the user totals), attempts, questions, layouts and quizzes selected by quiz_ids (a SELECT of quiz ids) """
+    unindex_quizzes(quiz_ids)
+    forget_leaderboards(quiz_ids)
+    forget_question_stats(select(Question.id).where(Question.quiz_id.in_(quiz_ids)))
+    forget_served_quizzes(quiz_ids)
+    forget_quiz_sessions(quiz_ids)
+    refresh_user_totals(select(Score.user_id).where(Score.quiz_id.in_(quiz_ids)), excluded_quiz_ids=quiz_ids)
+    db.session.execute(delete(Score).where(Score.quiz_id.in_(quiz_ids)), execution_options={"synchronize_session": False})
+    db.session.execute(delete(Attempt).where(Attempt.quiz_id.in_(quiz_ids)), execution_options={"synchronize_session": False})
+    db.session.execute(delete(Question).where(Question.quiz_id.in_(quiz_ids)), execution_options={"synchronize_session": False})
+    db.session.execute(delete(QuestionLayout).where(QuestionLayout.quiz_id.in_(quiz_ids)), execution_options={"synchronize_session": False})
+    db.session.execute(delete(Quiz).where(Quiz.id.in_(quiz_ids)), execution_options={"synchronize_session": False})
+
+
+def delete_quiz_tree(quiz_id, chapter_id):
+    _delete_quizzes(select(Quiz.id).where(Quiz.id == quiz_id))
+    refresh_chapter_progress([chapter_id])  # Chapter totals no longer include this quiz
+
+
+def delete_chapter_tree(chapter_id):
+    chapter_ids = select(Chapter.id).where(Chapter.id == chapter_id)
+    _delete_quizzes(select(Quiz.id).where(Quiz.chapter_id == chapter_id))
+    forget_chapters(chapter_ids)
+    unindex_chapters(chapter_ids)
+    db.session.execute(delete(Chapter).where(Chapter.id == chapter_id), execution_options={"synchronize_session": False})
+
+
+def delete_subject_tree(subject_id):
+    chapter_ids = select(Chapter.id).where(Chapter.subject_id == subject_id)
+    _delete_quizzes(select(Quiz.id).where(Quiz.chapter_id.in_(chapter_ids)))
+    forget_chapters(chapter_ids)
+    unindex_chapters(chapter_ids)
+    unindex_object("subject", subject_id)
+    db.session.execute(delete(Chapter).where(Chapter.subject_id == subject_id), execution_options={"synchronize_session": False})
+    db.session.execute(delete(Subject).where(Subject.id == subject_id), execution_options={"synchronize_session": False})
@@ -0,0 +1,64 @@
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from models.models import db, Chapter, Quiz, Question, Score
+
+
+# Load a subject's chapter/quiz tree plus the question counts view_quizzes shows.
+# The number of queries stays the same no matter how many chapters or quizzes the subject has:
+# one for the chapters, one for their quizzes, one for question counts.
+# The user's latest scores come separately from load_latest_scores, since the tree is cached for everyone.
+def load_subject_catalog(subject_id):
+    chapters = (
+        Chapter.query
+        .filter_by(subject_id=subject_id)
+        .options(selectinload(Chapter.quizzes))
+        .order_by(Chapter.id)
+        .all()
+    )
+    quizzes_by_chapter = {chapter.id: sorted(chapter.quizzes, key=lambda quiz: quiz.id) for chapter in chapters}
+
+    # Number of questions in every quiz of the subject
+    question_counts = dict(
+        db.session.query(Question.quiz_id, func.count(Question.id))
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .filter(Chapter.subject_id == subject_id)
+        .group_by(Question.quiz_id)
+        .all()
+    )
+
+    return chapters, quizzes_by_chapter, question_counts
+
+
+# Latest total_scored of a user for each quiz, optionally limited to one subject
+def load_latest_scores(user_id, subject_id=None):
+    latest = (
+        db.session.query(Score.quiz_id, func.max(Score.time_stamp_of_attempt).label("latest_attempt"))
+        .filter(Score.user_id == user_id)
+        .group_by(Score.quiz_id)
+    )
+    if subject_id is not None:
+        latest = (
+            latest.join(Quiz, Quiz.id == Score.quiz_id)
+            .join(Chapter, Chapter.id == Quiz.chapter_id)
+            .filter(Chapter.subject_id == subject_id)
+        )
+    latest = latest.subquery()
+
+    rows = (
+        db.session.query(Score.quiz_id, Score.total_scored)
+        .join(latest, (Score.quiz_id == latest.c.quiz_id) & (Score.time_stamp_of_attempt == latest.c.latest_attempt))
+        .filter(Score.user_id == user_id)
+        .all()
+    )
+    return {quiz_id: total_scored for quiz_id, total_scored in rows}
+
+
+# Time of a user's latest attempt and number of quizzes attempted: changes whenever their scores do,
+# except through regrading (see the "grades" cache version)
+def user_score_state(user_id):
+    return (
+        db.session.query(func.max(Score.time_stamp_of_attempt), func.count(Score.id))
+        .filter(Score.user_id == user_id)
+        .one()
+    )
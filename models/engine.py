@@ -0,0 +1,97 @@
+import os
+import weakref
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models.models import db
+
+
+# Engine settings come from app.config, which app.py fills from FLASK_* environment variables
+# (for example FLASK_SQLALCHEMY_DATABASE_URI=postgresql://... or FLASK_SQLITE_BUSY_TIMEOUT=10000).
+# The SQLITE_* pragmas are applied to every new SQLite connection; other backends ignore them.
+SQLITE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",            # Readers don't block the writer and the writer doesn't block readers
+    "SQLITE_SYNCHRONOUS": "NORMAL",          # Safe with WAL: a power loss can only drop the last commits
+    "SQLITE_BUSY_TIMEOUT": 5000,             # Milliseconds to wait for the write lock before "database is locked"
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,   # Bytes of the database file read through memory mapping
+    "SQLITE_CACHE_SIZE": -64000,             # Page cache per connection; negative means KiB (64 MB)
+}
+
+SQLITE_ENGINE_OPTIONS = {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30}
+SERVER_ENGINE_OPTIONS = {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30,
+                         "pool_pre_ping": True, "pool_recycle": 1800}
+
+
+def configure_database(app, default_uri):
+    """ Fill in the database settings not given in the config (call before db.init_app) """
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", default_uri)
+    for key, value in SQLITE_DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite":
+        options = dict(SQLITE_ENGINE_OPTIONS)
+        # pysqlite's own lock timeout, in seconds, applies before the busy_timeout pragma is set
+        options["connect_args"] = {"timeout": app.config["SQLITE_BUSY_TIMEOUT"] / 1000}
+    else:
+        options = dict(SERVER_ENGINE_OPTIONS)
+    # Options set explicitly (e.g. FLASK_SQLALCHEMY_ENGINE_OPTIONS='{"pool_size": 5}') win
+    options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def sqlite_pragmas(config):
+    return [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+    ]
+
+
+def upsert_insert(dialect):
+    """
+    INSERT construct with on_conflict_do_update/do_nothing for "sqlite" or "postgresql". Imported on first use:
+    the PostgreSQL dialect module takes longer to import than the rest of the models together.
+    """
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
+_engines = weakref.WeakSet()  # Engines of every app created in this process
+
+
+def _dispose_inherited():
+    """
+    A worker forked from a process that already used the database (e.g. gunicorn --preload)
+    must not share the parent's pooled connections; it opens its own on first use.
+    """
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+# Registered once per process, however many apps are created (tests and benchmarks create many)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_inherited)
+
+
+def install_engine_hooks(app):
+    """ Apply the SQLite pragmas on connect and drop inherited connections after a fork (call after db.init_app) """
+    with app.app_context():
+        engines = list(db.engines.values())
+    _engines.update(engines)
+
+    pragmas = sqlite_pragmas(app.config)
+    for engine in engines:
+        if engine.dialect.name != "sqlite":
+            continue
+
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score
+from models.importer import QUESTION_FIELDS
+
+
+# Streaming exports of scores and question banks as CSV or NDJSON.
+# Rows are read with yield_per, so the driver fetches CHUNK_SIZE rows at a time instead of the whole result,
+# and written out in chunks of about the same number of rows: memory stays the same whatever the table size.
+# Question exports use the import column names, so a bank can be imported again into another quiz.
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "ndjson")
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+SCORE_FIELDS = ("score_id", "user_id", "email", "full_name", "subject", "chapter", "quiz_id",
+                "time_stamp_of_attempt", "total_scored", "total_questions")
+QUESTION_EXPORT_FIELDS = ("question_id", "subject", "chapter", "quiz_id", "date_of_quiz") + QUESTION_FIELDS
+DATE_FIELDS = {"time_stamp_of_attempt", "date_of_quiz"}  # Written as ISO 8601
+
+
+def parse_filters(subject_id=None, chapter_id=None, date_from=None, date_to=None):
+    """
+    Filters shared by the exports; dates are YYYY-MM-DD strings and date_to is inclusive.
+    Raises ValueError for a malformed date.
+    """
+    filters = {"subject_id": subject_id, "chapter_id": chapter_id, "start": None, "end": None}
+    try:
+        if date_from:
+            filters["start"] = datetime.strptime(date_from, "%Y-%m-%d")
+        if date_to:
+            filters["end"] = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise ValueError("Dates must look like YYYY-MM-DD")
+    return filters
+
+
+def _filtered(query, filters, date_column):
+    if filters.get("subject_id") is not None:
+        query = query.where(Chapter.subject_id == filters["subject_id"])
+    if filters.get("chapter_id") is not None:
+        query = query.where(Quiz.chapter_id == filters["chapter_id"])
+    if filters.get("start") is not None:
+        query = query.where(date_column >= filters["start"])
+    if filters.get("end") is not None:
+        query = query.where(date_column < filters["end"])
+    return query
+
+
+def score_rows(filters):
+    """ Latest scores with user, subject and chapter names, in id order (dates filter the attempt time) """
+    query = (
+        select(Score.id, User.id, User.email, User.full_name, Subject.name, Chapter.name, Quiz.id,
+               Score.time_stamp_of_attempt, Score.total_scored, Score.total_questions)
+        .join(User, User.id == Score.user_id)
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .join(Subject, Subject.id == Chapter.subject_id)
+        .order_by(Score.id)
+    )
+    query = _filtered(query, filters, Score.time_stamp_of_attempt)
+    return db.session.execute(query.execution_options(yield_per=CHUNK_SIZE))
+
+
+def question_rows(filters):
+    """ Questions with their subject, chapter and quiz, in id order (dates filter the quiz date) """
+    query = (
+        select(Question.id, Subject.name, Chapter.name, Quiz.id, Quiz.date_of_quiz,
+               *(getattr(Question, field) for field in QUESTION_FIELDS))
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .join(Subject, Subject.id == Chapter.subject_id)
+        .order_by(Question.id)
+    )
+    query = _filtered(query, filters, Quiz.date_of_quiz)
+    return db.session.execute(query.execution_options(yield_per=CHUNK_SIZE))
+
+
+def _chunks(rows, dates):
+    """ Lists of up to CHUNK_SIZE rows with the datetime columns (positions in dates) as ISO 8601 text """
+    chunk = []
+    for row in rows:
+        row = list(row)
+        for position in dates:
+            if row[position] is not None:
+                row[position] = row[position].isoformat()
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_rows(fields, rows, file_format="csv"):
+    """ Yield the rows as CSV (with a header) or NDJSON text, one piece of text per CHUNK_SIZE rows """
+    dates = [position for position, field in enumerate(fields) if field in DATE_FIELDS]
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for chunk in _chunks(rows, dates):
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # Header of an empty export
+    else:
+        for chunk in _chunks(rows, dates):
+            yield "".join(json.dumps(dict(zip(fields, row)), ensure_ascii=False) + "\n" for row in chunk)
+
+
+def export_scores(filters, file_format="csv"):
+    return stream_rows(SCORE_FIELDS, score_rows(filters), file_format)
+
+
+def export_questions(filters, file_format="csv"):
+    return stream_rows(QUESTION_EXPORT_FIELDS, question_rows(filters), file_format)
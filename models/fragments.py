@@ -0,0 +1,163 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import select, update
+from models.models import db, CacheVersion
+
+
+# Rendered HTML fragments of pages that are the same for every learner (the subject list,
+# a subject's chapter/quiz tree). Keys include the catalog version, which every admin change
+# to subjects, chapters, quizzes or questions replaces, so stale fragments are simply never read again.
+# Backends: "memory" (LRU per process, the default), "file" (a directory shared by the workers
+# of one machine; on Linux a directory under /dev/shm keeps it in shared memory) or "none".
+
+
+class MemoryFragmentBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (html, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, html, expires_at):
+        with self._lock:
+            self._entries[key] = (html, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileFragmentBackend:
+    """ One file per fragment; the first line holds the expiry time. Writes are atomic renames. """
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".html")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as file:
+                expires_at = file.readline().strip()
+                return file.read(), float(expires_at) if expires_at else None
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, html, expires_at):
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            file.write(f"{'' if expires_at is None else expires_at}\n{html}")
+        os.replace(temporary, self._path(key))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def _prune(self):
+        """ Drop the least recently written files beyond max_entries (old versions are never read again) """
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".html")]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                os.unlink(entry.path)
+        except OSError:
+            pass  # Another worker pruned the same files
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".html"))
+
+
+class FragmentCache:
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """
+        Cached (html, expires_at) for key, or the result of render() -> (html, expires_at).
+        expires_at is a Unix time after which the fragment must be rendered again (or None),
+        for content that changes with the clock like quizzes opening.
+        """
+        if self.backend is None:
+            return render()
+        entry = self.backend.get(key)
+        if entry is not None and (entry[1] is None or time.time() < entry[1]):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = render()
+        self.backend.set(key, *entry)
+        return entry
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.backend) if self.backend is not None else 0}
+
+
+fragment_cache = FragmentCache(MemoryFragmentBackend())
+
+
+def configure_fragment_cache(app):
+    """ Pick the backend from FRAGMENT_CACHE ("memory", "file" or "none") """
+    app.config.setdefault("FRAGMENT_CACHE", "memory")
+    app.config.setdefault("FRAGMENT_CACHE_DIR", os.path.join(app.instance_path, "fragments"))
+    app.config.setdefault("FRAGMENT_CACHE_SIZE", 1024)
+
+    kind = app.config["FRAGMENT_CACHE"]
+    if kind == "memory":
+        fragment_cache.backend = MemoryFragmentBackend(app.config["FRAGMENT_CACHE_SIZE"])
+    elif kind == "file":
+        fragment_cache.backend = FileFragmentBackend(app.config["FRAGMENT_CACHE_DIR"], app.config["FRAGMENT_CACHE_SIZE"])
+    elif kind == "none":
+        fragment_cache.backend = None
+    else:
+        raise ValueError(f"Unknown FRAGMENT_CACHE backend: {kind}")
+
+
+def fill_placeholders(html, name, fill):
+    """ Replace the per-user placeholders <!--name:arg:arg--> of a cached fragment with fill(arg, arg) """
+    pattern = re.compile(f"<!--{re.escape(name)}:([^>]*?)-->")
+    return pattern.sub(lambda match: str(fill(*match.group(1).split(":"))), html)
+
+
+def cache_versions(*names):
+    """ Current versions of the named cached contents in one query (0 for one never changed) """
+    rows = dict(db.session.execute(select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(names))).all())
+    return [rows.get(name, 0) for name in names]
+
+
+def cache_changed(name):
+    """ Give cached content a new version (call before the commit that changes it) """
+    changed = db.session.execute(
+        update(CacheVersion).where(CacheVersion.name == name).values(version=time.time_ns())
+    ).rowcount
+    if not changed:
+        db.session.add(CacheVersion(name=name, version=time.time_ns()))
+
+
+def catalog_version():
+    """ Current catalog version (one primary key lookup) """
+    return cache_versions("catalog")[0]
+
+
+def catalog_changed():
+    """ Record that subjects, chapters, quizzes or questions changed (call before the commit that changes them) """
+    cache_changed("catalog")
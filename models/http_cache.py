@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from flask import request, make_response
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+
+# HTTP caching helpers:
+# - conditional pages: routes compute an ETag (and Last-Modified) from the versions their content depends on,
+#   before rendering, and answer 304 Not Modified when the browser's copy is still current
+# - static files get a content hash in their URL (?v=...) and may then be cached for a year
+# - text responses above a size threshold are compressed with brotli (if installed) or gzip
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ("text/html", "text/css", "text/plain", "text/csv", "application/json",
+                      "application/javascript", "application/x-ndjson")
+
+_static_hashes = {}  # filename -> (mtime, hash)
+_build_id = None
+
+
+def _file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()[:12]
+
+
+def static_hash(app, filename):
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        cached = _static_hashes[filename] = (mtime, _file_hash(path))
+    return cached[1]
+
+
+def _templates_and_static_id(app):
+    """ Changes whenever a template or static file changes, since both end up in the pages """
+    digest = hashlib.sha1()
+    for folder in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+        for root, _, files in sorted(os.walk(folder)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(f"{path}:{os.path.getmtime(path)}".encode())
+    return digest.hexdigest()[:12]
+
+
+def page_etag(*parts):
+    """ ETag of a page built from the versions its content depends on """
+    return hashlib.sha1(repr((_build_id,) + parts).encode()).hexdigest()[:24]
+
+
+def version_time(version):
+    """ Versions are time.time_ns() values; as a UTC datetime for Last-Modified """
+    return datetime.fromtimestamp(version / 1e9, timezone.utc) if version and version > 10**15 else None
+
+
+def utc(moment):
+    """ Stored timestamps are naive UTC """
+    return moment.replace(tzinfo=timezone.utc) if moment is not None else None
+
+
+def conditional_page(etag, change_times, render):
+    """
+    304 if the request's If-None-Match / If-Modified-Since show the client has this version of the page,
+    otherwise the rendered page. change_times: when each thing the page shows last changed (None if unknown);
+    Last-Modified is the latest of them. Pages are per user, so only the browser may cache them.
+    """
+    last_modified = max((moment for moment in change_times if moment is not None), default=None)
+
+    if request.if_none_match:
+        current = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        current = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        current = False
+
+    response = make_response("", 304) if current else make_response(render())
+    response.set_etag(etag, weak=True)  # Weak: the same page may be sent compressed or not
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # Revalidate every time, which is cheap
+    return response
+
+
+def _compress(response, level):
+    encodings = request.accept_encodings
+    if brotli is not None and encodings["br"]:
+        response.set_data(brotli.compress(response.get_data(), quality=level))
+        response.headers["Content-Encoding"] = "br"
+    elif encodings["gzip"]:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=level))
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)  # No longer the same bytes as the uncompressed file
+
+
+def install_http_cache(app):
+    """ Fingerprinted static URLs, long static cache lifetimes and response compression """
+    global _build_id
+    app.config.setdefault("COMPRESS_MIN_SIZE", 500)  # Bytes; smaller responses aren't worth it. 0 turns compression off.
+    app.config.setdefault("COMPRESS_LEVEL", 6)       # gzip 1-9 / brotli 0-11
+    min_size = app.config["COMPRESS_MIN_SIZE"]
+    level = app.config["COMPRESS_LEVEL"]
+    _build_id = _templates_and_static_id(app)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            file_hash = static_hash(app, values["filename"])
+            if file_hash:
+                values["v"] = file_hash
+
+    @app.after_request
+    def cache_and_compress(response):
+        # A fingerprinted URL always has the same content
+        if request.endpoint == "static" and request.args.get("v") and response.status_code == 200:
+            response.cache_control.no_cache = None  # send_file's default without SEND_FILE_MAX_AGE_DEFAULT
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+
+        if (
+            min_size
+            and response.status_code == 200
+            and response.mimetype in COMPRESSIBLE_TYPES
+            and "Content-Encoding" not in response.headers
+        ):
+            if response.direct_passthrough:
+                # Static files are sent straight from disk; read small ones so they can be compressed
+                if (response.content_length or 0) > 1024 * 1024:
+                    return response
+                response.direct_passthrough = False
+            elif response.is_streamed:
+                return response  # Exports and other generators are sent as they are produced
+            if (response.content_length or 0) >= min_size:
+                _compress(response, level)
+        return response
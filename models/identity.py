@@ -0,0 +1,237 @@
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, session
+from sqlalchemy import select, update, or_, and_, func
+from werkzeug.security import generate_password_hash, check_password_hash
+from models.models import db, User
+
+
+# Who is logged in. The session only carries the user id; role and name come from a read-only Identity that is
+# loaded once per request (kept on flask.g) and cached per process for IDENTITY_CACHE_SECONDS, so role checks and
+# dashboards don't read the user row on every request. Deleting a user calls forget_identity(); other worker
+# processes notice when their entry expires.
+#
+# Passwords are stored as salted hashes (werkzeug's scrypt by default). Hashing is slow and memory-hard on purpose
+# (about 32 MB per scrypt hash), so at most PASSWORD_HASH_CONCURRENCY hashes run at once in a worker process, by
+# default one per CPU. The cap trades login throughput for the latency of everything else: more concurrent hashes
+# get more logins through by taking a bigger share of the CPU from the worker's other requests. The request thread
+# hashes itself and waits its turn while the cap is reached, so a burst of logins still holds its request threads;
+# past PASSWORD_HASH_QUEUE logins hashing or waiting, login answers "busy" instead of queueing more. Passwords saved
+# before hashing was introduced are compared as they are and hashed on the next login or by `hash-passwords`.
+Identity = namedtuple("Identity", ["id", "role", "full_name"])
+
+HASH_PREFIXES = ("scrypt:", "pbkdf2:")
+
+
+class IdentityCache:
+    """ Bounded LRU of Identity records by user id, each kept for ttl seconds """
+
+    def __init__(self, ttl=60.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user id -> (Identity, expiry on time.monotonic())
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """ Identity of a user, or None if there is no such user """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = db.session.execute(select(User.id, User.role, User.full_name).where(User.id == user_id)).first()
+        if row is None:
+            self.forget(user_id)
+            return None
+        identity = Identity(*row)
+
+        with self._lock:
+            self._entries[user_id] = (identity, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+identity_cache = IdentityCache()
+
+
+class PasswordHasherBusy(Exception):
+    """ More password checks are running or waiting than PASSWORD_HASH_QUEUE allows """
+
+
+class PasswordHasher:
+    """ Hashes and checks passwords on the calling thread, at most `concurrency` at a time """
+
+    def __init__(self, concurrency=2, queue_limit=64, method="scrypt"):
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.method = method
+        self.hashed = 0
+        self.checked = 0
+        self.rejected = 0
+        self._waiting = 0
+        self._slots = None
+        self._slots_size = None
+        self._dummy = None
+        self._lock = threading.Lock()
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self._waiting >= self.queue_limit:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._waiting += 1
+            if self._slots_size != self.concurrency:
+                self._slots = threading.BoundedSemaphore(self.concurrency)
+                self._slots_size = self.concurrency
+            slots = self._slots
+        try:
+            with slots:  # hashlib releases the GIL, so the hashes that run use separate cores
+                return function(*args)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def hash(self, password):
+        self.hashed += 1
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """ Whether password matches the stored hash (or a password stored before hashing was introduced) """
+        self.checked += 1
+        if not is_hashed(stored):
+            return hmac.compare_digest(stored.encode(), password.encode())
+        return self._run(check_password_hash, stored, password)
+
+    def verify_nothing(self, password):
+        """ Spend the time of a real check, so unknown emails can't be told apart by the response time """
+        if self._dummy is None:
+            self._dummy = self.hash("no such user")
+        self.verify(self._dummy, password)
+
+    def stats(self):
+        with self._lock:
+            return {"waiting": self._waiting, "hashed": self.hashed, "checked": self.checked, "rejected": self.rejected}
+
+
+password_hasher = PasswordHasher()
+
+
+def install_identity(app):
+    """ Identity cache and password hashing settings """
+    app.config.setdefault("IDENTITY_CACHE_SECONDS", 60)  # How long a role or name change can take to show up in other workers
+    app.config.setdefault("PASSWORD_HASH_CONCURRENCY", os.cpu_count() or 1)  # Passwords hashed at the same time per worker process
+    app.config.setdefault("PASSWORD_HASH_QUEUE", 64)      # Logins allowed to hash or wait their turn
+    app.config.setdefault("PASSWORD_HASH_METHOD", "scrypt")
+    identity_cache.ttl = float(app.config["IDENTITY_CACHE_SECONDS"])
+    password_hasher.concurrency = int(app.config["PASSWORD_HASH_CONCURRENCY"])
+    password_hasher.queue_limit = int(app.config["PASSWORD_HASH_QUEUE"])
+    password_hasher.method = app.config["PASSWORD_HASH_METHOD"]
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES) and stored.count("$") == 2
+
+
+def _is_hashed_sql(column):
+    """ is_hashed as a SQL condition, so `hash-passwords` picks exactly the passwords login would upgrade """
+    dollars = func.length(column) - func.length(func.replace(column, "$", ""))
+    return and_(or_(*(column.startswith(prefix) for prefix in HASH_PREFIXES)), dollars == 2)
+
+
+def current_user():
+    """ Identity of the logged-in user, looked up once per request; None if logged out or the user was deleted """
+    if "user_id" not in session:
+        return None
+    if "identity" not in g:
+        g.identity = identity_cache.get(session["user_id"])
+        if g.identity is None:
+            session.clear()  # The user was deleted
+    return g.identity
+
+
+def admin_required():
+    user = current_user()
+    return user is not None and user.role == "admin"
+
+
+def user_required():
+    user = current_user()
+    return user is not None and user.role == "user"
+
+
+def login_user(user):
+    session.clear()
+    session["user_id"] = user.id
+    g.identity = Identity(user.id, user.role, user.full_name)
+
+
+def forget_identity(user_id):
+    """ Drop a deleted or changed user from this process's cache """
+    identity_cache.forget(user_id)
+
+
+def authenticate(email, password):
+    """
+    The user with this email and password, or None. Upgrades a password stored before hashing was introduced
+    (and commits). Raises PasswordHasherBusy when too many checks are already waiting.
+    """
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        password_hasher.verify_nothing(password)
+        return None
+    if not password_hasher.verify(user.password, password):
+        return None
+    if not is_hashed(user.password):
+        user.password = password_hasher.hash(password)
+        db.session.commit()
+    return user
+
+
+def hash_plaintext_passwords(batch_size=100, on_progress=None):
+    """ Hash every password stored before hashing was introduced, a batch per transaction. Returns the number hashed. """
+    plaintext = (
+        select(User.id, User.password)
+        .where(~_is_hashed_sql(User.password))
+        .order_by(User.id)
+        .limit(batch_size)
+    )
+    hashed = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=password_hasher.concurrency) as pool:
+        while True:
+            rows = db.session.execute(plaintext.where(User.id > last_id)).all()
+            if not rows:
+                return hashed
+            hashes = pool.map(lambda password: generate_password_hash(password, password_hasher.method),
+                              [password for _, password in rows])
+            db.session.execute(update(User), [{"id": user_id, "password": value}
+                                              for (user_id, _), value in zip(rows, hashes)])
+            db.session.commit()
+            hashed += len(rows)
+            last_id = rows[-1][0]
+            if on_progress:
+                on_progress(hashed)
@@ -0,0 +1,117 @@
+import csv
+import json
+from sqlalchemy import insert
+from models.models import db, Question
+from models.search import index_rows
+from models.answer_cache import questions_changed
+from models.fragments import catalog_changed
+
+
+QUESTION_FIELDS = ("question_statement", "option1", "option2", "option3", "option4", "correct_option")
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500  # Keep the report bounded on badly broken files
+
+
+def _read_rows(text_stream, file_format):
+    """ Yield (row number, dict) one line at a time, never holding the whole file """
+    if file_format == "csv":
+        reader = csv.DictReader(text_stream)
+        for row_number, row in enumerate(reader, start=2):  # Row 1 is the header
+            yield row_number, row
+    else:
+        for row_number, line in enumerate(text_stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield row_number, None
+                continue
+            yield row_number, row if isinstance(row, dict) else None
+
+
+def _validate(row):
+    """ Return (values, None) for a good row or (None, error message) """
+    if row is None:
+        return None, "Not a valid JSON object"
+
+    values = {}
+    for field in ("question_statement", "option1", "option2", "option3", "option4"):
+        value = row.get(field)
+        if value is None or not str(value).strip():
+            return None, f"Missing {field}"
+        value = str(value).strip()
+        if field != "question_statement" and len(value) > 255:
+            return None, f"{field} is longer than 255 characters"
+        values[field] = value
+
+    try:
+        correct_option = int(row.get("correct_option"))
+    except (TypeError, ValueError):
+        return None, "correct_option must be a number from 1 to 4"
+    if correct_option not in (1, 2, 3, 4):
+        return None, "correct_option must be a number from 1 to 4"
+    values["correct_option"] = correct_option
+
+    return values, None
+
+
+def _insert_batch(quiz_id, batch):
+    for values in batch:
+        values["quiz_id"] = quiz_id
+    result = db.session.execute(
+        insert(Question.__table__).returning(Question.id, Question.question_statement, sort_by_parameter_order=True),
+        batch,
+    )
+    index_rows("question", [(question_id, statement, "") for question_id, statement in result])
+    questions_changed(quiz_id)
+    catalog_changed()
+    db.session.commit()
+
+
+def import_questions(quiz_id, text_stream, file_format="csv"):
+    """
+    Stream questions from a CSV (with a header row) or NDJSON text stream into a quiz.
+    Good rows are inserted in batches of BATCH_SIZE, one transaction per batch; bad rows are skipped.
+    Text that isn't UTF-8 stops the import, with an error for the row after the last one read.
+    Returns a report: {"imported": n, "failed": n, "errors": [{"row": n, "error": "..."}]}
+    """
+    report = {"imported": 0, "failed": 0, "errors": []}
+    batch = []
+
+    row_number = 1 if file_format == "csv" else 0  # Last row read
+    try:
+        for row_number, row in _read_rows(text_stream, file_format):
+            values, error = _validate(row)
+            if error:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": row_number, "error": error})
+                continue
+
+            batch.append(values)
+            if len(batch) == BATCH_SIZE:
+                _insert_batch(quiz_id, batch)
+                report["imported"] += len(batch)
+                batch = []
+    except UnicodeDecodeError:
+        # Text is decoded a block at a time, so the bad bytes are somewhere after the last row read
+        report["failed"] += 1
+        report["errors"].append({"row": row_number + 1, "error": "Not UTF-8 text from this row on; the rest of the file was skipped"})
+
+    if batch:
+        _insert_batch(quiz_id, batch)
+        report["imported"] += len(batch)
+
+    return report
+
+
+def guess_format(filename, default="csv"):
+    """ Pick the format from a file extension (.csv, .ndjson, .jsonl) """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
@@ -0,0 +1,161 @@
+from sqlalchemy import select, insert, update, delete
+from models.models import db, Question, Attempt, QuestionStat
+from models.engine import upsert_insert
+from models.answers import get_layout
+
+
+# Item analysis: per question, how many attempts presented it and how many chose each option.
+# The correct option is not stored, so the correct rate (chosen[correct] / attempts) stays right when
+# an admin changes the answer key and no regrade of the statistics is needed.
+# write_attempts adds each batch's counts in its transaction; rebuild_question_stats recomputes
+# them from the Attempt history, e.g. to backfill a database that predates this table.
+OPTION_COLUMNS = ("chosen_option1", "chosen_option2", "chosen_option3", "chosen_option4")
+CHUNK_SIZE = 5000
+
+# Thresholds for the hints on the admin question pages
+MIN_ATTEMPTS = 20  # Fewer attempts than this say nothing yet
+EASY_RATE = 90     # Percent correct at or above which a question is too easy
+HARD_RATE = 30     # Percent correct below which a question is too hard
+
+
+def _add_packed(counts, question_ids, packed_answers):
+    """ Add one attempt: packed_answers holds one byte per question of question_ids (0 = not answered) """
+    for question_id, answer in zip(question_ids, packed_answers.ljust(len(question_ids), b"\0")):
+        row = counts.get(question_id)
+        if row is None:
+            row = counts[question_id] = [0, 0, 0, 0, 0]
+        row[0] += 1
+        if 1 <= answer <= 4:
+            row[answer] += 1
+
+
+def _rows(counts):
+    return [{"question_id": question_id, "attempts": row[0], **dict(zip(OPTION_COLUMNS, row[1:]))}
+            for question_id, row in counts.items()]
+
+
+def record_answer_counts(attempts):
+    """ Add the answers of a batch of PendingAttempts inside the caller's transaction """
+    counts = {}  # question_id -> [attempts, option 1, option 2, option 3, option 4]
+    for attempt in attempts:
+        _add_packed(counts, attempt.question_ids, attempt.answers or b"")
+    rows = _rows(counts)
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # One upsert per question; concurrent writers add to the counts instead of overwriting them
+        insert_rows = upsert_insert(dialect)
+        statement = insert_rows(QuestionStat)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["question_id"],
+                set_={column: getattr(QuestionStat, column) + getattr(statement.excluded, column)
+                      for column in ("attempts",) + OPTION_COLUMNS},
+            ),
+            rows,
+        )
+    else:
+        for row in rows:
+            changed = db.session.execute(
+                update(QuestionStat)
+                .where(QuestionStat.question_id == row["question_id"])
+                .values({column: getattr(QuestionStat, column) + row[column] for column in ("attempts",) + OPTION_COLUMNS})
+            ).rowcount
+            if not changed:
+                db.session.add(QuestionStat(**row))
+
+
+def forget_question_stats(question_ids):
+    """ Drop the statistics of questions that are being deleted (a list or a SELECT of ids) """
+    db.session.execute(delete(QuestionStat).where(QuestionStat.question_id.in_(question_ids)),
+                       execution_options={"synchronize_session": False})
+
+
+def _count_column(counts, question_id, column):
+    """ column: the bytes every attempt gave one question """
+    row = counts.get(question_id)
+    if row is None:
+        row = counts[question_id] = [0, 0, 0, 0, 0]
+    row[0] += len(column)
+    for option in (1, 2, 3, 4):
+        row[option] += column.count(option)
+
+
+def rebuild_question_stats(quiz_id=None, on_progress=None):
+    """
+    Recompute the statistics from the Attempt history (of one quiz, or all of them) and commit.
+    Attempts are read in chunks and grouped by layout; each group's answers are joined into one
+    bytes object in which every question is a strided slice, so the per-option counts are bytes.count()
+    calls instead of a Python loop over every answer. Returns the number of attempts read.
+    """
+    counts = {}
+    layouts = {}  # (quiz_id, layout_version) -> question ids
+    read = 0
+    last_id = 0
+    while True:
+        query = (
+            select(Attempt.id, Attempt.quiz_id, Attempt.layout_version, Attempt.answers)
+            .where(Attempt.id > last_id)
+            .order_by(Attempt.id)
+            .limit(CHUNK_SIZE)
+        )
+        if quiz_id is not None:
+            query = query.where(Attempt.quiz_id == quiz_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+
+        groups = {}
+        for _, attempt_quiz_id, layout_version, packed_answers in rows:
+            groups.setdefault((attempt_quiz_id, layout_version), []).append(packed_answers or b"")
+        for key, answers in groups.items():
+            if key not in layouts:
+                layouts[key] = get_layout(*key) or ()
+            question_ids = layouts[key]
+            width = len(question_ids)
+            if not width:
+                continue
+            joined = b"".join(packed.ljust(width, b"\0")[:width] for packed in answers)
+            for position, question_id in enumerate(question_ids):
+                _count_column(counts, question_id, joined[position::width])
+
+        read += len(rows)
+        last_id = rows[-1].id
+        if on_progress:
+            on_progress(read)
+
+    # Layouts may name questions deleted since; only current questions get statistics
+    current = select(Question.id)
+    if quiz_id is not None:
+        current = current.where(Question.quiz_id == quiz_id)
+    current_ids = set(db.session.execute(current).scalars())
+    rows = [row for row in _rows(counts) if row["question_id"] in current_ids]
+
+    forget_question_stats(current)
+    for offset in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(QuestionStat), rows[offset:offset + CHUNK_SIZE])
+    db.session.commit()
+    return read
+
+
+def load_question_stats(question_ids):
+    """ {question id: QuestionStat} for the given questions; questions never attempted are missing """
+    return {stat.question_id: stat for stat in QuestionStat.query.filter(QuestionStat.question_id.in_(question_ids))}
+
+
+def question_hints(stat, correct_option):
+    """ Short warnings for a question's statistics: too easy, too hard, or a wrong option more popular than the right one """
+    if stat is None or stat.attempts < MIN_ATTEMPTS:
+        return []
+    hints = []
+    correct_rate = stat.share(stat.chosen(correct_option))
+    if correct_rate >= EASY_RATE:
+        hints.append("too easy")
+    elif correct_rate < HARD_RATE:
+        hints.append("too hard")
+    popular = max((1, 2, 3, 4), key=stat.chosen)
+    if popular != correct_option and stat.chosen(popular) >= stat.chosen(correct_option):
+        hints.append(f"option {popular} is chosen more often than the correct one, check for ambiguity")
+    return hints
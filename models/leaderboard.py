@@ -0,0 +1,116 @@
+from sqlalchemy import select, insert, update, delete, func
+from models.models import db, User, Score, QuizScoreCount
+from models.engine import upsert_insert
+
+
+# Per-quiz leaderboards kept as score histograms: one QuizScoreCount row per (quiz, score) with the number
+# of users whose latest score on the quiz it is. Scores are small integers bounded by the number of questions,
+# so a quiz has a few dozen rows whatever the number of learners, and rank and percentile are sums over them.
+# write_attempts applies the changes of every Score write in the same transaction; regrading and
+# deleting scores rebuild the affected quizzes from Score.
+
+
+def record_leaderboard_changes(changes):
+    """ Apply {(quiz_id, score): change in users} inside the caller's transaction """
+    rows = [{"quiz_id": quiz_id, "total_scored": score, "users": delta}
+            for (quiz_id, score), delta in changes.items() if delta]
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # One upsert per bucket; concurrent writers add to the count instead of overwriting it
+        insert_rows = upsert_insert(dialect)
+        statement = insert_rows(QuizScoreCount)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["quiz_id", "total_scored"],
+                set_={"users": QuizScoreCount.users + statement.excluded.users},
+            ),
+            rows,
+        )
+    else:
+        for row in rows:
+            changed = db.session.execute(
+                update(QuizScoreCount)
+                .where(QuizScoreCount.quiz_id == row["quiz_id"], QuizScoreCount.total_scored == row["total_scored"])
+                .values(users=QuizScoreCount.users + row["users"])
+            ).rowcount
+            if not changed:
+                db.session.add(QuizScoreCount(**row))
+
+
+def _counts_from_scores(quiz_ids=None):
+    query = select(Score.quiz_id, Score.total_scored, func.count()).group_by(Score.quiz_id, Score.total_scored)
+    if quiz_ids is not None:
+        query = query.where(Score.quiz_id.in_(quiz_ids))
+    return query
+
+
+def refresh_leaderboards(quiz_ids):
+    """ Recompute the histograms of the given quizzes (a list or a SELECT of ids) from Score; the caller commits """
+    forget_leaderboards(quiz_ids)
+    db.session.execute(
+        insert(QuizScoreCount).from_select(["quiz_id", "total_scored", "users"], _counts_from_scores(quiz_ids))
+    )
+
+
+def forget_leaderboards(quiz_ids):
+    """ Drop the histograms of quizzes that are being deleted """
+    db.session.execute(delete(QuizScoreCount).where(QuizScoreCount.quiz_id.in_(quiz_ids)))
+
+
+def forget_user_scores(user_id):
+    """ Take a user's latest scores out of the histograms (call before deleting them) """
+    changes = {}
+    for quiz_id, score in db.session.execute(select(Score.quiz_id, Score.total_scored).where(Score.user_id == user_id)):
+        changes[(quiz_id, score)] = changes.get((quiz_id, score), 0) - 1
+    record_leaderboard_changes(changes)
+
+
+def rebuild_leaderboards():
+    """ Recompute every histogram from Score. Returns the number of buckets that differed from the stored ones. """
+    expected = {(quiz_id, score): users for quiz_id, score, users in db.session.execute(_counts_from_scores())}
+    stored = {
+        (row.quiz_id, row.total_scored): row.users
+        for row in QuizScoreCount.query.filter(QuizScoreCount.users != 0)
+    }
+    drift = sum(1 for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+
+    db.session.execute(delete(QuizScoreCount))
+    db.session.execute(insert(QuizScoreCount).from_select(["quiz_id", "total_scored", "users"], _counts_from_scores()))
+    db.session.commit()
+    return drift
+
+
+def load_histogram(quiz_id):
+    """ [(score, users)] of a quiz, best score first (a primary key range read) """
+    rows = db.session.execute(
+        select(QuizScoreCount.total_scored, QuizScoreCount.users)
+        .where(QuizScoreCount.quiz_id == quiz_id, QuizScoreCount.users > 0)
+        .order_by(QuizScoreCount.total_scored.desc())
+    )
+    return [tuple(row) for row in rows]
+
+
+def rank_in_histogram(histogram, score):
+    """
+    (rank, users, percentile) of a score. Equal scores share a rank (1 + number of better scores);
+    percentile is the share of users with a lower score.
+    """
+    users = sum(count for _, count in histogram)
+    better = sum(count for value, count in histogram if value > score)
+    worse = sum(count for value, count in histogram if value < score)
+    percentile = round(100 * worse / users) if users else 0
+    return better + 1, users, percentile
+
+
+def top_scores(quiz_id, limit=10):
+    """ Best latest scores of a quiz with the users' names, earliest first among equal scores """
+    rows = db.session.execute(
+        select(Score.user_id, User.full_name, Score.total_scored, Score.total_questions, Score.time_stamp_of_attempt)
+        .join(User, User.id == Score.user_id)
+        .where(Score.quiz_id == quiz_id)
+        .order_by(Score.total_scored.desc(), Score.time_stamp_of_attempt)
+        .limit(limit)
+    )
+    return rows.all()
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+import click
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from models.models import db
+
+
+# Per-request SQL instrumentation: every statement is timed by engine events and added to the
+# current request's totals (in flask.g). At the end of the request the totals go into per-endpoint
+# counters and a latency histogram, rendered in the Prometheus text format by render_metrics().
+# Counters are per process; with several workers each one reports its own.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Seconds
+SLOWEST_KEPT = 3  # Slowest statements remembered per request
+
+slow_query_log = logging.getLogger("quiz_master.slow_queries")
+
+
+class RequestSQL:
+    """ SQL done while handling one request """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.slowest = []  # (seconds, statement), slowest first
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        self.seconds += seconds
+        if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Last one is +Inf
+        self.requests = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.endpoints = {}  # endpoint -> EndpointStats
+        self.statements = 0  # All statements, including those of background threads
+        self.sql_seconds = 0.0
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+
+    def record_statement(self, seconds, slow):
+        with self._lock:
+            self.statements += 1
+            self.sql_seconds += seconds
+            if slow:
+                self.slow_queries += 1
+
+    def record_request(self, endpoint, seconds, sql):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.queries += sql.queries
+            stats.sql_seconds += sql.seconds
+
+
+metrics = Metrics()
+
+
+def install_metrics(app):
+    """ Hook the SQL timing into the app's engines and the request totals into the app (call after db.init_app) """
+    app.config.setdefault("METRICS_ENABLED", True)
+    app.config.setdefault("SQL_SLOW_QUERY_MS", 200)   # Statements slower than this are logged; 0 turns the log off
+    app.config.setdefault("SQL_SLOW_QUERY_LOG", None)  # File for the slow query log (default: the app's log output)
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    # The logger outlives the app: a process creating several apps (tests, benchmarks) opens the file once
+    log_file = app.config["SQL_SLOW_QUERY_LOG"] and os.path.abspath(app.config["SQL_SLOW_QUERY_LOG"])
+    if log_file and not any(getattr(handler, "baseFilename", None) == log_file for handler in slow_query_log.handlers):
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_log.addHandler(handler)
+    slow_query_log.setLevel(logging.WARNING)
+    slow_seconds = app.config["SQL_SLOW_QUERY_MS"] / 1000
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        @event.listens_for(engine, "before_cursor_execute")
+        def start_timer(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def stop_timer(conn, cursor, statement, parameters, context, executemany):
+            seconds = time.perf_counter() - context._metrics_start
+            slow = slow_seconds and seconds >= slow_seconds
+            metrics.record_statement(seconds, slow)
+            if has_request_context() and "sql" in g:
+                g.sql.add(statement, seconds)
+            if slow:
+                slow_query_log.warning("Slow query (%.1f ms, %s): %s", seconds * 1000, _statement_source(),
+                                       " ".join(statement.split()))
+
+    @app.before_request
+    def start_request():
+        g.sql = RequestSQL()
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def finish_request(response):
+        if "sql" not in g:
+            return response
+        seconds = time.perf_counter() - g.request_start
+        metrics.record_request(request.endpoint or "unmatched", seconds, g.sql)
+        if app.debug:
+            response.headers["X-Request-Time-Ms"] = f"{seconds * 1000:.1f}"
+            response.headers["X-SQL-Queries"] = str(g.sql.queries)
+            response.headers["X-SQL-Time-Ms"] = f"{g.sql.seconds * 1000:.1f}"
+            for index, (statement_seconds, statement) in enumerate(g.sql.slowest, 1):
+                response.headers[f"X-SQL-Slowest-{index}"] = f"{statement_seconds * 1000:.1f} ms {' '.join(statement.split())[:200]}"
+        return response
+
+
+def _statement_source():
+    """ What ran a statement: the request's endpoint, the `flask` command, or "background" for other threads """
+    if has_request_context():
+        return request.endpoint
+    command = click.get_current_context(silent=True)
+    if command is not None:
+        return f"command {command.info_name}"
+    return "background"
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def render_metrics(extra=()):
+    """
+    Everything recorded so far in the Prometheus text format.
+    extra: (name, type, help, value) of more samples, e.g. cache counters.
+    """
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP quiz_master_{name} {help_text}")
+        lines.append(f"# TYPE quiz_master_{name} {kind}")
+
+    with metrics._lock:
+        endpoints = sorted(metrics.endpoints.items())
+
+        family("request_duration_seconds", "histogram", "Time to handle a request, by endpoint")
+        for endpoint, stats in endpoints:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats.buckets):
+                cumulative += count
+                lines.append(f"quiz_master_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}")
+            lines.append(f"quiz_master_request_duration_seconds_sum{_labels(endpoint=endpoint)} {stats.seconds:.6f}")
+            lines.append(f"quiz_master_request_duration_seconds_count{_labels(endpoint=endpoint)} {stats.requests}")
+
+        family("request_sql_queries_total", "counter", "SQL statements run while handling requests, by endpoint")
+        for endpoint, stats in endpoints:
+            lines.append(f"quiz_master_request_sql_queries_total{_labels(endpoint=endpoint)} {stats.queries}")
+
+        family("request_sql_seconds_total", "counter", "Time spent in SQL statements while handling requests, by endpoint")
+        for endpoint, stats in endpoints:
+            lines.append(f"quiz_master_request_sql_seconds_total{_labels(endpoint=endpoint)} {stats.sql_seconds:.6f}")
+
+        family("sql_statements_total", "counter", "SQL statements run, including background work")
+        lines.append(f"quiz_master_sql_statements_total {metrics.statements}")
+        family("sql_seconds_total", "counter", "Time spent in SQL statements, including background work")
+        lines.append(f"quiz_master_sql_seconds_total {metrics.sql_seconds:.6f}")
+        family("sql_slow_queries_total", "counter", "Statements slower than SQL_SLOW_QUERY_MS")
+        lines.append(f"quiz_master_sql_slow_queries_total {metrics.slow_queries}")
+
+    for name, kind, help_text, value in extra:
+        family(name, kind, help_text)
+        lines.append(f"quiz_master_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,163 @@
+import json
+from datetime import datetime
+from sqlalchemy import text, inspect
+from models.models import db, SchemaMigration
+
+
+# Versioned schema changes for existing databases.
+# db.create_all() only creates missing tables, so anything that changes an existing table
+# (indexes, new columns, data rewrites) is added here with the next version number.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(function):
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+
+@migration(1, "Indexes for foreign keys and score lookups")
+def add_lookup_indexes():
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_chapter_subject_id ON chapter (subject_id)",
+        "CREATE INDEX IF NOT EXISTS ix_quiz_chapter_id ON quiz (chapter_id)",
+        "CREATE INDEX IF NOT EXISTS ix_question_quiz_id ON question (quiz_id)",
+        "CREATE INDEX IF NOT EXISTS ix_score_quiz_id ON score (quiz_id)",
+        "CREATE INDEX IF NOT EXISTS ix_score_user_quiz_time ON score (user_id, quiz_id, time_stamp_of_attempt)",
+    ):
+        db.session.execute(text(statement))
+
+
+@migration(2, "Quiz questions_version for the answer key cache")
+def add_quiz_questions_version():
+    if not _has_column("quiz", "questions_version"):
+        db.session.execute(text("ALTER TABLE quiz ADD COLUMN questions_version BIGINT NOT NULL DEFAULT 0"))
+
+
+@migration(3, "Packed Score.answers with question layouts instead of JSON selected_answers")
+def pack_selected_answers():
+    # Imported here: models.answers caches layouts and is only needed by this data migration
+    from models.answers import ensure_layout, pack_answers
+
+    if not _has_column("score", "answers"):
+        db.session.execute(text("ALTER TABLE score ADD COLUMN answers BLOB"))
+    if not _has_column("score", "layout_version"):
+        db.session.execute(text("ALTER TABLE score ADD COLUMN layout_version BIGINT"))
+
+    # Each quiz's layout is its current questions at its current version.
+    # Answers to questions that no longer exist are dropped; they could not count anyway.
+    layouts = {}
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            text("SELECT id, quiz_id, selected_answers FROM score WHERE id > :last_id AND selected_answers != '' "
+                 "ORDER BY id LIMIT 5000"),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+
+        changes = []
+        for score_id, quiz_id, selected_answers in rows:
+            if quiz_id not in layouts:
+                version = db.session.execute(
+                    text("SELECT questions_version FROM quiz WHERE id = :quiz_id"), {"quiz_id": quiz_id}
+                ).scalar() or 0
+                question_ids = tuple(db.session.execute(
+                    text("SELECT id FROM question WHERE quiz_id = :quiz_id ORDER BY id"), {"quiz_id": quiz_id}
+                ).scalars())
+                ensure_layout(quiz_id, version, question_ids)
+                layouts[quiz_id] = (version, question_ids)
+            version, question_ids = layouts[quiz_id]
+            answers = {int(question_id): answer for question_id, answer in json.loads(selected_answers).items()
+                       if answer in (1, 2, 3, 4)}
+            changes.append({"score_id": score_id, "answers": pack_answers(answers, question_ids), "layout_version": version})
+
+        db.session.execute(
+            text("UPDATE score SET answers = :answers, layout_version = :layout_version, selected_answers = '' "
+                 "WHERE id = :score_id"),
+            changes,
+        )
+        db.session.commit()
+        last_id = rows[-1].id
+
+
+@migration(4, "Attempt history seeded from existing scores")
+def seed_attempt_history():
+    db.session.execute(text(
+        "INSERT INTO attempt (quiz_id, user_id, time_stamp_of_attempt, total_scored, total_questions, answers, layout_version) "
+        "SELECT quiz_id, user_id, COALESCE(time_stamp_of_attempt, CURRENT_TIMESTAMP), total_scored, total_questions, "
+        "answers, layout_version FROM score"
+    ))
+
+
+@migration(5, "Catalog version for the fragment cache")
+def add_catalog_version():
+    db.session.execute(text("INSERT INTO cache_version (name, version) SELECT 'catalog', 1 "
+                            "WHERE NOT EXISTS (SELECT 1 FROM cache_version WHERE name = 'catalog')"))
+
+
+@migration(6, "Leaderboard histograms and ranking index")
+def add_leaderboards():
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_score_quiz_ranking "
+                            "ON score (quiz_id, total_scored DESC, time_stamp_of_attempt)"))
+    db.session.execute(text("DELETE FROM quiz_score_count"))
+    db.session.execute(text("INSERT INTO quiz_score_count (quiz_id, total_scored, users) "
+                            "SELECT quiz_id, total_scored, COUNT(*) FROM score GROUP BY quiz_id, total_scored"))
+
+
+@migration(7, "Quiz sample_size for sampled quizzes")
+def add_quiz_sample_size():
+    if not _has_column("quiz", "sample_size"):
+        db.session.execute(text("ALTER TABLE quiz ADD COLUMN sample_size INTEGER"))
+
+
+@migration(8, "Quiz time_limit for timed attempt sessions")
+def add_quiz_time_limit():
+    if not _has_column("quiz", "time_limit"):
+        db.session.execute(text("ALTER TABLE quiz ADD COLUMN time_limit INTEGER"))
+
+
+@migration(9, "Longer user.password for password hashes")
+def widen_user_password():
+    # SQLite doesn't enforce VARCHAR lengths; plaintext passwords are hashed on the next login or by hash-passwords
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text('ALTER TABLE "user" ALTER COLUMN password TYPE VARCHAR(255)'))
+
+
+@migration(10, "Index on quiz.date_of_quiz for the schedule feed")
+def add_quiz_date_index():
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_quiz_date_of_quiz ON quiz (date_of_quiz)"))
+
+
+@migration(11, "Per-user score totals for the users report")
+def add_user_score_totals():
+    db.session.execute(text("DELETE FROM user_score_total"))
+    db.session.execute(text(
+        "INSERT INTO user_score_total (user_id, attempts, total_scored, total_questions, percentage) "
+        "SELECT user_id, COUNT(*), SUM(total_scored), SUM(total_questions), "
+        "CASE WHEN SUM(total_questions) > 0 THEN SUM(total_scored) * 100.0 / SUM(total_questions) ELSE -1.0 END "
+        "FROM score GROUP BY user_id"
+    ))
+
+
+def _has_column(table_name, column_name):
+    """ Fresh databases already get new columns from create_all() """
+    return any(column["name"] == column_name for column in inspect(db.session.connection()).get_columns(table_name))
+
+
+def upgrade_database():
+    """ Create missing tables, then apply every migration not applied yet. Returns the applied versions. """
+    db.create_all()
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+
+    newly_applied = []
+    for version, description, function in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied:
+            continue
+        function()
+        db.session.add(SchemaMigration(version=version, description=description, applied_at=datetime.utcnow()))
+        db.session.commit()  # One transaction per migration
+        newly_applied.append(version)
+    return newly_applied
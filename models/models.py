@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import json
+import time
 
 db = SQLAlchemy()  # Not binding it to the app yet
 
@@ -8,7 +8,7 @@ db = SQLAlchemy()  # Not binding it to the app yet
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)  # Used for login
-    password = db.Column(db.String(60), nullable=False)
+    password = db.Column(db.String(255), nullable=False)             # Salted hash (see models/identity.py)
     full_name = db.Column(db.String(100), nullable=False)
     qualification = db.Column(db.String(100), nullable=True)
     dob = db.Column(db.String(10), nullable=True)                   # Format: YYYY-MM-DD
@@ -25,16 +25,19 @@ class Subject(db.Model):
 # Chapter Table
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False) # Link to subject
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True) # Link to subject
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=True)
 
 # Quiz Table
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False) # Link to Chapter
-    date_of_quiz = db.Column(db.DateTime, nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True) # Link to Chapter
+    date_of_quiz = db.Column(db.DateTime, nullable=False, index=True)  # Range scans of the schedule feed
     remarks = db.Column(db.String(255), nullable=True)
+    questions_version = db.Column(db.BigInteger, nullable=False, default=time.time_ns) # Changes whenever the questions change
+    sample_size = db.Column(db.Integer, nullable=True)  # Questions served per learner out of the bank; None = all of them
+    time_limit = db.Column(db.Integer, nullable=True)   # Minutes per attempt, enforced by attempt sessions; None = untimed
 
     # Relationship to Chapter
     chapter = db.relationship('Chapter', backref=db.backref('quizzes', lazy=True))
@@ -43,7 +46,7 @@ class Quiz(db.Model):
 # Question Table
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False) # Link to Quiz
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True) # Link to Quiz
     question_statement = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(255), nullable=False)
     option2 = db.Column(db.String(255), nullable=False)
@@ -54,21 +57,141 @@ class Question(db.Model):
 # Score Table
 class Score(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False) # Link to Quiz
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True) # Link to Quiz
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # Link to User
     time_stamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow)
     total_scored = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
-    selected_answers = db.Column(db.Text, nullable=False)  # Store answers as JSON string
+    selected_answers = db.Column(db.Text, nullable=False, default="")  # Old JSON answers, emptied by migration 3
+    answers = db.Column(db.LargeBinary, nullable=True)          # One byte per question of the layout: 0 = not answered, else option 1-4
+    layout_version = db.Column(db.BigInteger, nullable=True)    # questions_version of the quiz when graded (see QuestionLayout)
+
+    # Latest attempt of a user on a quiz, and all attempts of a user
+    __table_args__ = (
+        db.Index('ix_score_user_quiz_time', 'user_id', 'quiz_id', 'time_stamp_of_attempt'),
+    )
 
     # Relationships
     user = db.relationship('User', backref=db.backref('scores', lazy=True))
     quiz = db.relationship('Quiz', backref=db.backref('scores', lazy=True))
 
-    def set_selected_answers(self, answers):
-        """ Store answers as JSON """
-        self.selected_answers = json.dumps(answers)
-
     def get_selected_answers(self):
-        """ Retrieve answers as dictionary """
-        return json.loads(self.selected_answers) if self.selected_answers else {}
+        """ Retrieve answers as dictionary {question id as string: option} """
+        from models.answers import get_layout  # models.answers imports this module
+        question_ids = get_layout(self.quiz_id, self.layout_version) if self.answers else None
+        if not question_ids:
+            return {}
+        return {str(question_id): answer for question_id, answer in zip(question_ids, self.answers) if answer}
+
+# Top of a quiz's leaderboard: best score first, earliest among equal scores
+db.Index('ix_score_quiz_ranking', Score.quiz_id, Score.total_scored.desc(), Score.time_stamp_of_attempt)
+
+# Attempt Table (append-only history of every submission; Score keeps only the latest one per user and quiz)
+class Attempt(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    time_stamp_of_attempt = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    total_scored = db.Column(db.Integer, nullable=False)
+    total_questions = db.Column(db.Integer, nullable=False)
+    answers = db.Column(db.LargeBinary, nullable=True)        # Packed like Score.answers
+    layout_version = db.Column(db.BigInteger, nullable=True)
+
+    # History of a user on a quiz
+    __table_args__ = (
+        db.Index('ix_attempt_user_quiz_time', 'user_id', 'quiz_id', 'time_stamp_of_attempt'),
+    )
+
+# Question Layout Table (order of a quiz's questions at one questions_version, used to decode Score.answers)
+class QuestionLayout(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    version = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    question_ids = db.Column(db.LargeBinary, nullable=False)  # Packed array of 64-bit question ids
+
+# User Chapter Progress Table (running totals of a user's scores per chapter, kept in sync with Score)
+class UserChapterProgress(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), primary_key=True, index=True)
+    total_scored = db.Column(db.Integer, nullable=False, default=0)
+    total_questions = db.Column(db.Integer, nullable=False, default=0)
+
+    chapter = db.relationship('Chapter')
+
+# User Score Total Table (a user's totals over their latest scores for the admin users report, kept in sync with Score;
+# only users with at least one score have a row)
+class UserScoreTotal(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Quizzes attempted
+    total_scored = db.Column(db.Integer, nullable=False, default=0)
+    total_questions = db.Column(db.Integer, nullable=False, default=0)
+    percentage = db.Column(db.Float, nullable=False, default=-1.0)  # -1 while total_questions is 0, so it sorts last
+
+# Keyset pages of the users report: highest first, user id breaking ties
+db.Index('ix_user_score_total_percentage', UserScoreTotal.percentage.desc(), UserScoreTotal.user_id)
+db.Index('ix_user_score_total_attempts', UserScoreTotal.attempts.desc(), UserScoreTotal.user_id)
+
+# Quiz Score Count Table (leaderboard histogram: how many users have each latest score on a quiz, kept in sync with Score)
+class QuizScoreCount(db.Model):
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    total_scored = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    users = db.Column(db.Integer, nullable=False, default=0)
+
+# Served Questions Table (the sample of a sampled quiz served to a user; the ids are stored as a QuestionLayout)
+class ServedQuestions(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True, index=True)
+    layout_version = db.Column(db.BigInteger, nullable=False)  # Sampled layout (negative version) holding the question ids
+    served_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Attempt Session Table (an attempt in progress: answers are autosaved and graded when submitted or when time runs out)
+class AttemptSession(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    layout_version = db.Column(db.BigInteger, nullable=True)  # Served sample of a sampled quiz; None = the whole quiz
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    deadline = db.Column(db.DateTime, nullable=True)          # None for untimed quizzes
+    finished_at = db.Column(db.DateTime, nullable=True)       # Set once graded
+
+    # Open session of a user on a quiz, and open sessions past their deadline for the sweeper
+    __table_args__ = (
+        db.Index('ix_attempt_session_user_quiz', 'user_id', 'quiz_id'),
+        db.Index('ix_attempt_session_open', 'finished_at', 'deadline'),
+    )
+
+# Attempt Session Answer Table (latest autosaved option per question of a session; 0 = cleared)
+class AttemptSessionAnswer(db.Model):
+    session_id = db.Column(db.Integer, db.ForeignKey('attempt_session.id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    answer = db.Column(db.SmallInteger, nullable=False)
+
+# Question Stat Table (item analysis: how often each question was presented and each option chosen, over every attempt)
+class QuestionStat(db.Model):
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), primary_key=True, autoincrement=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    chosen_option1 = db.Column(db.Integer, nullable=False, default=0)
+    chosen_option2 = db.Column(db.Integer, nullable=False, default=0)
+    chosen_option3 = db.Column(db.Integer, nullable=False, default=0)
+    chosen_option4 = db.Column(db.Integer, nullable=False, default=0)
+
+    def chosen(self, option):
+        return getattr(self, f"chosen_option{option}") or 0
+
+    @property
+    def unanswered(self):
+        return self.attempts - sum(self.chosen(option) for option in (1, 2, 3, 4))
+
+    def share(self, count):
+        """ Percentage of the attempts """
+        return round(100 * count / self.attempts) if self.attempts else 0
+
+# Schema Migration Table (versions applied by models/migrations.py)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Cache Version Table (versions of shared cached content; changing one invalidates it in every worker)
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
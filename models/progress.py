@@ -0,0 +1,145 @@
+from sqlalchemy import func, select, insert, delete, case
+from models.models import db, Chapter, Quiz, Score, UserChapterProgress, UserScoreTotal
+
+
+# Add the change caused by one Score write to the user's chapter totals and overall totals
+# (new_score: the user's first score on that quiz). Called before the commit of the Score so all land in the same transaction.
+def record_score_change(user_id, chapter_id, scored_delta, questions_delta, new_score=False):
+    progress = db.session.get(UserChapterProgress, (user_id, chapter_id))
+    if not progress:
+        progress = UserChapterProgress(user_id=user_id, chapter_id=chapter_id, total_scored=0, total_questions=0)
+        db.session.add(progress)
+    progress.total_scored += scored_delta
+    progress.total_questions += questions_delta
+
+    totals = db.session.get(UserScoreTotal, user_id)
+    if not totals:
+        totals = UserScoreTotal(user_id=user_id, attempts=0, total_scored=0, total_questions=0)
+        db.session.add(totals)
+    totals.attempts += 1 if new_score else 0
+    totals.total_scored += scored_delta
+    totals.total_questions += questions_delta
+    totals.percentage = totals.total_scored * 100.0 / totals.total_questions if totals.total_questions > 0 else -1.0
+
+
+# Grouped totals straight from Score, optionally limited to some chapters
+def _totals_from_scores(chapter_ids=None):
+    query = (
+        select(
+            Score.user_id,
+            Quiz.chapter_id,
+            func.sum(Score.total_scored),
+            func.sum(Score.total_questions),
+        )
+        .join(Quiz, Quiz.id == Score.quiz_id)
+        .group_by(Score.user_id, Quiz.chapter_id)
+    )
+    if chapter_ids is not None:
+        query = query.where(Quiz.chapter_id.in_(chapter_ids))
+    return query
+
+
+# Per-user totals straight from Score, optionally limited to some users (a list or a SELECT of ids)
+# and leaving out some quizzes (a SELECT of the ids of quizzes about to be deleted)
+def _user_totals_from_scores(user_ids=None, excluded_quiz_ids=None):
+    scored, questions = func.sum(Score.total_scored), func.sum(Score.total_questions)
+    query = (
+        select(
+            Score.user_id,
+            func.count(),
+            scored,
+            questions,
+            case((questions > 0, scored * 100.0 / questions), else_=-1.0),
+        )
+        .group_by(Score.user_id)
+    )
+    if user_ids is not None:
+        query = query.where(Score.user_id.in_(user_ids))
+    if excluded_quiz_ids is not None:
+        query = query.where(Score.quiz_id.not_in(excluded_quiz_ids))
+    return query
+
+
+# Recompute the totals of the given users from Score (after a regrade, or before their scores on
+# excluded_quiz_ids are deleted). Costs one index lookup per score of those users, not a pass over Score.
+def refresh_user_totals(user_ids, excluded_quiz_ids=None):
+    db.session.execute(delete(UserScoreTotal).where(UserScoreTotal.user_id.in_(user_ids)))
+    db.session.execute(
+        insert(UserScoreTotal).from_select(
+            ["user_id", "attempts", "total_scored", "total_questions", "percentage"],
+            _user_totals_from_scores(user_ids, excluded_quiz_ids),
+        )
+    )
+
+
+# Recompute the rows of the given chapters from Score (used when questions or quizzes are deleted)
+def refresh_chapter_progress(chapter_ids):
+    db.session.execute(delete(UserChapterProgress).where(UserChapterProgress.chapter_id.in_(chapter_ids)))
+    db.session.execute(
+        insert(UserChapterProgress).from_select(
+            ["user_id", "chapter_id", "total_scored", "total_questions"],
+            _totals_from_scores(chapter_ids),
+        )
+    )
+
+
+# Drop the rows of chapters that are being deleted
+def forget_chapters(chapter_ids):
+    db.session.execute(delete(UserChapterProgress).where(UserChapterProgress.chapter_id.in_(chapter_ids)))
+
+
+# Drop the rows of a user that is being deleted
+def forget_user(user_id):
+    db.session.execute(delete(UserChapterProgress).where(UserChapterProgress.user_id == user_id))
+    db.session.execute(delete(UserScoreTotal).where(UserScoreTotal.user_id == user_id))
+
+
+# Recompute the chapter progress and user totals tables from Score. Returns the number of rows that differed from the stored ones.
+def rebuild_progress():
+    expected = {
+        (user_id, chapter_id): (scored, questions)
+        for user_id, chapter_id, scored, questions in db.session.execute(_totals_from_scores())
+    }
+    stored = {
+        (row.user_id, row.chapter_id): (row.total_scored, row.total_questions)
+        for row in UserChapterProgress.query.all()
+    }
+    drift = sum(1 for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+    expected = {row[0]: tuple(row[1:4]) for row in db.session.execute(_user_totals_from_scores())}
+    stored = {
+        row.user_id: (row.attempts, row.total_scored, row.total_questions)
+        for row in UserScoreTotal.query.all()
+    }
+    drift += sum(1 for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+
+    db.session.execute(delete(UserChapterProgress))
+    db.session.execute(
+        insert(UserChapterProgress).from_select(
+            ["user_id", "chapter_id", "total_scored", "total_questions"],
+            _totals_from_scores(),
+        )
+    )
+    db.session.execute(delete(UserScoreTotal))
+    db.session.execute(
+        insert(UserScoreTotal).from_select(
+            ["user_id", "attempts", "total_scored", "total_questions", "percentage"],
+            _user_totals_from_scores(),
+        )
+    )
+    db.session.commit()
+    return drift
+
+
+# Chapter-wise summary of a user: a single read of the progress table
+def load_user_summary(user_id):
+    rows = (
+        db.session.query(Chapter.id, Chapter.name, UserChapterProgress.total_scored, UserChapterProgress.total_questions)
+        .join(UserChapterProgress, UserChapterProgress.chapter_id == Chapter.id)
+        .filter(UserChapterProgress.user_id == user_id, UserChapterProgress.total_questions > 0)
+        .order_by(Chapter.id)
+        .all()
+    )
+    return {
+        chapter_id: {"chapter_name": name, "total_score": scored, "total_questions": questions}
+        for chapter_id, name, scored, questions in rows
+    }
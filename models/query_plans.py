@@ -0,0 +1,54 @@
+from sqlalchemy import text
+from models.models import db, Chapter, Quiz, Question, Score, UserChapterProgress, UserScoreTotal, QuizScoreCount, AttemptSession
+
+
+# The lookups every page relies on. Each of them has to be answered through an index.
+def _hot_queries():
+    return {
+        "latest score of a user on a quiz": Score.query
+            .filter_by(user_id=1, quiz_id=1)
+            .order_by(Score.time_stamp_of_attempt.desc())
+            .limit(1),
+        "scores of a user": Score.query.filter_by(user_id=1),
+        "scores of a quiz": Score.query.filter_by(quiz_id=1),
+        "questions of a quiz": Question.query.filter_by(quiz_id=1),
+        "quizzes of a chapter": Quiz.query.filter_by(chapter_id=1),
+        "quizzes opening in a date range": Quiz.query
+            .filter(Quiz.date_of_quiz >= "2025-01-01", Quiz.date_of_quiz < "2025-01-15")
+            .order_by(Quiz.date_of_quiz, Quiz.id),
+        "chapters of a subject": Chapter.query.filter_by(subject_id=1),
+        "chapter progress of a user": UserChapterProgress.query.filter_by(user_id=1),
+        "users report page by percentage": UserScoreTotal.query
+            .filter(UserScoreTotal.percentage <= 50.0)
+            .order_by(UserScoreTotal.percentage.desc(), UserScoreTotal.user_id)
+            .limit(51),
+        "users report page by attempts": UserScoreTotal.query
+            .filter(UserScoreTotal.attempts <= 10)
+            .order_by(UserScoreTotal.attempts.desc(), UserScoreTotal.user_id)
+            .limit(51),
+        "score histogram of a quiz": QuizScoreCount.query.filter_by(quiz_id=1),
+        "top scores of a quiz": Score.query
+            .filter_by(quiz_id=1)
+            .order_by(Score.total_scored.desc(), Score.time_stamp_of_attempt)
+            .limit(10),
+        "open session of a user on a quiz": AttemptSession.query
+            .filter_by(user_id=1, quiz_id=1, finished_at=None),
+        "expired attempt sessions": AttemptSession.query
+            .filter(AttemptSession.finished_at.is_(None), AttemptSession.deadline < "2025-01-01")
+            .order_by(AttemptSession.deadline)
+            .limit(500),
+    }
+
+
+def check_query_plans():
+    """
+    Run EXPLAIN QUERY PLAN (SQLite) on each hot query.
+    Returns [(name, plan lines, uses_index)] where uses_index is False if any step is a full SCAN.
+    """
+    results = []
+    for name, query in _hot_queries().items():
+        statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}"))]
+        uses_index = not any(line.startswith("SCAN") for line in plan)
+        results.append((name, plan, uses_index))
+    return results
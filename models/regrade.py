@@ -0,0 +1,154 @@
+import threading
+from sqlalchemy import select, update, bindparam
+from flask import current_app
+from models.models import db, Quiz, Question, Score, Attempt
+from models.progress import refresh_chapter_progress, refresh_user_totals
+from models.leaderboard import refresh_leaderboards
+from models.answers import NOT_IN_KEY, get_layout, aligned_key, count_correct, is_sampled_layout
+from models.fragments import cache_changed
+
+
+# Exact regrading: every attempt's stored answers are checked again against the quiz's current answer key.
+# Scores are read and written in chunks with one transaction per chunk, so the write lock is only held briefly.
+# A row is only rewritten if it still holds the attempt that was read (same time_stamp_of_attempt): a score
+# replaced by a submission in between keeps the new grade, and the chunk is checked again.
+# Quizzes with many rows to check are regraded in a background thread and the admin request returns immediately.
+CHUNK_SIZE = 5000
+BACKGROUND_THRESHOLD = 5000  # More scores and attempts than this are regraded in the background
+
+_jobs = {}  # quiz_id -> {"total", "done", "status", "pending"}
+_jobs_lock = threading.Lock()
+
+_score_table = Score.__table__
+_attempt_table = Attempt.__table__
+
+
+def _update_rows(table):
+    return (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), table.c.time_stamp_of_attempt.is_not_distinct_from(bindparam("graded_at")))
+        .values(total_scored=bindparam("new_scored"), total_questions=bindparam("new_total"))
+    )
+
+
+def load_answer_key(quiz_id):
+    """ {question id: correct option} of the quiz's current questions """
+    rows = db.session.execute(select(Question.id, Question.correct_option).where(Question.quiz_id == quiz_id))
+    return dict(rows.all())
+
+
+def regrade_quiz(quiz_id, on_progress=None):
+    """
+    Regrade every attempt of a quiz, latest scores and history. Returns the number of latest scores checked;
+    on_progress gets the number of rows checked so far, scores then attempts.
+    """
+    answer_key = load_answer_key(quiz_id)
+    keys_by_layout = {}  # layout version -> (current answer key in that layout's order, questions it counts)
+
+    checked = _regrade_table(_score_table, quiz_id, answer_key, keys_by_layout, on_progress)
+    _regrade_table(_attempt_table, quiz_id, answer_key, keys_by_layout,
+                   on_progress and (lambda done: on_progress(checked + done)))
+
+    # Chapter and user totals and the leaderboard follow the new scores; pages showing scores are no longer current
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz:
+        refresh_chapter_progress([quiz.chapter_id])
+    refresh_user_totals(select(Score.user_id).where(Score.quiz_id == quiz_id))
+    refresh_leaderboards([quiz_id])
+    cache_changed("grades")
+    db.session.commit()
+    return checked
+
+
+def _regrade_table(table, quiz_id, answer_key, keys_by_layout, on_progress=None):
+    total_questions = len(answer_key)
+    update_rows = _update_rows(table)
+
+    checked = 0
+    last_id = 0
+    while True:
+        # Keyset over the quiz's rows, one chunk at a time
+        rows = db.session.execute(
+            select(table.c.id, table.c.answers, table.c.layout_version,
+                   table.c.total_scored, table.c.total_questions, table.c.time_stamp_of_attempt)
+            .where(table.c.quiz_id == quiz_id, table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        changes = []
+        for row_id, packed_answers, layout_version, old_scored, old_total, graded_at in rows:
+            cached = keys_by_layout.get(layout_version)
+            if cached is None:
+                key = aligned_key(get_layout(quiz_id, layout_version) or (), answer_key)
+                # A sampled attempt is out of the served questions that still exist, others out of the whole quiz
+                total = len(key) - key.count(NOT_IN_KEY) if is_sampled_layout(layout_version) else total_questions
+                cached = keys_by_layout[layout_version] = (key, total)
+            key, total = cached
+            new_scored = count_correct(packed_answers or b"", key)
+            if new_scored != old_scored or total != old_total:
+                changes.append({"row_id": row_id, "new_scored": new_scored, "new_total": total, "graded_at": graded_at})
+        updated = db.session.execute(update_rows, changes).rowcount if changes else 0
+        db.session.commit()
+        if updated < len(changes):
+            continue  # Some scores were replaced after they were read: check the chunk again
+
+        checked += len(rows)
+        last_id = rows[-1].id
+        if on_progress:
+            on_progress(checked)
+    return checked
+
+
+def _run_job(app, quiz_id):
+    with app.app_context():
+        job = _jobs[quiz_id]
+        try:
+            while True:
+                with _jobs_lock:
+                    job["pending"] = False
+                    job["done"] = 0
+                regrade_quiz(quiz_id, on_progress=lambda done: job.update(done=done))
+                with _jobs_lock:
+                    # The answer key changed again while we were running: go once more
+                    if not job["pending"]:
+                        job["status"] = "finished"
+                        return
+        except Exception:
+            db.session.rollback()
+            with _jobs_lock:
+                job["status"] = "failed"
+            raise
+        finally:
+            db.session.remove()
+
+
+def start_regrade(quiz_id):
+    """
+    Regrade a quiz after its answer key changed (call after committing the change).
+    Small quizzes are regraded right away; big ones in a background thread.
+    """
+    # Both the latest scores and the attempt history are rewritten
+    rows = Score.query.filter_by(quiz_id=quiz_id).count() + Attempt.query.filter_by(quiz_id=quiz_id).count()
+    if rows <= BACKGROUND_THRESHOLD:
+        regrade_quiz(quiz_id)
+        return
+
+    with _jobs_lock:
+        job = _jobs.get(quiz_id)
+        if job and job["status"] == "running":
+            job["pending"] = True  # The running job will pick up the new key
+            return
+        _jobs[quiz_id] = {"total": rows, "done": 0, "status": "running", "pending": False}
+
+    app = current_app._get_current_object()
+    threading.Thread(target=_run_job, args=(app, quiz_id), daemon=True).start()
+
+
+def regrade_status(quiz_id):
+    """ Progress of the background regrade of a quiz, or None """
+    with _jobs_lock:
+        job = _jobs.get(quiz_id)
+        return dict(job) if job else None
@@ -0,0 +1,88 @@
+from sqlalchemy import or_, and_, func, case
+from models.models import db, User, UserScoreTotal
+
+
+USER_REPORT_SORTS = ("id", "percentage", "attempts")
+
+# Sort value of users without any score: below every stored value, so they come last
+NO_TOTALS = {"percentage": -2.0, "attempts": 0}
+
+
+# Per-user totals for the admin users page, read from UserScoreTotal (kept in sync with Score on every write).
+# Pages are fetched with keyset pagination: `cursor` is the (sort value, user id) of the last row
+# of the previous page, so every page is one index range read of page_size rows however deep it is
+# and however many scores there are. Sorted by percentage or attempts, the users with totals come first
+# (highest first, from ix_user_score_total_*), then the users without any score by id.
+def user_score_report(sort="id", cursor=None, page_size=50):
+    if sort not in USER_REPORT_SORTS:
+        sort = "id"
+
+    columns = (
+        User.id, User.full_name, User.email, User.role,
+        func.coalesce(UserScoreTotal.attempts, 0).label("attempts"),
+        case((UserScoreTotal.total_questions > 0, UserScoreTotal.percentage), else_=None).label("total_percentage"),
+    )
+
+    # One extra row tells us whether there is a next page
+    if sort == "id":
+        query = db.session.query(*columns).outerjoin(UserScoreTotal, UserScoreTotal.user_id == User.id)
+        if cursor is not None:
+            query = query.filter(User.id > cursor[1])
+        rows = query.order_by(User.id).limit(page_size + 1).all()
+    else:
+        sort_column = UserScoreTotal.percentage if sort == "percentage" else UserScoreTotal.attempts
+        rows = []
+        if cursor is None or cursor[0] > NO_TOTALS[sort]:
+            query = db.session.query(*columns).join(UserScoreTotal, UserScoreTotal.user_id == User.id)
+            if cursor is not None:
+                last_value, last_id = cursor
+                # The first condition bounds the index range, the second skips what the previous page showed
+                query = query.filter(sort_column <= last_value,
+                                     or_(sort_column < last_value, and_(sort_column == last_value, UserScoreTotal.user_id > last_id)))
+            rows = query.order_by(sort_column.desc(), UserScoreTotal.user_id).limit(page_size + 1).all()
+        if len(rows) <= page_size:
+            # Then the users without any score
+            query = (
+                db.session.query(*columns)
+                .outerjoin(UserScoreTotal, UserScoreTotal.user_id == User.id)
+                .filter(UserScoreTotal.user_id.is_(None))
+            )
+            if cursor is not None and cursor[0] == NO_TOTALS[sort]:
+                query = query.filter(User.id > cursor[1])
+            rows += query.order_by(User.id).limit(page_size + 1 - len(rows)).all()
+
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_next and rows:
+        last = rows[-1]
+        if sort == "id":
+            next_cursor = (last.id, last.id)
+        else:
+            next_cursor = (_sort_value(last, sort), last.id)
+
+    return rows, next_cursor
+
+
+def _sort_value(row, sort):
+    """ Stored sort value of a report row, NO_TOTALS for a user without any score """
+    if row.attempts == 0:
+        return NO_TOTALS[sort]
+    if sort == "attempts":
+        return row.attempts
+    return row.total_percentage if row.total_percentage is not None else -1.0
+
+
+# Cursor is passed in the query string as "<sort value>:<user id>"
+def encode_cursor(cursor):
+    return f"{cursor[0]!r}:{cursor[1]}" if cursor else None
+
+
+def decode_cursor(value, sort):
+    try:
+        sort_value, user_id = value.rsplit(":", 1)
+        sort_value = float(sort_value) if sort == "percentage" else int(sort_value)
+        return sort_value, int(user_id)
+    except (AttributeError, ValueError):
+        return None
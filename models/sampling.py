@@ -0,0 +1,74 @@
+import random
+from datetime import datetime
+from sqlalchemy import delete
+from models.models import db, ServedQuestions
+from models.engine import upsert_insert
+from models.answers import ensure_layout, get_layout, sampled_layout_version
+
+
+# Sampled quizzes: a quiz with a sample_size serves each learner that many questions out of its bank.
+# The sample is drawn from the question id array the answer key cache already holds (random.sample picks
+# k positions without touching the other questions), seeded by quiz, learner and bank version so the same
+# learner always gets the same questions in the same order. The served ids are stored as a sampled layout
+# and remembered in ServedQuestions, so the submission is graded, and the results page shown, for exactly
+# the served questions.
+
+
+def draw_sample(question_ids, size, quiz_id, user_id, version):
+    """ size question ids out of question_ids, in a stable per-learner order """
+    rng = random.Random(f"{quiz_id}:{user_id}:{version}")
+    return tuple(rng.sample(question_ids, size))
+
+
+def _remember_served(user_id, quiz_id, version):
+    values = {"user_id": user_id, "quiz_id": quiz_id, "layout_version": version, "served_at": datetime.utcnow()}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # Two tabs opening the quiz at once draw the same sample, so either write may win
+        insert = upsert_insert(dialect)
+        statement = insert(ServedQuestions).values(**values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=["user_id", "quiz_id"],
+            set_={"layout_version": statement.excluded.layout_version, "served_at": statement.excluded.served_at},
+        ))
+    else:
+        db.session.merge(ServedQuestions(**values))
+
+
+def served_answer_key(quiz, user_id, answer_key):
+    """
+    Answer key of the questions a learner is served: the whole quiz, or for a sampled quiz the learner's sample.
+    The first call for a learner (and any call after served questions were deleted or the sample size changed)
+    draws and stores a sample and commits it.
+    """
+    if not quiz.sample_size:
+        return answer_key
+    # A size stored out of range (older rows saved without validation) serves what exists instead of failing
+    size = min(max(quiz.sample_size, 1), len(answer_key.question_ids))
+    if size == len(answer_key.question_ids):
+        return answer_key
+
+    served = db.session.get(ServedQuestions, (user_id, quiz.id))
+    if served:
+        key = answer_key.subset(get_layout(quiz.id, served.layout_version) or (), served.layout_version)
+        if len(key.question_ids) == size:
+            return key
+
+    question_ids = draw_sample(answer_key.question_ids, size, quiz.id, user_id, answer_key.version)
+    version = sampled_layout_version(question_ids)
+    ensure_layout(quiz.id, version, question_ids)
+    _remember_served(user_id, quiz.id, version)
+    db.session.commit()
+    return answer_key.subset(question_ids, version)
+
+
+def forget_served_quizzes(quiz_ids):
+    """ Drop the served samples of quizzes that are being deleted (a list or a SELECT of ids) """
+    db.session.execute(delete(ServedQuestions).where(ServedQuestions.quiz_id.in_(quiz_ids)),
+                       execution_options={"synchronize_session": False})
+
+
+def forget_served_user(user_id):
+    """ Drop the served samples of a user that is being deleted """
+    db.session.execute(delete(ServedQuestions).where(ServedQuestions.user_id == user_id),
+                       execution_options={"synchronize_session": False})
@@ -0,0 +1,67 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from models.models import db, Subject, Chapter, Quiz
+
+
+# Quiz availability. A quiz can be attempted from its date_of_quiz on; dates are local time, as the admin forms save them.
+# The dashboard feed lists the quizzes that opened in the last FEED_DAYS days ("open now") and those opening in the
+# next FEED_DAYS days, across all subjects, from short range scans of ix_quiz_date_of_quiz. It is rendered once per
+# catalog version and FEED_BUCKET_SECONDS time bucket, and again as soon as one of the listed quizzes opens.
+FEED_DAYS = 7
+FEED_BUCKET_SECONDS = 60
+FEED_ITEMS = 10  # Quizzes shown in each part of the feed
+
+ScheduledQuiz = namedtuple("ScheduledQuiz", ["id", "subject_id", "subject", "chapter", "remarks", "date_of_quiz"])
+
+
+def quiz_is_open(quiz, now=None):
+    return quiz.date_of_quiz <= (now or datetime.now())
+
+
+def _scheduled(*conditions, order_by, limit):
+    rows = db.session.execute(
+        select(Quiz.id, Subject.id, Subject.name, Chapter.name, Quiz.remarks, Quiz.date_of_quiz)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .join(Subject, Subject.id == Chapter.subject_id)
+        .where(*conditions)
+        .order_by(*order_by)
+        .limit(limit)
+    )
+    return [ScheduledQuiz(*row) for row in rows]
+
+
+def quizzes_opened(start, now, limit=None):
+    """ Quizzes of every subject with start <= date_of_quiz <= now, latest first, with their subject and chapter """
+    return _scheduled(Quiz.date_of_quiz >= start, Quiz.date_of_quiz <= now,
+                      order_by=(Quiz.date_of_quiz.desc(), Quiz.id.desc()), limit=limit)
+
+
+def quizzes_opening(now, end, limit=None):
+    """ Quizzes with now < date_of_quiz < end, soonest first """
+    return _scheduled(Quiz.date_of_quiz > now, Quiz.date_of_quiz < end,
+                      order_by=(Quiz.date_of_quiz, Quiz.id), limit=limit)
+
+
+def time_bucket(now=None):
+    """ Number of the FEED_BUCKET_SECONDS time bucket of a moment """
+    return int((now or datetime.now()).timestamp()) // FEED_BUCKET_SECONDS
+
+
+def schedule_feed(now=None, days=FEED_DAYS, items=FEED_ITEMS):
+    """
+    (open now, opening soon, expires_at): up to `items` quizzes opened in the last `days` days, latest first, and
+    opening in the next `days` days, soonest first. Each list is one LIMITed walk of the date index, so the cost
+    doesn't grow with the number of quizzes in the window. expires_at (Unix time) is when the lists change: the
+    next quiz opening, or the end of the time bucket, whichever comes first.
+    """
+    now = now or datetime.now()
+    bucket = time_bucket(now)
+    window = timedelta(days=days)
+    open_now = quizzes_opened(now - window, now, items)
+    upcoming = quizzes_opening(now, now + window, items)
+
+    expires_at = (bucket + 1) * FEED_BUCKET_SECONDS
+    if upcoming:
+        expires_at = min(expires_at, upcoming[0].date_of_quiz.timestamp())
+    return open_now, upcoming, expires_at
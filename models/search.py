@@ -0,0 +1,192 @@
+import re
+from sqlalchemy import text, select, delete, table, column
+from sqlalchemy.exc import OperationalError
+from models.models import db, User, Subject, Chapter, Quiz, Question
+
+
+# Every searchable row lives in one FTS5 table. Its rowid encodes what the row is:
+# rowid = id * 8 + kind code, so an entry can be replaced or removed with a rowid lookup.
+KINDS = {"user": 1, "subject": 2, "chapter": 3, "quiz": 4, "question": 5}
+KIND_MODELS = {"user": User, "subject": Subject, "chapter": Chapter, "quiz": Quiz, "question": Question}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+
+ADMIN_KINDS = ("user", "subject", "chapter", "quiz", "question")
+USER_KINDS = ("subject", "quiz")  # What learners are allowed to find
+
+_fts_databases = set()  # URLs of the databases whose index was found (see search_index_available)
+_search_table = table("search_index", column("rowid"))  # For set-based deletes
+
+
+def _rowid(kind, ref_id):
+    return ref_id * 8 + KINDS[kind]
+
+
+def _fields(kind, obj):
+    """ Title and body text indexed for an object """
+    if kind == "user":
+        return obj.full_name, obj.email
+    if kind in ("subject", "chapter"):
+        return obj.name, obj.description or ""
+    if kind == "quiz":
+        return obj.remarks or "", ""
+    return obj.question_statement, ""
+
+
+def search_index_available():
+    """
+    True when the database is SQLite and the FTS5 index table exists. Only True is cached, per database: until
+    then every call looks again, so workers start using an index that `flask rebuild-search-index` created after
+    they started, and an app on another database (tests, benchmarks) doesn't inherit the answer.
+    """
+    url = str(db.engine.url)
+    if url not in _fts_databases and db.engine.dialect.name == "sqlite" and db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+    ).first() is not None:
+        _fts_databases.add(url)
+    return url in _fts_databases
+
+
+def create_search_index():
+    """ Create the FTS5 table. Returns False when this SQLite build has no FTS5. """
+    if db.engine.dialect.name != "sqlite":
+        return False
+    try:
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(title, body, tokenize = 'unicode61')"
+        ))
+        db.session.commit()
+    except OperationalError:  # SQLite compiled without FTS5
+        db.session.rollback()
+        return False
+    _fts_databases.add(str(db.engine.url))
+    return True
+
+
+def rebuild_search_index():
+    """ Refill the index from the tables. Returns the number of indexed rows. """
+    if not create_search_index():
+        return 0
+    db.session.execute(text("DELETE FROM search_index"))
+    insert = text("INSERT INTO search_index(rowid, title, body) VALUES (:rowid, :title, :body)")
+    total = 0
+    batch = []
+    for kind, model in KIND_MODELS.items():
+        for obj in model.query.yield_per(1000):
+            title, body = _fields(kind, obj)
+            batch.append({"rowid": _rowid(kind, obj.id), "title": title, "body": body})
+            if len(batch) == 1000:
+                db.session.execute(insert, batch)
+                total += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(insert, batch)
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
+# ---------- Keeping the index in sync (called by the routes before they commit) ----------
+
+def index_object(kind, obj):
+    """ Add or replace the entry of a created or edited object. The object must have an id (flush first). """
+    if not search_index_available():
+        return
+    title, body = _fields(kind, obj)
+    params = {"rowid": _rowid(kind, obj.id), "title": title, "body": body}
+    db.session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), params)
+    db.session.execute(text("INSERT INTO search_index(rowid, title, body) VALUES (:rowid, :title, :body)"), params)
+
+
+def index_rows(kind, rows):
+    """ Add entries for newly inserted rows given as (id, title, body) tuples """
+    if not search_index_available() or not rows:
+        return
+    db.session.execute(
+        text("INSERT INTO search_index(rowid, title, body) VALUES (:rowid, :title, :body)"),
+        [{"rowid": _rowid(kind, ref_id), "title": title, "body": body} for ref_id, title, body in rows],
+    )
+
+
+def unindex_object(kind, ref_id):
+    if not search_index_available():
+        return
+    db.session.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": _rowid(kind, ref_id)})
+
+
+def unindex_quizzes(quiz_ids):
+    """ Remove quizzes and all their questions. quiz_ids is a list or a SELECT of ids; run it before the rows are deleted. """
+    if not search_index_available():
+        return
+    question_rowids = select(Question.id * 8 + KINDS["question"]).where(Question.quiz_id.in_(quiz_ids))
+    quiz_rowids = select(Quiz.id * 8 + KINDS["quiz"]).where(Quiz.id.in_(quiz_ids))
+    db.session.execute(delete(_search_table).where(_search_table.c.rowid.in_(question_rowids)))
+    db.session.execute(delete(_search_table).where(_search_table.c.rowid.in_(quiz_rowids)))
+
+
+def unindex_chapters(chapter_ids):
+    """ Remove chapters (not their quizzes). chapter_ids is a list or a SELECT of ids. """
+    if not search_index_available():
+        return
+    chapter_rowids = select(Chapter.id * 8 + KINDS["chapter"]).where(Chapter.id.in_(chapter_ids))
+    db.session.execute(delete(_search_table).where(_search_table.c.rowid.in_(chapter_rowids)))
+
+
+# ---------- Searching ----------
+
+def _match_expression(query):
+    """ Every word of the query must match, each as a prefix. Words are quoted so FTS syntax can't leak in. """
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _like_search(query, kinds):
+    """ Fallback when FTS5 is not available: the original LIKE scans """
+    pattern = f"%{query}%"
+    results = {kind: [] for kind in kinds}
+    if "user" in kinds:
+        results["user"] = User.query.filter(User.full_name.ilike(pattern) | User.email.ilike(pattern)).all()
+    if "subject" in kinds:
+        results["subject"] = Subject.query.filter(Subject.name.ilike(pattern)).all()
+    if "chapter" in kinds:
+        results["chapter"] = Chapter.query.filter(Chapter.name.ilike(pattern)).all()
+    if "quiz" in kinds:
+        results["quiz"] = Quiz.query.filter(Quiz.remarks.ilike(pattern)).all()
+    if "question" in kinds:
+        results["question"] = Question.query.filter(Question.question_statement.ilike(pattern)).all()
+    return results, False
+
+
+def search(query, kinds, page=1, page_size=50):
+    """
+    Ranked, prefix-matching search over the given kinds.
+    Returns ({kind: [objects in rank order]}, has_next_page).
+    """
+    if not search_index_available():
+        return _like_search(query, kinds)
+
+    results = {kind: [] for kind in kinds}
+    expression = _match_expression(query)
+    if not expression:
+        return results, False
+
+    codes = ", ".join(str(KINDS[kind]) for kind in kinds)
+    rows = db.session.execute(
+        text(
+            f"SELECT rowid FROM search_index WHERE search_index MATCH :expression AND rowid % 8 IN ({codes}) "
+            "ORDER BY bm25(search_index, 10.0, 1.0) LIMIT :limit OFFSET :offset"
+        ),
+        {"expression": expression, "limit": page_size + 1, "offset": (max(page, 1) - 1) * page_size},
+    ).scalars().all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    # One IN query per kind, then put the objects back in rank order
+    ids_by_kind = {}
+    for rowid in rows:
+        ids_by_kind.setdefault(KIND_NAMES[rowid % 8], []).append(rowid // 8)
+    for kind, ids in ids_by_kind.items():
+        model = KIND_MODELS[kind]
+        objects = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+        results[kind] = [objects[ref_id] for ref_id in ids if ref_id in objects]
+
+    return results, has_next
@@ -0,0 +1,64 @@
+// Timed quizzes: autosave each answer as it is picked and count down to the deadline.
+// Answers that fail to save are sent again with the next change (the submitted form carries all of them anyway);
+// the form is submitted when time runs out, and the server grades the saved answers even if it never is.
+(function () {
+    var form = document.querySelector("form[data-autosave-url]");
+    if (!form) {
+        return;
+    }
+    var url = form.getAttribute("data-autosave-url");
+    var secondsLeft = parseInt(form.getAttribute("data-seconds-left"), 10);
+    var display = document.getElementById("time-left");
+    var unsaved = {};
+    var submitted = false;
+
+    function save() {
+        var answers = unsaved;
+        if (!Object.keys(answers).length) {
+            return;
+        }
+        unsaved = {};
+        fetch(url, {
+            method: "POST",
+            credentials: "same-origin",
+            headers: {"Content-Type": "application/json"},
+            body: JSON.stringify({answers: answers})
+        }).then(function (response) {
+            if (!response.ok && response.status >= 500) {
+                throw new Error(response.statusText);
+            }
+        }).catch(function () {
+            for (var id in answers) {
+                if (!(id in unsaved)) {
+                    unsaved[id] = answers[id];
+                }
+            }
+        });
+    }
+
+    form.addEventListener("change", function (event) {
+        var match = /^question_(\d+)$/.exec(event.target.name);
+        if (match) {
+            unsaved[match[1]] = parseInt(event.target.value, 10);
+            save();
+        }
+    });
+
+    form.addEventListener("submit", function () {
+        submitted = true;
+    });
+
+    function tick() {
+        secondsLeft = Math.max(0, secondsLeft - 1);
+        var seconds = secondsLeft % 60;
+        display.textContent = Math.floor(secondsLeft / 60) + ":" + (seconds < 10 ? "0" : "") + seconds;
+        if (secondsLeft === 0 && !submitted) {
+            submitted = true;
+            form.submit();
+        }
+    }
+
+    if (!isNaN(secondsLeft) && display) {
+        setInterval(tick, 1000);
+    }
+})();
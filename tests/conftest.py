@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# The tests import the app the way `flask --app app` does, from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.bootstrap import initialize_database
+from models.models import db
+from models.attempts import attempt_writer
+from models.attempt_sessions import autosave_writer
+
+
+@pytest.fixture
+def app(tmp_path):
+    """ App on a fresh database in a temporary directory """
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/quiz_master.db", "SQL_SLOW_QUERY_MS": 0})
+    with app.app_context():
+        initialize_database(log=lambda message: None)
+    yield app
+    # The writer threads keep the app that started them; the next test's app starts its own
+    attempt_writer.close()
+    autosave_writer.close()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score, AttemptSession
+
+
+def add_timed_quiz():
+    """ An open timed quiz with three questions and a learner; returns (user id, quiz id, question ids) """
+    user = User(email="learner@example.com", password="x", full_name="Learner")
+    subject = Subject(name="Subject")
+    db.session.add_all([user, subject])
+    db.session.flush()
+    chapter = Chapter(subject_id=subject.id, name="Chapter")
+    db.session.add(chapter)
+    db.session.flush()
+    quiz = Quiz(chapter_id=chapter.id, date_of_quiz=datetime.now() - timedelta(days=1), time_limit=10)
+    db.session.add(quiz)
+    db.session.flush()
+    questions = [Question(quiz_id=quiz.id, question_statement=f"Question {number}", option1="a", option2="b",
+                          option3="c", option4="d", correct_option=1) for number in range(3)]
+    db.session.add_all(questions)
+    db.session.commit()
+    return user.id, quiz.id, [question.id for question in questions]
+
+
+def logged_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def second_worker(app):
+    """ Another app on the same database, standing in for another worker process """
+    return create_app({"SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"], "SQL_SLOW_QUERY_MS": 0})
+
+
+def test_autosave_after_another_worker_finished_the_session_is_rejected(app):
+    with app.app_context():
+        user_id, quiz_id, question_ids = add_timed_quiz()
+        database = db.engine.url.database
+    client = logged_in(app, user_id)
+    session_id = client.post(f"/api/v1/quizzes/{quiz_id}/sessions").get_json()["id"]
+    response = client.post(f"/api/v1/sessions/{session_id}/answers", json={"answers": {str(question_ids[0]): 1}})
+    assert response.status_code == 202  # This worker now remembers the session as open
+
+    # Another process (e.g. its sweeper) finishes the session
+    other = sqlite3.connect(database)
+    other.execute("UPDATE attempt_session SET finished_at = ? WHERE id = ?", (datetime.utcnow().isoformat(" "), session_id))
+    other.commit()
+    other.close()
+
+    response = client.post(f"/api/v1/sessions/{session_id}/answers", json={"answers": {str(question_ids[1]): 1}})
+    assert response.status_code == 409
+    assert client.get(f"/api/v1/sessions/{session_id}").get_json()["answers"] == {str(question_ids[0]): 1}
+
+
+def test_autosave_racing_the_submit_of_another_worker_is_graded_or_rejected(app):
+    with app.app_context():
+        user_id, quiz_id, question_ids = add_timed_quiz()
+    autosaving = logged_in(app, user_id)
+    session_id = autosaving.post(f"/api/v1/quizzes/{quiz_id}/sessions").get_json()["id"]
+    assert autosaving.post(f"/api/v1/sessions/{session_id}/answers",
+                           json={"answers": {str(question_ids[0]): 1}}).status_code == 202
+
+    # The other worker claims the session; the autosave is sent while its claim is not committed yet
+    submitting_app = second_worker(app)
+    submitting = logged_in(submitting_app, user_id)
+    late = {}
+
+    def autosave():
+        late["response"] = autosaving.post(f"/api/v1/sessions/{session_id}/answers",
+                                           json={"answers": {str(question_ids[1]): 1}})
+
+    autosaver = threading.Thread(target=autosave)
+
+    def after_claim(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE attempt_session SET finished_at") and not autosaver.is_alive() and not late:
+            autosaver.start()
+            autosaver.join(0.5)  # The autosave waits for the write lock held by the claim
+
+    with submitting_app.app_context():
+        engine = db.engine
+    event.listen(engine, "after_cursor_execute", after_claim)
+    try:
+        result = submitting.post(f"/api/v1/sessions/{session_id}/submit")
+    finally:
+        event.remove(engine, "after_cursor_execute", after_claim)
+    autosaver.join()
+    assert result.status_code == 201
+
+    # Acknowledged answers are graded; a rejected one is not
+    graded = result.get_json()["score"]
+    if late["response"].status_code == 202:
+        assert graded == 2
+    else:
+        assert late["response"].status_code == 409
+        assert graded == 1
+    with app.app_context():
+        assert db.session.get(AttemptSession, session_id).finished_at is not None
+        assert Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).one().total_scored == graded
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score
+
+
+def add_subject(name, chapters, quizzes_per_chapter, questions_per_quiz=2):
+    """ Subject with a full chapter/quiz/question tree; returns its id """
+    subject = Subject(name=name)
+    db.session.add(subject)
+    db.session.flush()
+    for chapter_number in range(chapters):
+        chapter = Chapter(subject_id=subject.id, name=f"{name} chapter {chapter_number}")
+        db.session.add(chapter)
+        db.session.flush()
+        for quiz_number in range(quizzes_per_chapter):
+            # One quiz of each chapter opens tomorrow, so both kinds of rows are rendered
+            opens = datetime.now() + timedelta(days=1 if quiz_number == 0 else -1)
+            quiz = Quiz(chapter_id=chapter.id, date_of_quiz=opens, remarks=f"quiz {quiz_number}")
+            db.session.add(quiz)
+            db.session.flush()
+            for question_number in range(questions_per_quiz):
+                db.session.add(Question(quiz_id=quiz.id, question_statement=f"Question {question_number}",
+                                        option1="a", option2="b", option3="c", option4="d", correct_option=1))
+    db.session.commit()
+    return subject.id
+
+
+def add_scores(user_id, subject_id):
+    """ A score of the user on every quiz of the subject """
+    quizzes = Quiz.query.join(Chapter).filter(Chapter.subject_id == subject_id).all()
+    for quiz in quizzes:
+        db.session.add(Score(quiz_id=quiz.id, user_id=user_id, total_scored=1, total_questions=2))
+    db.session.commit()
+
+
+def count_statements(app, client, url):
+    """ Number of SQL statements run while serving url """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_view_quizzes_queries_do_not_grow_with_the_catalog(app):
+    with app.app_context():
+        user = User(email="learner@example.com", password="x", full_name="Learner")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        sizes = [(1, 1), (3, 4), (8, 10)]
+        subject_ids = [add_subject(f"Subject {chapters}x{quizzes}", chapters, quizzes) for chapters, quizzes in sizes]
+        for subject_id in subject_ids:
+            add_scores(user_id, subject_id)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    client.get("/user_dashboard")  # Caches the user's identity
+
+    # Every subject is rendered for the first time, so each page is built from the database
+    counts = [count_statements(app, client, f"/view_quizzes/{subject_id}") for subject_id in subject_ids]
+    assert counts[0] == counts[1] == counts[2], counts
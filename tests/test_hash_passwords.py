@@ -0,0 +1,22 @@
+from sqlalchemy import insert, select
+from models.identity import hash_plaintext_passwords, is_hashed
+from models.models import db, User
+
+
+def test_hash_passwords_picks_what_login_would_upgrade(app):
+    """ The command and is_hashed agree, including on plaintext that looks like a hash prefix """
+    passwords = ["secret", "scrypt:secret", "pbkdf2:sha256$x", "scrypt:32768:8:1$salt$hash$extra",
+                 "pbkdf2:sha256:600000$salt$hash", "scrypt:32768:8:1$salt$hash"]
+    with app.app_context():
+        db.session.execute(insert(User.__table__), [
+            {"email": f"{i}@test", "password": password, "full_name": "Test", "role": "user"}
+            for i, password in enumerate(passwords)
+        ])
+        db.session.commit()
+        expected = sum(not is_hashed(password) for password in passwords)
+
+        assert hash_plaintext_passwords(batch_size=2) == expected
+        stored = db.session.execute(select(User.email, User.password).where(User.email.like("%@test"))).all()
+        assert all(is_hashed(password) for _, password in stored)
+        unchanged = {email: password for email, password in stored}
+        assert unchanged["4@test"] == passwords[4] and unchanged["5@test"] == passwords[5]
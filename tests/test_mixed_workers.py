@@ -0,0 +1,27 @@
+import multiprocessing
+
+from benchmarks.mixed_workers import TUNED, seed, worker
+
+PROCESSES = 4
+SECONDS = 2
+
+
+def test_worker_processes_read_and_submit_without_lock_errors(tmp_path):
+    """ A short run of benchmarks/mixed_workers.py: every worker process reads and submits, and none gets a 500 """
+    context = multiprocessing.get_context("spawn")
+    environment = dict(TUNED, FLASK_SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path}/workers.db", FLASK_SQL_SLOW_QUERY_MS="0")
+    with context.Pool(1) as pool:
+        subject_id, quiz_ids, user_ids = pool.apply(seed, (environment, PROCESSES))
+
+    results = context.Queue()
+    workers = [context.Process(target=worker, args=(environment, user_id, subject_id, quiz_ids, SECONDS, results))
+               for user_id in user_ids]
+    for process in workers:
+        process.start()
+    collected = [results.get(timeout=120) for _ in workers]
+    for process in workers:
+        process.join()
+
+    for latencies, failures in collected:
+        assert failures == 0  # "database is locked" and other errors answer 500
+        assert latencies["read"] and latencies["submit"]
@@ -0,0 +1,9 @@
+from models.query_plans import check_query_plans
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        results = check_query_plans()
+    assert results
+    scans = [f"{name}: {' | '.join(plan)}" for name, plan, uses_index in results if not uses_index]
+    assert not scans, "\n".join(scans)
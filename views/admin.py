@@ -0,0 +1,461 @@
+from flask import Blueprint, render_template, request, redirect, url_for, Response, stream_with_context, flash
+from models.models import db, User, Subject, Chapter, Quiz, Question, Score, Attempt
+from models.reports import USER_REPORT_SORTS, user_score_report, encode_cursor, decode_cursor
+from models.progress import forget_user
+from models.item_stats import forget_question_stats, load_question_stats, question_hints
+from models.leaderboard import forget_user_scores
+from models.importer import import_questions, guess_format
+from models.exporter import FORMATS, MIMETYPES, parse_filters, export_scores, export_questions
+from models.cascade import delete_subject_tree, delete_chapter_tree, delete_quiz_tree
+from models.metrics import render_metrics
+from models.fragments import fragment_cache, catalog_changed
+from models.regrade import start_regrade, regrade_status
+from models.answer_cache import answer_key_cache, questions_changed
+from models.sampling import forget_served_user
+from models.attempt_sessions import autosave_writer, forget_user_sessions
+from models.identity import admin_required, current_user, forget_identity, identity_cache, password_hasher
+from models.search import ADMIN_KINDS, search, index_object, unindex_object
+import io
+from datetime import datetime
+
+bp = Blueprint("admin", __name__)
+
+# ====================== DASHBOARDS ======================
+
+@bp.route("/admin_dashboard")
+def admin_dashboard():
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    return render_template("admin_dashboard.html", user=current_user(), answer_key_cache_stats=answer_key_cache.stats())
+
+# ====================== ADMIN CRUD FOR SUBJECTS, CHAPTERS AND QUIZZES ======================
+
+# Manage Subjects
+@bp.route("/admin/subjects", methods=["GET", "POST"])
+def manage_subjects():
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    if request.method == "POST":
+        name = request.form["name"]
+        description = request.form["description"]
+        new_subject = Subject(name=name, description=description)
+        db.session.add(new_subject)
+        db.session.flush()
+        index_object("subject", new_subject)
+        catalog_changed()
+        db.session.commit()
+
+    subjects = Subject.query.all()
+    return render_template("manage_subjects.html", subjects=subjects)
+
+# Delete Subject
+@bp.route("/admin/subjects/delete/<int:subject_id>")
+def delete_subject(subject_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    subject = Subject.query.get(subject_id)
+    if subject:
+        # Delete the subject with its chapters, quizzes, questions and scores in a few set-based statements
+        delete_subject_tree(subject_id)
+        catalog_changed()
+        db.session.commit()
+    return redirect(url_for("admin.manage_subjects"))
+
+# Manage Chapters
+@bp.route("/admin/chapters/<int:subject_id>", methods=["GET", "POST"])
+def manage_chapters(subject_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    subject = Subject.query.get(subject_id)
+    
+    if request.method == "POST":
+        name = request.form["name"]
+        description = request.form["description"]
+        new_chapter = Chapter(subject_id=subject_id, name=name, description=description)
+        db.session.add(new_chapter)
+        db.session.flush()
+        index_object("chapter", new_chapter)
+        catalog_changed()
+        db.session.commit()
+
+    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
+    return render_template("manage_chapters.html", subject=subject, chapters=chapters)
+
+# Delete Chapter
+@bp.route("/admin/chapters/delete/<int:chapter_id>")
+def delete_chapter(chapter_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    chapter = Chapter.query.get(chapter_id)
+    if chapter:
+        # Delete the chapter with its quizzes, questions and scores
+        delete_chapter_tree(chapter_id)
+        catalog_changed()
+        db.session.commit()
+    return redirect(url_for("admin.manage_subjects"))
+
+# Questions per attempt and time limit from a quiz form: blank means none, anything else must be at least 1.
+# Raises ValueError with the message to show.
+def quiz_limits(form):
+    limits = []
+    for field, label in (("sample_size", "Questions per attempt"), ("time_limit", "Time limit")):
+        value = form.get(field, type=int)
+        if value is not None and value < 1:
+            raise ValueError(f"{label} must be at least 1, or left blank")
+        limits.append(value)
+    return tuple(limits)
+
+# Manage Quizzes
+@bp.route("/admin/quizzes/<int:chapter_id>", methods=["GET", "POST"])
+def manage_quizzes(chapter_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    chapter = Chapter.query.get(chapter_id)
+
+    if request.method == "POST":
+        date_of_quiz_str = request.form["date_of_quiz"]  # Get date as string
+        remarks = request.form["remarks"]
+
+        try:
+            # Convert string to datetime.date object
+            date_of_quiz = datetime.strptime(date_of_quiz_str, "%Y-%m-%d").date()
+        except ValueError:
+            return redirect(url_for("admin.manage_quizzes", chapter_id=chapter_id))
+        try:
+            sample_size, time_limit = quiz_limits(request.form)
+        except ValueError as error:
+            flash(str(error))
+            return redirect(url_for("admin.manage_quizzes", chapter_id=chapter_id))
+
+        new_quiz = Quiz(chapter_id=chapter_id, date_of_quiz=date_of_quiz, remarks=remarks,
+                        sample_size=sample_size, time_limit=time_limit)
+        db.session.add(new_quiz)
+        db.session.flush()
+        index_object("quiz", new_quiz)
+        catalog_changed()
+        db.session.commit()
+
+    quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
+    return render_template("manage_quizzes.html", chapter=chapter, quizzes=quizzes)
+
+# Delete Quiz
+@bp.route("/admin/quizzes/delete/<int:quiz_id>")
+def delete_quiz(quiz_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    quiz = Quiz.query.get(quiz_id)
+    if quiz:
+        # Delete the quiz with its questions and scores
+        delete_quiz_tree(quiz_id, quiz.chapter_id)
+        answer_key_cache.evict(quiz_id)
+        catalog_changed()
+        db.session.commit()
+    return redirect(url_for("admin.manage_subjects"))
+
+# Manage Questions
+@bp.route("/admin/questions/<int:quiz_id>", methods=["GET", "POST"])
+def manage_questions(quiz_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    quiz = Quiz.query.get(quiz_id)
+
+    if request.method == "POST":
+        question_statement = request.form["question_statement"]
+        option1 = request.form["option1"]
+        option2 = request.form["option2"]
+        option3 = request.form["option3"]
+        option4 = request.form["option4"]
+        correct_option = int(request.form["correct_option"])
+
+        new_question = Question(
+            quiz_id=quiz_id,
+            question_statement=question_statement,
+            option1=option1,
+            option2=option2,
+            option3=option3,
+            option4=option4,
+            correct_option=correct_option
+        )
+        db.session.add(new_question)
+        db.session.flush()
+        index_object("question", new_question)
+        questions_changed(quiz_id)
+        catalog_changed()
+        db.session.commit()
+
+    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    return render_template("manage_questions.html", quiz=quiz, questions=questions, regrade=regrade_status(quiz_id),
+                           stats=load_question_stats([question.id for question in questions]), question_hints=question_hints)
+
+# Bulk Import Questions
+@bp.route("/admin/questions/<int:quiz_id>/import", methods=["POST"])
+def import_questions_upload(quiz_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    quiz = Quiz.query.get(quiz_id)
+    upload = request.files.get("file")
+    if not quiz or not upload or not upload.filename:
+        return redirect(url_for("admin.manage_questions", quiz_id=quiz_id))
+
+    # Read the uploaded file as a text stream, row by row. utf-8-sig drops the byte order mark Excel writes.
+    file_format = guess_format(upload.filename)
+    text_stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    report = import_questions(quiz_id, text_stream, file_format)
+
+    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    return render_template("manage_questions.html", quiz=quiz, questions=questions, import_report=report,
+                           stats=load_question_stats([question.id for question in questions]), question_hints=question_hints)
+
+# Delete Question
+@bp.route("/admin/questions/delete/<int:question_id>")
+def delete_question(question_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    question = Question.query.get(question_id)
+    
+    if question:
+        quiz_id = question.quiz_id
+        
+        # Delete the question
+        unindex_object("question", question.id)
+        forget_question_stats([question.id])
+        questions_changed(quiz_id)
+        catalog_changed()
+        db.session.delete(question)
+        db.session.commit()
+        
+        # Regrade every attempt against the remaining questions
+        start_regrade(quiz_id)
+    return redirect(url_for("admin.manage_questions", quiz_id=question.quiz_id))
+
+# Edit Subject
+@bp.route("/admin/subjects/edit/<int:subject_id>", methods=["GET", "POST"])
+def edit_subject(subject_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    subject = Subject.query.get(subject_id)
+    if not subject:
+        return redirect(url_for("admin.manage_subjects"))
+
+    if request.method == "POST":
+        subject.name = request.form["name"]
+        subject.description = request.form["description"]
+        index_object("subject", subject)
+        catalog_changed()
+        db.session.commit()
+        return redirect(url_for("admin.manage_subjects"))
+
+    return render_template("edit_subject.html", subject=subject)
+
+# Edit Chapter
+@bp.route("/admin/chapters/edit/<int:chapter_id>", methods=["GET", "POST"])
+def edit_chapter(chapter_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    chapter = Chapter.query.get(chapter_id)
+    if not chapter:
+        return redirect(url_for("admin.manage_subjects"))
+
+    if request.method == "POST":
+        chapter.name = request.form["name"]
+        chapter.description = request.form["description"]
+        index_object("chapter", chapter)
+        catalog_changed()
+        db.session.commit()
+        return redirect(url_for("admin.manage_chapters", subject_id=chapter.subject_id))
+
+    return render_template("edit_chapter.html", chapter=chapter)
+
+
+# Edit Quiz
+@bp.route("/admin/quizzes/edit/<int:quiz_id>", methods=["GET", "POST"])
+def edit_quiz(quiz_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz:
+        return redirect(url_for("admin.manage_subjects"))
+
+    if request.method == "POST":
+        try:
+            sample_size, time_limit = quiz_limits(request.form)
+        except ValueError as error:
+            flash(str(error))
+            return redirect(url_for("admin.edit_quiz", quiz_id=quiz_id))
+        quiz.date_of_quiz = datetime.strptime(request.form["date_of_quiz"], "%Y-%m-%d")
+        quiz.remarks = request.form["remarks"]
+        quiz.sample_size = sample_size
+        quiz.time_limit = time_limit
+        index_object("quiz", quiz)
+        catalog_changed()
+        db.session.commit()
+        return redirect(url_for("admin.manage_quizzes", chapter_id=quiz.chapter_id))
+
+    return render_template("edit_quiz.html", quiz=quiz)
+
+# Edit Question
+@bp.route("/admin/questions/edit/<int:question_id>", methods=["GET", "POST"])
+def edit_question(question_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    question = Question.query.get(question_id)
+    if not question:
+        return redirect(url_for("admin.manage_questions", quiz_id=question.quiz_id))
+
+    if request.method == "POST":
+        question.question_statement = request.form["question_statement"]
+        question.option1 = request.form["option1"]
+        question.option2 = request.form["option2"]
+        question.option3 = request.form["option3"]
+        question.option4 = request.form["option4"]
+        old_correct_option = question.correct_option
+        question.correct_option = int(request.form["correct_option"])
+        index_object("question", question)
+        questions_changed(question.quiz_id)
+        catalog_changed()
+        db.session.commit()
+
+        # A new answer key means every attempt has to be regraded
+        if question.correct_option != old_correct_option:
+            start_regrade(question.quiz_id)
+        return redirect(url_for("admin.manage_questions", quiz_id=question.quiz_id))
+
+    stat = load_question_stats([question.id]).get(question.id)
+    return render_template("edit_question.html", question=question, stat=stat, hints=question_hints(stat, question.correct_option))
+
+
+# View Users
+@bp.route("/admin/users")
+def view_users():
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    # Totals for every user come from the user totals table, one keyset page at a time
+    sort = request.args.get("sort", "id")
+    if sort not in USER_REPORT_SORTS:
+        sort = "id"
+    cursor = decode_cursor(request.args.get("after"), sort)
+    users, next_cursor = user_score_report(sort=sort, cursor=cursor)
+
+    return render_template("view_users.html", users=users, sort=sort, next_cursor=encode_cursor(next_cursor))
+
+
+#=========================== ADDITIONAL ADMIN ROUTES ==============================
+
+# Search as Admin
+@bp.route("/admin_search", methods=["GET"])
+def admin_search():
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    query = request.args.get("query", "").strip()
+
+    if not query:
+        return redirect(url_for("admin.admin_dashboard"))
+
+    # Ranked full-text search over users, subjects, chapters, quizzes and questions
+    page = request.args.get("page", 1, type=int)
+    results, has_next = search(query, ADMIN_KINDS, page=page)
+
+    return render_template("admin_search_results.html", users=results["user"], subjects=results["subject"],
+                           chapters=results["chapter"], quizzes=results["quiz"], questions=results["question"],
+                           query=query, page=page, has_next=has_next)
+
+# Request and SQL metrics of this process for Prometheus
+@bp.route("/admin/metrics")
+def admin_metrics():
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    cache = answer_key_cache.stats()
+    extra = [
+        ("answer_key_cache_hits_total", "counter", "Answer key lookups served from memory", cache["hits"]),
+        ("answer_key_cache_misses_total", "counter", "Answer key lookups that read the questions", cache["misses"]),
+        ("answer_key_cache_entries", "gauge", "Quizzes in the answer key cache", cache["entries"]),
+    ]
+    fragments = fragment_cache.stats()
+    extra += [
+        ("fragment_cache_hits_total", "counter", "Catalog fragments served from the cache", fragments["hits"]),
+        ("fragment_cache_misses_total", "counter", "Catalog fragments rendered", fragments["misses"]),
+        ("fragment_cache_entries", "gauge", "Fragments in the cache", fragments["entries"]),
+    ]
+    autosave = autosave_writer.stats()
+    extra += [
+        ("autosave_pending_answers", "gauge", "Autosaved answers waiting for the transaction being written", autosave["pending"]),
+        ("autosave_answers_total", "counter", "Answers autosaved", autosave["saved"]),
+        ("autosave_commits_total", "counter", "Transactions that wrote autosaved answers", autosave["commits"]),
+        ("attempt_sessions_swept_total", "counter", "Expired attempt sessions graded by the sweeper", autosave["swept"]),
+    ]
+    identities = identity_cache.stats()
+    hashing = password_hasher.stats()
+    extra += [
+        ("identity_cache_hits_total", "counter", "Logged-in user lookups served from memory", identities["hits"]),
+        ("identity_cache_misses_total", "counter", "Logged-in user lookups that read the user", identities["misses"]),
+        ("password_hash_waiting", "gauge", "Password hashes and checks running or queued", hashing["waiting"]),
+        ("password_checks_total", "counter", "Passwords checked", hashing["checked"]),
+        ("password_checks_rejected_total", "counter", "Logins turned away because the hashing queue was full", hashing["rejected"]),
+    ]
+    return render_metrics(extra), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+# Export scores or questions as a streamed CSV / NDJSON download, filtered by subject, chapter and dates
+@bp.route("/admin/export/<kind>")
+def admin_export(kind):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    exports = {"scores": export_scores, "questions": export_questions}
+    file_format = request.args.get("format", "csv")
+    if kind not in exports or file_format not in FORMATS:
+        return "Unknown export", 404
+    try:
+        filters = parse_filters(request.args.get("subject_id", type=int), request.args.get("chapter_id", type=int),
+                                request.args.get("from"), request.args.get("to"))
+    except ValueError as error:
+        return str(error), 400
+
+    # Rows are read and sent a chunk at a time while the response is being written
+    chunks = stream_with_context(exports[kind](filters, file_format))
+    extension = "csv" if file_format == "csv" else "ndjson"
+    return Response(chunks, mimetype=MIMETYPES[file_format],
+                    headers={"Content-Disposition": f"attachment; filename={kind}.{extension}"})
+
+# Delete User as Admin
+@bp.route("/admin/users/delete/<int:user_id>")
+def delete_user(user_id):
+    if not admin_required():
+        return redirect(url_for("auth.login"))
+
+    user = User.query.get(user_id)
+
+    if not user:
+        return redirect(url_for("admin.admin_dashboard"))
+
+    # Delete related scores and attempt history
+    forget_user_scores(user_id)
+    forget_served_user(user_id)
+    forget_user_sessions(user_id)
+    forget_identity(user_id)
+    Score.query.filter_by(user_id=user_id).delete()
+    Attempt.query.filter_by(user_id=user_id).delete()
+    forget_user(user_id)
+
+    # Delete user
+    unindex_object("user", user_id)
+    db.session.delete(user)
+    db.session.commit()
+
+    return redirect(url_for("admin.admin_dashboard"))
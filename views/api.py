@@ -0,0 +1,243 @@
+from flask import Blueprint, request, session, jsonify
+from models.models import db, Quiz, Score, AttemptSession
+from models.leaderboard import load_histogram, rank_in_histogram, top_scores
+from models.fragments import catalog_version
+from models.http_cache import conditional_page, page_etag, version_time
+from models.answer_cache import answer_key_cache
+from models.sampling import served_answer_key
+from models.attempts import attempt_writer
+from models.attempt_sessions import (autosave_writer, start_session, finish_session, is_open, saved_answers,
+                                     seconds_left, clean_answers, session_answer_key)
+from models.identity import current_user
+from models.schedule import quiz_is_open
+from views.user import graded_attempt
+from datetime import datetime
+
+bp = Blueprint("api", __name__)
+
+#============================= JSON API (v1) ========================================
+# Same session login and the same grading and writing path as the HTML pages.
+API_BATCH_LIMIT = 100  # Submissions per batch request
+API_LEADERBOARD_LIMIT = 100  # Largest top-K of the leaderboard endpoint
+API_AUTOSAVE_LIMIT = 500  # Answers per autosave request
+
+QUESTION_FIELDS = ["id", "question_statement", "option1", "option2", "option3", "option4"]
+QUIZ_NOT_OPEN = "Quiz is not open yet"
+TIMED_QUIZ = "Timed quiz: start an attempt session with POST /api/v1/quizzes/{}/sessions"
+
+def api_error(message, status):
+    return jsonify({"error": message}), status
+
+# Questions without the answers, as rows of QUESTION_FIELDS
+def question_rows(answer_key):
+    return [[question.id, question.question_statement, question.option1, question.option2,
+             question.option3, question.option4] for question in answer_key.questions]
+
+# Questions of a quiz without the answers, in one compact payload
+@bp.route("/api/v1/quizzes/<int:quiz_id>")
+def api_quiz(quiz_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz:
+        return api_error("Quiz not found", 404)
+    if not quiz_is_open(quiz):
+        return api_error(f"Quiz opens at {quiz.date_of_quiz.isoformat()}", 403)
+    # The questions of a timed quiz come with its session, once the clock runs
+    if quiz.time_limit:
+        return api_error(TIMED_QUIZ.format(quiz.id), 403)
+
+    catalog = catalog_version()
+    answer_key = served_answer_key(quiz, session["user_id"], answer_key_cache.get(quiz))
+
+    def render():
+        return {
+            "id": quiz.id,
+            "chapter_id": quiz.chapter_id,
+            "date_of_quiz": quiz.date_of_quiz.isoformat(),
+            "remarks": quiz.remarks,
+            "version": answer_key.version,
+            "question_fields": QUESTION_FIELDS,
+            "questions": question_rows(answer_key),
+        }
+
+    # Changes only with the questions (questions_version), the user's sample or the quiz itself (catalog version)
+    etag = page_etag("api_quiz", quiz.id, quiz.questions_version, answer_key.version, catalog)
+    return conditional_page(etag, [version_time(quiz.questions_version), version_time(catalog)], render)
+
+# Grade one submission: {"answers": {"<question id>": option, ...}}
+@bp.route("/api/v1/quizzes/<int:quiz_id>/attempts", methods=["POST"])
+def api_submit_attempt(quiz_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("answers"), dict):
+        return api_error('Expected {"answers": {"<question id>": option}}', 400)
+
+    result, attempt = grade_api_submission(session["user_id"], quiz_id, body["answers"])
+    if attempt is None:
+        return api_error(result["error"], 404 if result["error"] == "Quiz not found" else 403)
+    attempt_writer.submit(attempt)
+    return jsonify(result), 201
+
+# Grade several submissions in one request, e.g. from a client syncing answers taken offline:
+# {"attempts": [{"quiz_id": 1, "answers": {...}}, ...]}. They are written in one transaction.
+@bp.route("/api/v1/attempts", methods=["POST"])
+def api_submit_attempts():
+    if current_user() is None:
+        return api_error("Login required", 401)
+
+    body = request.get_json(silent=True)
+    submissions = body.get("attempts") if isinstance(body, dict) else None
+    if not isinstance(submissions, list) or not all(isinstance(item, dict) for item in submissions):
+        return api_error('Expected {"attempts": [{"quiz_id": id, "answers": {...}}, ...]}', 400)
+    if len(submissions) > API_BATCH_LIMIT:
+        return api_error(f"At most {API_BATCH_LIMIT} attempts per request", 413)
+
+    results = []
+    attempts = {}  # position in results -> PendingAttempt
+    for item in submissions:
+        answers = item.get("answers")
+        if not isinstance(item.get("quiz_id"), int) or not isinstance(answers, dict):
+            results.append({"quiz_id": item.get("quiz_id"), "error": "Expected quiz_id and answers"})
+            continue
+        result, attempt = grade_api_submission(session["user_id"], item["quiz_id"], answers)
+        if attempt is not None:
+            attempts[len(results)] = attempt
+        results.append(result)
+
+    errors = attempt_writer.submit_many(list(attempts.values()))
+    for position, error in zip(attempts, errors):
+        if error is not None:
+            results[position] = {"quiz_id": results[position]["quiz_id"], "error": "Could not be saved"}
+    return jsonify({"results": results}), 200
+
+# Best scores of a quiz, plus the caller's own rank if they have attempted it
+@bp.route("/api/v1/quizzes/<int:quiz_id>/leaderboard")
+def api_leaderboard(quiz_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+    if not Quiz.query.get(quiz_id):
+        return api_error("Quiz not found", 404)
+
+    limit = min(max(request.args.get("limit", 10, type=int), 1), API_LEADERBOARD_LIMIT)
+    histogram = load_histogram(quiz_id)
+    top = [{"rank": rank_in_histogram(histogram, scored)[0], "user_id": user_id, "full_name": full_name,
+            "score": scored, "total_questions": total, "time_stamp_of_attempt": attempted.isoformat()}
+           for user_id, full_name, scored, total, attempted in top_scores(quiz_id, limit)]
+
+    own = Score.query.filter_by(user_id=session["user_id"], quiz_id=quiz_id).order_by(Score.time_stamp_of_attempt.desc()).first()
+    you = None
+    if own:
+        rank, learners, percentile = rank_in_histogram(histogram, own.total_scored)
+        you = {"rank": rank, "score": own.total_scored, "percentile": percentile}
+    return jsonify({"quiz_id": quiz_id, "learners": sum(users for _, users in histogram), "top": top, "you": you})
+
+# Attempt sessions: start, autosave answers, submit. Timed quizzes are graded from the saved answers
+# when time runs out even if the client never submits.
+def session_state(row, quiz):
+    return {
+        "id": row.id,
+        "quiz_id": row.quiz_id,
+        "started_at": row.started_at.isoformat(),
+        "deadline": row.deadline.isoformat() if row.deadline else None,
+        "seconds_left": seconds_left(row),
+        "finished": row.finished_at is not None,
+        "answers": {str(question_id): answer for question_id, answer in saved_answers(row.id).items()},
+        "question_fields": QUESTION_FIELDS,
+        "questions": question_rows(session_answer_key(row, quiz)),
+    }
+
+# Start a session on a quiz, or resume the running one
+@bp.route("/api/v1/quizzes/<int:quiz_id>/sessions", methods=["POST"])
+def api_start_session(quiz_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz:
+        return api_error("Quiz not found", 404)
+    if not quiz_is_open(quiz):
+        return api_error(f"Quiz opens at {quiz.date_of_quiz.isoformat()}", 403)
+    return jsonify(session_state(start_session(quiz, session["user_id"]), quiz)), 201
+
+@bp.route("/api/v1/sessions/<int:session_id>")
+def api_session(session_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+    row = db.session.get(AttemptSession, session_id)
+    if not row or row.user_id != session["user_id"]:
+        return api_error("Session not found", 404)
+    return jsonify(session_state(row, Quiz.query.get(row.quiz_id)))
+
+# Autosave {"answers": {"<question id>": 0-4}} (0 clears). Committed before the reply, with concurrent autosaves.
+@bp.route("/api/v1/sessions/<int:session_id>/answers", methods=["POST"])
+def api_autosave(session_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+
+    info = autosave_writer.session_info(session_id)  # No query for a session this worker already knows
+    if info is None or info.user_id != session["user_id"]:
+        return api_error("Session not found or already finished", 404)
+    if info.deadline is not None and datetime.utcnow() > info.deadline + autosave_writer.grace:
+        return api_error("Time is up", 409)
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("answers"), dict):
+        return api_error('Expected {"answers": {"<question id>": option}}', 400)
+    if len(body["answers"]) > API_AUTOSAVE_LIMIT:
+        return api_error(f"At most {API_AUTOSAVE_LIMIT} answers per request", 413)
+    try:
+        answers = clean_answers(body["answers"], session_answer_key(info, Quiz.query.get(info.quiz_id)))
+    except ValueError as error:
+        return api_error(str(error), 400)
+
+    if not autosave_writer.save(session_id, answers):
+        return api_error("Session already finished", 409)  # Graded without these answers
+    return jsonify({"saved": len(answers)}), 202
+
+# Grade a session from its saved answers, optionally saving a last {"answers": {...}} first
+@bp.route("/api/v1/sessions/<int:session_id>/submit", methods=["POST"])
+def api_submit_session(session_id):
+    if current_user() is None:
+        return api_error("Login required", 401)
+    row = db.session.get(AttemptSession, session_id)
+    if not row or row.user_id != session["user_id"]:
+        return api_error("Session not found", 404)
+    if row.finished_at is not None:
+        return api_error("Session already finished", 409)
+
+    quiz = Quiz.query.get(row.quiz_id)
+    body = request.get_json(silent=True)
+    if isinstance(body, dict) and isinstance(body.get("answers"), dict) and is_open(row):
+        try:
+            answers = clean_answers(body["answers"], session_answer_key(row, quiz))
+        except ValueError as error:
+            return api_error(str(error), 400)
+        if not autosave_writer.save(session_id, answers):
+            return api_error("Session already finished", 409)
+
+    attempt = finish_session(row, quiz, attempt_writer.submit)
+    if attempt is None:
+        return api_error("Session already finished", 409)
+    return jsonify({"quiz_id": attempt.quiz_id, "score": attempt.total_scored,
+                    "total_questions": attempt.total_questions, "version": attempt.layout_version}), 201
+
+# (result for the client, PendingAttempt or None if the quiz can't be attempted)
+def grade_api_submission(user_id, quiz_id, answers):
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz:
+        return {"quiz_id": quiz_id, "error": "Quiz not found"}, None
+    if not quiz_is_open(quiz):
+        return {"quiz_id": quiz_id, "error": QUIZ_NOT_OPEN}, None
+    if quiz.time_limit:
+        return {"quiz_id": quiz_id, "error": TIMED_QUIZ.format(quiz.id)}, None
+    answer_key = served_answer_key(quiz, user_id, answer_key_cache.get(quiz))
+    if not answer_key.questions:
+        return {"quiz_id": quiz_id, "error": "Quiz has no questions"}, None
+
+    correct_answers, packed_answers = answer_key.grade_by_id(answers)
+    result = {"quiz_id": quiz_id, "score": correct_answers, "total_questions": len(answer_key.question_ids),
+              "version": answer_key.version}
+    return result, graded_attempt(user_id, quiz, answer_key, correct_answers, packed_answers)
@@ -0,0 +1,63 @@
+from flask import Blueprint, render_template, request, redirect, url_for, session
+from models.models import db, User
+from models.identity import login_user, authenticate, password_hasher, PasswordHasherBusy
+from models.search import index_object
+
+bp = Blueprint("auth", __name__)
+
+# ====================== LOGIN/REGISTER ======================
+
+@bp.route("/register", methods=["GET", "POST"])
+def register():
+    if request.method == "POST":
+        email = request.form["email"]
+        password = request.form["password"]
+        full_name = request.form["full_name"]
+        qualification = request.form["qualification"]
+        dob = request.form["dob"]
+
+        existing_user = User.query.filter_by(email=email).first()
+        if existing_user:
+            return f"<script>alert('Email already registered!'); window.location.href='{url_for('auth.register')}';</script>"
+
+        try:
+            password = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            return f"<script>alert('Too many sign-ups right now, please try again.'); window.location.href='{url_for('auth.register')}';</script>", 503
+
+        new_user = User(email=email, password=password, full_name=full_name,
+                        qualification=qualification, dob=dob, role="user")
+        db.session.add(new_user)
+        db.session.flush()
+        index_object("user", new_user)
+        db.session.commit()
+
+        return redirect(url_for("auth.login"))
+
+    return render_template("register.html")
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        email = request.form["email"]
+        password = request.form["password"]
+
+        # The password check runs on the hashing pool; when too many logins are waiting, ask to retry
+        try:
+            user = authenticate(email, password)
+        except PasswordHasherBusy:
+            return f"<script>alert('Too many logins right now, please try again.'); window.location.href='{url_for('auth.login')}';</script>", 503
+
+        if user:
+            login_user(user)
+
+            return redirect(url_for("admin.admin_dashboard") if user.role == "admin" else url_for("user.user_dashboard"))
+        else:
+            return f"<script>alert('Incorrect Details'); window.location.href='{url_for('auth.login')}';</script>"
+
+    return render_template("login.html")
+
+@bp.route("/logout")
+def logout():
+    session.clear()
+    return redirect(url_for("auth.login"))
@@ -0,0 +1,133 @@
+from flask import Blueprint
+import click
+from models.models import Quiz
+from models.progress import rebuild_progress
+from models.item_stats import rebuild_question_stats
+from models.leaderboard import rebuild_leaderboards
+from models.importer import import_questions, guess_format
+from models.exporter import FORMATS, parse_filters, export_scores, export_questions
+from models.migrations import upgrade_database
+from models.bootstrap import initialize_database, create_admin
+from models.query_plans import check_query_plans
+from models.attempt_sessions import sweep_expired_sessions
+from models.identity import hash_plaintext_passwords
+from models.search import create_search_index, rebuild_search_index
+
+# Maintenance commands, run as `flask --app app <command>` (see the README). The blueprint has no routes;
+# cli_group=None registers its commands at the top level.
+bp = Blueprint("commands", __name__, cli_group=None)
+
+# Set up or upgrade the database: tables, migrations, the default admin and backfills of derived tables
+@bp.cli.command("init-db")
+def init_db_command():
+    initialize_database()
+
+# Add an admin account (the password is asked for unless given)
+@bp.cli.command("create-admin")
+@click.argument("email")
+@click.option("--name", "full_name", default="Admin", show_default=True)
+@click.option("--password", prompt=True, hide_input=True, confirmation_prompt=True)
+def create_admin_command(email, full_name, password):
+    if create_admin(email, password, full_name) is None:
+        raise click.ClickException(f"{email} is already registered")
+    print(f"Admin {email} created")
+
+# Apply pending schema migrations to the database
+@bp.cli.command("upgrade-db")
+def upgrade_db_command():
+    applied = upgrade_database()
+    print(f"Applied schema migrations: {applied}" if applied else "Database is up to date")
+
+# Fail if any hot query is answered with a full table scan
+@bp.cli.command("check-query-plans")
+def check_query_plans_command():
+    failed = False
+    for name, plan, uses_index in check_query_plans():
+        print(f"{'ok  ' if uses_index else 'SCAN'} {name}: {' | '.join(plan)}")
+        failed = failed or not uses_index
+    if failed:
+        raise SystemExit(1)
+
+# Recompute user chapter progress and user totals from Score and report how many rows had drifted
+@bp.cli.command("rebuild-progress")
+def rebuild_progress_command():
+    drift = rebuild_progress()
+    print(f"User chapter progress and score totals rebuilt, {drift} row(s) had drifted")
+
+# Recompute the per-quiz leaderboard histograms from Score and report how many buckets had drifted
+@bp.cli.command("rebuild-leaderboards")
+def rebuild_leaderboards_command():
+    drift = rebuild_leaderboards()
+    print(f"Leaderboards rebuilt, {drift} bucket(s) had drifted")
+
+# Recompute the per-question answer statistics from the attempt history
+@bp.cli.command("rebuild-question-stats")
+@click.option("--quiz", "quiz_id", type=int, default=None, help="Only this quiz")
+def rebuild_question_stats_command(quiz_id):
+    print(f"Question statistics rebuilt from {rebuild_question_stats(quiz_id)} attempts")
+
+# Stream scores or question banks as CSV or NDJSON to a file or stdout
+def export_options(command):
+    for option in reversed((
+        click.option("--format", "file_format", type=click.Choice(FORMATS), default="csv"),
+        click.option("--subject", "subject_id", type=int, default=None, help="Only this subject"),
+        click.option("--chapter", "chapter_id", type=int, default=None, help="Only this chapter"),
+        click.option("--from", "date_from", default=None, help="From this date (YYYY-MM-DD)"),
+        click.option("--to", "date_to", default=None, help="Up to and including this date (YYYY-MM-DD)"),
+        click.option("--output", type=click.File("w", encoding="utf-8"), default="-", help="File to write, stdout by default"),
+    )):
+        command = option(command)
+    return command
+
+def run_export(export, file_format, subject_id, chapter_id, date_from, date_to, output):
+    try:
+        filters = parse_filters(subject_id, chapter_id, date_from, date_to)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+    for chunk in export(filters, file_format):
+        output.write(chunk)
+
+@bp.cli.command("export-scores")
+@export_options
+def export_scores_command(**options):
+    run_export(export_scores, **options)
+
+@bp.cli.command("export-questions")
+@export_options
+def export_questions_command(**options):
+    run_export(export_questions, **options)
+
+# Hash the passwords stored before hashing was introduced (they are also hashed on the next login)
+@bp.cli.command("hash-passwords")
+def hash_passwords_command():
+    hashed = hash_plaintext_passwords(on_progress=lambda count: print(f"  {count} hashed"))
+    print(f"Hashed {hashed} plaintext password(s)")
+
+# Grade attempt sessions whose time ran out (the web workers also do this in the background)
+@bp.cli.command("sweep-sessions")
+def sweep_sessions_command():
+    print(f"Finished {sweep_expired_sessions()} expired attempt session(s)")
+
+# Refill the full-text search index from the tables
+@bp.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    if not create_search_index():
+        print("FTS5 is not available, search uses LIKE queries")
+        return
+    print(f"Search index rebuilt with {rebuild_search_index()} entries")
+
+# Bulk import questions into a quiz from a CSV or NDJSON file
+@bp.cli.command("import-questions")
+@click.argument("quiz_id", type=int)
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="File format, guessed from the extension when not given")
+def import_questions_command(quiz_id, path, file_format):
+    if not Quiz.query.get(quiz_id):
+        print(f"Quiz {quiz_id} not found")
+        return
+    with open(path, newline="", encoding="utf-8-sig") as file:  # Also files saved by Excel, with a byte order mark
+        report = import_questions(quiz_id, file, file_format or guess_format(path))
+    print(f"Imported {report['imported']} question(s), {report['failed']} row(s) failed")
+    for error in report["errors"]:
+        print(f"  row {error['row']}: {error['error']}")
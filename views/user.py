@@ -0,0 +1,245 @@
+from flask import Blueprint, render_template, request, redirect, url_for, session, get_template_attribute
+from markupsafe import Markup
+from models.models import db, Subject, Quiz, Score, AttemptSession
+from models.catalog import load_subject_catalog, load_latest_scores, user_score_state
+from models.progress import load_user_summary
+from models.leaderboard import load_histogram, rank_in_histogram
+from models.fragments import fragment_cache, cache_versions, catalog_version, fill_placeholders
+from models.http_cache import conditional_page, page_etag, version_time, utc
+from models.answer_cache import answer_key_cache
+from models.answers import get_layout, answers_for_questions, is_sampled_layout
+from models.sampling import served_answer_key
+from models.attempts import PendingAttempt, attempt_writer
+from models.attempt_sessions import (autosave_writer, start_session, finish_session, is_open, session_answer_key,
+                                     saved_answers, seconds_left, form_answers)
+from models.identity import user_required, current_user
+from models.schedule import FEED_DAYS, quiz_is_open, schedule_feed, time_bucket
+from models.search import USER_KINDS, search
+from datetime import datetime
+
+bp = Blueprint("user", __name__)
+
+# ====================== DASHBOARD ======================
+
+@bp.route("/user_dashboard")
+def user_dashboard():
+    if not user_required():
+        return redirect(url_for("auth.login"))
+
+    user_id = session["user_id"]
+    catalog = catalog_version()
+
+    # The open / upcoming quizzes feed is shared by every learner too; it is rendered once per time bucket
+    # and again when one of its quizzes opens
+    bucket = time_bucket()
+    feed, feed_expires = fragment_cache.get_or_render(("schedule_feed", catalog, bucket), render_schedule_feed)
+
+    def render():
+        user = current_user()
+        # The subject list is the same for every learner; it is only rendered again after an admin change
+        subject_list, _ = fragment_cache.get_or_render(
+            ("subject_list", catalog),
+            lambda: (render_template("fragments/subject_list.html", subjects=Subject.query.all()), None)
+        )
+        return render_template("user_dashboard.html", user=user, subject_list=Markup(subject_list),
+                               schedule_feed=Markup(feed))
+
+    # Only the catalog and the feed change what this user sees here, so repeat visits get 304 Not Modified.
+    # No Last-Modified: quizzes opening change the page too.
+    return conditional_page(page_etag("user_dashboard", user_id, catalog, bucket, feed_expires), [], render)
+
+def render_schedule_feed():
+    open_now, upcoming, expires_at = schedule_feed()
+    return render_template("fragments/schedule_feed.html", open_now=open_now, upcoming=upcoming, days=FEED_DAYS), expires_at
+
+#============================= USER ROUTES ========================================
+
+# View Quizzes
+@bp.route("/view_quizzes/<int:subject_id>")
+def view_quizzes(subject_id):
+    if current_user() is None:
+        return redirect(url_for("auth.login"))
+
+    user_id = session["user_id"]
+    catalog, grades = cache_versions("catalog", "grades")
+
+    # The page is the same for every learner until the catalog changes or one of its quizzes opens.
+    # Only the last scores are filled in per user.
+    page, next_opening = fragment_cache.get_or_render(("view_quizzes", subject_id, catalog),
+                                                      lambda: render_subject_page(subject_id))
+    if not page:
+        return "Subject not found", 404
+
+    def render():
+        user_scores = load_latest_scores(user_id, subject_id=subject_id)
+        last_score = get_template_attribute("fragments/last_score.html", "last_score")
+        return fill_placeholders(page, "last_score",
+                                 lambda quiz_id, question_count: last_score(user_scores.get(int(quiz_id)), question_count))
+
+    # Unchanged while the shared page and the user's scores are. No Last-Modified: quizzes opening change the page too.
+    latest_attempt, attempted = user_score_state(user_id)
+    etag = page_etag("view_quizzes", subject_id, user_id, catalog, grades, next_opening, latest_attempt, attempted)
+    return conditional_page(etag, [], render)
+
+# Shared part of view_quizzes: (html, time the next quiz opens), or ("", None) for a missing subject
+def render_subject_page(subject_id):
+    subject = Subject.query.get(subject_id)
+    if not subject:
+        return "", None
+
+    # Whole chapter/quiz tree and question counts in a fixed number of queries
+    chapters, quizzes_by_chapter, question_counts = load_subject_catalog(subject_id)
+    now = datetime.now() # To know if quiz should be attemptable (quiz_is_open decides the same on attempt)
+    upcoming = [quiz.date_of_quiz for quizzes in quizzes_by_chapter.values() for quiz in quizzes if not quiz_is_open(quiz, now)]
+
+    html = render_template("view_quizzes.html", subject=subject, chapters=chapters, quizzes_by_chapter=quizzes_by_chapter,
+                           question_counts=question_counts, now=now)
+    return html, min(upcoming).timestamp() if upcoming else None
+
+# A graded submission ready for attempt_writer, which writes it with the next group commit.
+# Answers are stored packed, in the order of this version of the quiz's questions.
+def graded_attempt(user_id, quiz, answer_key, correct_answers, packed_answers):
+    return PendingAttempt(
+        user_id=user_id,
+        quiz_id=quiz.id,
+        chapter_id=quiz.chapter_id,
+        total_scored=correct_answers,
+        total_questions=len(answer_key.question_ids),
+        answers=packed_answers,
+        layout_version=answer_key.version,
+        question_ids=answer_key.question_ids
+    )
+
+# Attempt Quiz
+@bp.route("/attempt_quiz/<int:quiz_id>", methods=["GET", "POST"])
+def attempt_quiz(quiz_id):
+    if current_user() is None:
+        return redirect(url_for("auth.login"))
+
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz:
+        return redirect(url_for("user.user_dashboard"))
+
+    # Quizzes can't be opened or submitted before their date, whatever the page showed
+    if not quiz_is_open(quiz):
+        return redirect(url_for("user.view_quizzes", subject_id=quiz.chapter.subject_id))
+
+    # Timed quizzes run as attempt sessions: answers are autosaved and the time limit is enforced on the server
+    if quiz.time_limit:
+        return timed_attempt(quiz)
+
+    # Questions and answer key come from the in-process cache; a sampled quiz serves this user's sample of them
+    answer_key = served_answer_key(quiz, session["user_id"], answer_key_cache.get(quiz))
+    questions = answer_key.questions
+
+    if not questions:
+        return redirect(url_for("user.view_quizzes", subject_id=quiz.chapter.subject_id))
+    
+    if request.method == "POST":
+        correct_answers, packed_answers = answer_key.grade(request.form)
+        attempt_writer.submit(graded_attempt(session["user_id"], quiz, answer_key, correct_answers, packed_answers))
+
+        return redirect(url_for("user.quiz_results", quiz_id=quiz_id))
+
+    return render_template("attempt_quiz.html", quiz=quiz, questions=questions, chapter=quiz.chapter)
+
+# Attempt of a timed quiz: the page resumes the running session, the form POST grades its saved answers
+def timed_attempt(quiz):
+    user_id = session["user_id"]
+
+    if request.method == "POST":
+        row = db.session.get(AttemptSession, request.form.get("session_id", type=int) or 0)
+        if not row or row.user_id != user_id or row.quiz_id != quiz.id:
+            return redirect(url_for("user.attempt_quiz", quiz_id=quiz.id))
+        # The form's answers only count while time is left; after that the autosaved ones are graded
+        quiz_id = quiz.id  # Finishing commits, which expires the loaded rows
+        if is_open(row):
+            autosave_writer.save(row.id, form_answers(session_answer_key(row, quiz), request.form))
+        finish_session(row, quiz, attempt_writer.submit)
+        return redirect(url_for("user.quiz_results", quiz_id=quiz_id))
+
+    row = start_session(quiz, user_id)
+    questions = session_answer_key(row, quiz).questions
+    if not questions:
+        return redirect(url_for("user.view_quizzes", subject_id=quiz.chapter.subject_id))
+    return render_template("attempt_quiz.html", quiz=quiz, questions=questions, chapter=quiz.chapter,
+                           attempt_session=row, saved=saved_answers(row.id), seconds_left=seconds_left(row))
+
+# Quiz Results
+@bp.route("/quiz_results/<int:quiz_id>")
+def quiz_results(quiz_id):
+    if not user_required():
+        return redirect(url_for("auth.login"))
+
+    user_id = session["user_id"]
+    
+    # Fetch the user's latest score for this quiz
+    score_record = Score.query.filter_by(user_id=user_id, quiz_id=quiz_id).order_by(Score.time_stamp_of_attempt.desc()).first()
+
+    if not score_record:
+        return redirect(url_for("user.user_dashboard"))
+
+    quiz = Quiz.query.get(quiz_id)
+
+    if score_record.total_questions == 0:
+        return redirect(url_for("user.view_quizzes", subject_id=quiz.chapter.subject_id))
+
+    def render():
+        # Current questions (only the served ones for a sampled attempt), each paired with the answer decoded from the packed attempt
+        answer_key = answer_key_cache.get(quiz)
+        layout_ids = get_layout(quiz_id, score_record.layout_version) or ()
+        if is_sampled_layout(score_record.layout_version):
+            answer_key = answer_key.subset(layout_ids, score_record.layout_version)
+        user_answers = answers_for_questions(score_record.answers or b"", layout_ids, answer_key.question_ids)
+
+        return render_template(
+            "quiz_results.html", 
+            quiz=quiz, 
+            score=score_record.total_scored, 
+            total_questions=score_record.total_questions,
+            results=zip(answer_key.questions, user_answers),
+            rank=rank, learners=learners, percentile=percentile
+        )
+
+    # Rank among the latest scores of everyone, from the quiz's score histogram
+    histogram = load_histogram(quiz_id)
+    rank, learners, percentile = rank_in_histogram(histogram, score_record.total_scored)
+
+    # Unchanged until the user attempts again, another score changes the histogram,
+    # or the quiz, its questions or the grading change
+    catalog, grades = cache_versions("catalog", "grades")
+    etag = page_etag("quiz_results", score_record.id, score_record.time_stamp_of_attempt, histogram, catalog, grades)
+    change_times = [utc(score_record.time_stamp_of_attempt), version_time(catalog), version_time(grades)]
+    return conditional_page(etag, change_times, render)
+
+# Quiz Summary
+@bp.route("/quiz_summary")
+def quiz_summary():
+    if not user_required():
+        return redirect(url_for("auth.login"))
+
+    user_id = session["user_id"]
+
+    # Chapter-wise totals are kept up to date on every attempt, so this is a single read
+    summary = load_user_summary(user_id)
+
+    return render_template("quiz_summary.html", summary=summary)
+
+# Search as User
+@bp.route("/user_search", methods=["GET"])
+def user_search():
+    if not user_required():
+        return redirect(url_for("auth.login"))
+
+    query = request.args.get("query", "").strip()
+
+    if not query:
+        return redirect(url_for("user.user_dashboard"))
+
+    # Ranked full-text search over subjects and quizzes
+    page = request.args.get("page", 1, type=int)
+    results, has_next = search(query, USER_KINDS, page=page)
+    subjects, quizzes = results["subject"], results["quiz"]
+
+    return render_template("user_search_results.html", subjects=subjects, quizzes=quizzes,
+                           query=query, page=page, has_next=has_next)